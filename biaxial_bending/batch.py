@@ -0,0 +1,297 @@
+# Built-in packages
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import calc_uls
+from rebars import RebarLayout
+from section import Section, CircularSection, AnnularSection
+from surface_store import SurfaceStore
+
+
+'''
+Command line batch runner for ULS checks of a library of sections.
+
+    python batch.py sections.json loads.csv --output results --workers 4
+
+The section library is a JSON file with default materials and capacity surface grid, and a list of sections.
+Each section either has polygon vertices 'x' and 'y', a 'diameter' (circular) or a 'diameter' and an
+'inner_diameter' (annular). Materials, grid and the serviceability parameters 'sls' (see 'crack_width') can be
+overridden per section. 'fyd' and 'Es' may be lists indexed by the material IDs of the rebars.
+
+    {
+        "materials": {"fcd": 16.67, "fyd": 434.8, "Es": 200000, "eps_cu": 0.0035, "lambda": 0.8},
+        "grid": {"rotation_step": 5, "vertical_step": 10},
+        "sls": {"Ec": 11000, "fct_eff": 2.6, "kt": 0.4},
+        "sections": [
+            {"name": "C1", "x": [-200, 200, 200, -200], "y": [200, 200, -200, -200],
+             "rebars": {"x": [-150, 150, 150, -150], "y": [150, 150, -150, -150], "dia": 20}},
+            {"name": "P1", "diameter": 500, "rebars": {"x": [...], "y": [...], "dia": 16}}
+        ]
+    }
+
+The load file is a CSV file with columns 'section', 'load', 'P', 'Mx' and 'My' in the units of the section
+library (e.g. N and Nmm for sections in mm and stresses in MPa).
+
+Results are written to the output directory as one '<section>-<hash>.npz' file per section with the columns
+'load', 'P', 'Mx', 'My' and 'ur', see 'result_filename'. Each file is written atomically when the section is
+completed, so a run that is interrupted can be restarted with the same arguments and only the remaining sections
+are computed. A file only counts as completed if it holds the same section name and a digest of the same section
+entry and load combinations ('input_digest'), so sections or loads that changed are computed again. The
+serviceability parameters are not part of the digest, as they do not change the ULS results. Use
+'read_results' to collect all files into a single set of columns, or '--report <file>.npz' to write them to one
+columnar file with the columns 'section', 'load', 'P', 'Mx', 'My' and 'ur' after the run (see 'write_report').
+
+With '--store', capacity surfaces are kept in a 'surface_store.SurfaceStore' and reused by later runs for
+sections and materials that have not changed.
+'''
+
+DEFAULT_MATERIALS = {'fcd': 25/1.5, 'fyd': 500/1.15, 'Es': 200*10**3, 'eps_cu': 0.0035, 'lambda': 0.80}
+DEFAULT_GRID = {'rotation_step': 5, 'vertical_step': 10}
+DEFAULT_SLS = {'Ec': 33000 / (1 + 2.0), 'fct_eff': 2.6, 'kt': 0.4}
+
+
+def build_section(spec):
+    ''' Return the section defined by a section library entry. '''
+    bars = spec['rebars']
+    rebars = RebarLayout(bars['x'], bars['y'], dia=bars.get('dia'), area=bars.get('area'),
+                         material=bars.get('material', 0))
+    if 'x' in spec:
+        return Section(spec['x'], spec['y'], rebars)
+    center = tuple(spec.get('center', (0, 0)))
+    if spec.get('inner_diameter', 0) > 0:
+        return AnnularSection(spec['diameter'], spec['inner_diameter'], rebars, center=center)
+    return CircularSection(spec['diameter'], rebars, center=center)
+
+
+def read_library(filename):
+    '''
+    Read a section library file.
+
+    Returns:
+        specs (list)    : Section entries with the default materials, grid and serviceability parameters filled in
+    '''
+    with open(filename) as f:
+        library = json.load(f)
+    materials = dict(DEFAULT_MATERIALS, **library.get('materials', {}))
+    grid = dict(DEFAULT_GRID, **library.get('grid', {}))
+    sls = dict(DEFAULT_SLS, **library.get('sls', {}))
+
+    specs = []
+    names = set()
+    for spec in library['sections']:
+        if spec['name'] in names:
+            raise ValueError('Duplicate section name {!r} in section library.'.format(spec['name']))
+        names.add(spec['name'])
+        spec = dict(spec)
+        spec['materials'] = dict(materials, **spec.get('materials', {}))
+        spec['grid'] = dict(grid, **spec.get('grid', {}))
+        spec['sls'] = dict(sls, **spec.get('sls', {}))
+        specs.append(spec)
+    return specs
+
+
+def read_loads(filename):
+    '''
+    Read a load combination file.
+
+    Returns:
+        loads (dict)    : {section name: (load names, P, Mx, My)}
+    '''
+    rows = {}
+    with open(filename, newline='') as f:
+        for row in csv.DictReader(f):
+            rows.setdefault(row['section'], []).append(row)
+    return {name: ([r['load'] for r in r_list],
+                   np.array([float(r['P']) for r in r_list]),
+                   np.array([float(r['Mx']) for r in r_list]),
+                   np.array([float(r['My']) for r in r_list]))
+            for name, r_list in rows.items()}
+
+
+def result_filename(output, name):
+    '''
+    Return the result file of section 'name'. Characters that are unsafe in file names are replaced, and a short
+    hash of the name keeps the files of names that only differ in those characters apart.
+    '''
+    tag = hashlib.sha256(name.encode()).hexdigest()[:8]
+    return os.path.join(output, '{}-{}.npz'.format(re.sub(r'[^\w.-]', '_', name), tag))
+
+
+def input_digest(spec, loads):
+    '''
+    Return a SHA-256 hex digest of a section library entry and its load combinations. The serviceability
+    parameters 'sls' are left out, as they do not change the ULS results.
+    '''
+    uls = {key: value for key, value in spec.items() if key != 'sls'}
+    h = hashlib.sha256(json.dumps(uls, sort_keys=True).encode())
+    load_names, Ped, Mxed, Myed = loads
+    h.update(json.dumps(list(load_names)).encode())
+    for a in (Ped, Mxed, Myed):
+        h.update(np.asarray(a, dtype=float).tobytes())
+    return h.hexdigest()
+
+
+def is_completed(filename, name, digest):
+    ''' Return True if 'filename' holds the results of section 'name' for the inputs with digest 'digest'. '''
+    if not os.path.exists(filename):
+        return False
+    with np.load(filename) as data:
+        return ('digest' in data and str(data['section']) == name and str(data['digest']) == digest)
+
+
+def check_section(spec, loads, store=None):
+    '''
+    Compute the capacity surface of a section and the utilization ratios of its load combinations. The surface
+    is taken from the surface store in directory 'store' if given, and added to it if it is not stored yet.
+
+    Returns:
+        name (str)          : Name of the section
+        columns (dict)      : Result columns 'load', 'P', 'Mx', 'My' and 'ur'
+        elapsed (float)     : Computation time [s]
+    '''
+    t0 = time.perf_counter()
+    section = build_section(spec)
+    m = spec['materials']
+    fyd = section.rebars.per_bar(m['fyd'])
+    Es = section.rebars.per_bar(m['Es'])
+    load_names, Ped, Mxed, Myed = loads
+    if store is None:
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(section, m['fcd'], fyd, Es, m['eps_cu'],
+                                                            lambda_=m['lambda'], **spec['grid'])
+        ur = calc_uls.utilization_ratio(Ped, Mxed, Myed, P, Mx, My)
+    else:
+        surface = SurfaceStore(store).get_or_compute(section, m['fcd'], fyd, Es, m['eps_cu'], lambda_=m['lambda'],
+                                                     **spec['grid'])
+        ur = surface.utilization_ratio(Ped, Mxed, Myed)
+    columns = {'load': np.array(load_names, dtype=str), 'P': Ped, 'Mx': Mxed, 'My': Myed,
+               'ur': np.array(ur, dtype=float)}
+    return spec['name'], columns, time.perf_counter() - t0
+
+
+def write_result(filename, columns):
+    ''' Write result columns to 'filename' atomically, i.e. the file is either complete or missing. '''
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp, filename)
+
+
+def read_results(output):
+    '''
+    Return the results of all completed sections in an output directory as columns.
+
+    Returns:
+        columns (dict)  : Arrays 'section', 'load', 'P', 'Mx', 'My' and 'ur' with one entry per load combination
+    '''
+    parts = {key: [] for key in ('section', 'load', 'P', 'Mx', 'My', 'ur')}
+    for filename in sorted(os.listdir(output)):
+        if not filename.endswith('.npz'):
+            continue
+        with np.load(os.path.join(output, filename)) as data:
+            if 'digest' not in data:
+                # Not a section result, e.g. a report written to the output directory
+                continue
+            name = str(data['section'])
+            parts['section'].append(np.full(data['ur'].size, name))
+            for key in ('load', 'P', 'Mx', 'My', 'ur'):
+                parts[key].append(data[key])
+    return {key: np.concatenate(value) if value else np.array([]) for key, value in parts.items()}
+
+
+def write_report(output, filename):
+    '''
+    Write the results of all completed sections in an output directory to a single columnar file, see
+    'read_results'. The file is written atomically.
+
+    Returns:
+        n_rows (int)    : Number of load combinations in the report
+    '''
+    columns = read_results(output)
+    write_result(filename, columns)
+    return columns['ur'].size
+
+
+def run(library, loads, output, workers=None, store=None, log=print):
+    '''
+    Check all sections of a library that have load combinations and are not completed in 'output' yet.
+
+    Args:
+        library (list)      : Section entries, see 'read_library'
+        loads (dict)        : Load combinations per section, see 'read_loads'
+        output (str)        : Output directory
+        workers (int)       : Number of worker processes, runs in the current process if 1
+        store (str)         : Directory of a capacity surface store, see 'check_section'
+
+    Returns:
+        n_done (int)        : Number of sections computed in this run
+    '''
+    os.makedirs(output, exist_ok=True)
+    todo = []
+    digests = {}
+    for spec in library:
+        name = spec['name']
+        if name not in loads:
+            log('{}: no load combinations, skipped'.format(name))
+            continue
+        digests[name] = input_digest(spec, loads[name])
+        if is_completed(result_filename(output, name), name, digests[name]):
+            log('{}: already completed, skipped'.format(name))
+        else:
+            todo.append(spec)
+
+    def store_result(name, columns, elapsed):
+        columns['section'] = np.array(name)
+        columns['digest'] = np.array(digests[name])
+        write_result(result_filename(output, name), columns)
+        log('{}: {} load combinations, max UR = {:.3f} ({:.2f} s)'.format(
+            name, columns['ur'].size, columns['ur'].max() if columns['ur'].size else 0, elapsed))
+
+    if workers == 1:
+        for spec in todo:
+            store_result(*check_section(spec, loads[spec['name']], store))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(check_section, spec, loads[spec['name']], store) for spec in todo]
+            for future in as_completed(futures):
+                store_result(*future.result())
+
+    return len(todo)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run ULS checks for a library of sections.')
+    parser.add_argument('library', help='JSON file with section definitions')
+    parser.add_argument('loads', help='CSV file with load combinations (section, load, P, Mx, My)')
+    parser.add_argument('--output', '-o', default='results', help='Output directory')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes')
+    parser.add_argument('--store', help='Directory of a capacity surface store to reuse surfaces from')
+    parser.add_argument('--summary', action='store_true', help='Print the governing load of each section')
+    parser.add_argument('--report', help='Write the results of all sections to this columnar .npz file')
+    args = parser.parse_args(argv)
+
+    run(read_library(args.library), read_loads(args.loads), args.output, workers=args.workers, store=args.store)
+
+    if args.summary:
+        results = read_results(args.output)
+        for name in np.unique(results['section']):
+            idx = np.flatnonzero(results['section'] == name)
+            i = idx[np.argmax(results['ur'][idx])]
+            print('{:<20} {:<20} UR = {:.3f}'.format(name, results['load'][i], results['ur'][i]))
+    if args.report:
+        print('{} load combinations written to {}'.format(write_report(args.output, args.report), args.report))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,358 @@
+# Built-in packages
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import section_calc as sc
+import calc_uls
+import calc_sls
+import instrumentation
+import kernels
+import slices
+from radius_table import RadiusTable
+from rebars import RebarLayout
+from section import Section
+
+
+'''
+Benchmark suite for the hot paths of the section analysis.
+
+Each benchmark is timed a number of times and the best, median and mean wall clock times are stored
+together with the size of the problem. Results are written to a JSON file so they can be compared
+across commits:
+
+    python benchmark.py --output bench_base.json
+    (change code)
+    python benchmark.py --output bench_new.json --compare bench_base.json
+
+Sizes that are expected to exceed the time budget of a benchmark (extrapolated from the previous
+size) are skipped and recorded as such, so the largest load sets can be run with '--budget'.
+'''
+
+# Material parameters used in all benchmarks
+FCD = 25 / 1.5
+FYD = 500 / 1.15
+ES = 200 * 10**3
+EPS_CU = 0.0035
+LAMBDA = 0.80
+
+
+def rectangle():
+    ''' 400x400 rectangle with 8 bars. '''
+    x = [-200, 200, 200, -200]
+    y = [200, 200, -200, -200]
+    xr = [-150, 0, 150, 150, 150, 0, -150, -150]
+    yr = [150, 150, 150, 0, -150, -150, -150, 0]
+    return Section(x, y, RebarLayout(xr, yr, dia=20))
+
+
+def cross():
+    ''' Cross shaped section from 'calc_uls.__main__'. '''
+    x = [-400, 400, 400, 100, 100, 400, 400, -400, -400, -100, -100, -400]
+    y = [400, 400, 200, 200, -200, -200, -400, -400, -200, -200, 200, 200]
+    xr = [-340, 0, 340, 0, -340, 340, 0]
+    yr = [340, 340, 340, 0, -340, -340, -340]
+    return Section(x, y, RebarLayout(xr, yr, dia=25))
+
+
+def tbeam():
+    ''' T-beam from 'calc_uls.__main__'. '''
+    x = [-150, -400, -400, 400, 400, 150, 150, -150]
+    y = [200, 200, 400, 400, 200, 200, -150, -150]
+    xr = [-350, -350, -175, 175, 350, 0, 350, -100, 0, 100]
+    yr = [350, 250, 350, 350, 350, -100, 250, -100, 350, -100]
+    return Section(x, y, RebarLayout(xr, yr, dia=20))
+
+
+def triangle():
+    ''' Triangle from 'calc_uls.__main__' with mixed bar sizes. '''
+    x = [0, -200, 200]
+    y = [200, -200, -200]
+    xr = [-130, 130, 65, -65, 0, 0]
+    yr = [-160, -160, 0, 0, 140, -160]
+    return Section(x, y, RebarLayout(xr, yr, dia=[25, 25, 20, 20, 16, 25]))
+
+
+def wall():
+    ''' 4000x250 wall with 100 bars along each face (200 bars in total). '''
+    x = [-2000, 2000, 2000, -2000]
+    y = [125, 125, -125, -125]
+    xb = np.linspace(-1950, 1950, 100)
+    xr = np.concatenate((xb, xb))
+    yr = np.concatenate((np.full(100, 75), np.full(100, -75)))
+    return Section(x, y, RebarLayout(xr, yr, dia=12))
+
+
+SECTIONS = {'rectangle': rectangle, 'cross': cross, 'tbeam': tbeam, 'triangle': triangle, 'wall': wall}
+
+
+def time_call(func, repeat):
+    '''
+    Return wall clock times [s] of 'repeat' calls of 'func'. Output printed by the function is suppressed. The
+    function is called once before it is timed, so deferred imports and caches do not count.
+    '''
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t0)
+    return times
+
+
+def summarize(name, section_name, size, times, unit):
+    ''' Return a benchmark result record. '''
+    times = np.array(times)
+    return {'name': name, 'section': section_name, 'size': size, 'unit': unit, 'repeat': times.size,
+            'min': float(times.min()), 'median': float(np.median(times)), 'mean': float(times.mean()),
+            'per_item': float(times.min() / size)}
+
+
+def bench_section_analysis(section_name, section, repeat):
+    ''' Time 'perform_section_analysis' for a set of neutral axis states covering the section. '''
+    xmin, ymin, xmax, ymax = section.bbox
+    states = [(alpha, na_y) for alpha in range(0, 360, 30) for na_y in np.linspace(ymin, ymax, 5)
+              if alpha % 180 != 90]
+
+    def run():
+        for alpha, na_y in states:
+            sc.perform_section_analysis(section, FCD, FYD, ES, EPS_CU, alpha, na_y, lambda_=LAMBDA)
+
+    return [summarize('perform_section_analysis', section_name, len(states), time_call(run, repeat), 'state')]
+
+
+def bench_capacity_surface(section_name, section, repeat, densities):
+    ''' Time 'compute_capacity_surface' for grids of (rotation_step, vertical_step). '''
+    results = []
+    for rotation_step, vertical_step in densities:
+        def run():
+            return calc_uls.compute_capacity_surface(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA,
+                                                     rotation_step=rotation_step, vertical_step=vertical_step)
+        n_points = len(run()[0])
+        record = summarize('compute_capacity_surface', section_name, n_points, time_call(run, repeat), 'point')
+        record['rotation_step'] = rotation_step
+        record['vertical_step'] = vertical_step
+        results.append(record)
+    return results
+
+
+def load_combinations(P, Mx, My, n, seed=0):
+    ''' Return 'n' random load combinations scattered around the capacity surface. '''
+    rng = np.random.default_rng(seed)
+    i = rng.integers(0, len(P), n)
+    scale = rng.uniform(0.2, 1.5, n)
+    return np.asarray(P)[i] * scale, np.asarray(Mx)[i] * scale, np.asarray(My)[i] * scale
+
+
+def bench_utilization(section_name, section, repeat, sizes, budget):
+    ''' Time 'utilization_ratio' for increasing numbers of load combinations. '''
+    P, Mx, My, _, _ = calc_uls.compute_capacity_surface(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA,
+                                                         rotation_step=10, vertical_step=10)
+    results = []
+    per_item = None
+    for n in sizes:
+        if per_item is not None and per_item * n > budget:
+            results.append({'name': 'utilization_ratio', 'section': section_name, 'size': n, 'unit': 'load',
+                            'skipped': 'expected time {:.0f} s exceeds budget'.format(per_item * n)})
+            continue
+        Ped, Mxed, Myed = load_combinations(P, Mx, My, n)
+        times = time_call(lambda: calc_uls.utilization_ratio(Ped, Mxed, Myed, P, Mx, My),
+                          repeat if n <= 10**4 else 1)
+        record = summarize('utilization_ratio', section_name, n, times, 'load')
+        per_item = record['per_item']
+        results.append(record)
+    return results
+
+
+def bench_utilization_mesh(section_name, section, repeat, sizes, budget):
+    ''' Time 'utilization_ratio' against the capacity surface mesh, including building the facet index. '''
+    P, Mx, My, _, _, faces = calc_uls.compute_capacity_surface(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA,
+                                                                rotation_step=5, vertical_step=10, return_mesh=True)
+    results = []
+    per_item = None
+    for n in sizes:
+        if per_item is not None and per_item * n > budget:
+            results.append({'name': 'utilization_ratio_mesh', 'section': section_name, 'size': n, 'unit': 'load',
+                            'skipped': 'expected time {:.0f} s exceeds budget'.format(per_item * n)})
+            continue
+        Ped, Mxed, Myed = load_combinations(P, Mx, My, n)
+        times = time_call(lambda: calc_uls.utilization_ratio(Ped, Mxed, Myed, P, Mx, My, faces=faces),
+                          repeat if n <= 10**4 else 1)
+        record = summarize('utilization_ratio_mesh', section_name, n, times, 'load')
+        per_item = record['per_item']
+        results.append(record)
+    return results
+
+
+def bench_radius_table(section_name, section, repeat, sizes, budget):
+    ''' Time screening with a 'radius_table.RadiusTable', including building the table. '''
+    P, Mx, My, _, _ = calc_uls.compute_capacity_surface(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA,
+                                                         rotation_step=10, vertical_step=10)
+    results = []
+    per_item = None
+    for n in sizes:
+        if per_item is not None and per_item * n > budget:
+            results.append({'name': 'radius_table', 'section': section_name, 'size': n, 'unit': 'load',
+                            'skipped': 'expected time {:.0f} s exceeds budget'.format(per_item * n)})
+            continue
+        Ped, Mxed, Myed = load_combinations(P, Mx, My, n)
+        times = time_call(lambda: RadiusTable(P, Mx, My).utilization_ratio(Ped, Mxed, Myed),
+                          repeat if n <= 10**4 else 1)
+        record = summarize('radius_table', section_name, n, times, 'load')
+        per_item = record['per_item']
+        results.append(record)
+    return results
+
+
+def bench_slices(section_name, section, repeat):
+    '''
+    Time an Mx-My contour at half the compression capacity and a P-M curve, see 'slices', against the capacity
+    surface with the same angles and depths. Each record holds the time relative to the surface as
+    'surface_ratio' and the number of batched section analyses of a slice as 'batches'.
+    '''
+    surface = min(time_call(lambda: calc_uls.compute_capacity_surface(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA,
+                                                                      rotation_step=5, vertical_step=10), repeat))
+    _, compression = calc_uls.pole_capacities(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA)
+    benchmarks = [('axial_force_contour', 72,
+                   lambda: slices.axial_force_contour(section, FCD, FYD, ES, EPS_CU, compression[0] / 2,
+                                                      lambda_=LAMBDA, rotation_step=5)),
+                  ('moment_angle_curve', 20,
+                   lambda: slices.moment_angle_curve(section, FCD, FYD, ES, EPS_CU, 0, lambda_=LAMBDA,
+                                                     vertical_step=10))]
+    records = []
+    for name, size, func in benchmarks:
+        with instrumentation.profile() as prof:
+            func()
+        record = summarize(name, section_name, size, time_call(func, repeat), 'point')
+        record['surface_ratio'] = record['min'] / surface
+        record['batches'] = prof.counts['slices.batches']
+        records.append(record)
+    return records
+
+
+def bench_find_na(repeat):
+    ''' Time 'find_na' for the rectangular beam from 'calc_sls.__main__'. '''
+    b, h, c = 0.250, 0.500, 0.040
+    section = Section([0, b, b, 0], [0, 0, h, h], RebarLayout([b/3, b/2, 2/3*b], [c, c, c], dia=0.020))
+    times = time_call(lambda: calc_sls.find_na(section, -80, 91, 0, 500/1.15, Ec=33, Es=200), repeat)
+    return [summarize('find_na', 'sls_beam', 1, times, 'call')]
+
+
+def metadata():
+    ''' Return information about the environment the benchmarks were run in. '''
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'numpy': np.__version__, 'platform': platform.platform(), 'backend': kernels.select_backend(rectangle())}
+
+
+def run_benchmarks(sections, repeat=3, densities=((15, 10), (5, 10), (2, 5)), load_sizes=(10**2, 10**3, 10**4,
+                   10**5, 10**6), budget=60):
+    '''
+    Run all benchmarks and return the results.
+
+    Args:
+        sections (list)     : Names of the sections to benchmark, see 'SECTIONS'
+        repeat (int)        : Number of timed calls of each benchmark
+        densities (list)    : (rotation_step, vertical_step) grids of the capacity surface benchmarks
+        load_sizes (list)   : Numbers of load combinations of the utilization benchmarks
+        budget (float)      : Max. expected time [s] of a single utilization benchmark
+
+    Returns:
+        results (dict)      : Metadata and list of benchmark records
+    '''
+    records = []
+    for name in sections:
+        section = SECTIONS[name]()
+        records += bench_section_analysis(name, section, repeat)
+        records += bench_capacity_surface(name, section, repeat, densities)
+        records += bench_utilization(name, section, repeat, load_sizes, budget)
+        records += bench_utilization_mesh(name, section, repeat, load_sizes, budget)
+        records += bench_radius_table(name, section, repeat, load_sizes, budget)
+        records += bench_slices(name, section, repeat)
+    records += bench_find_na(repeat)
+    return {'meta': metadata(), 'results': records}
+
+
+def record_key(record):
+    return (record['name'], record['section'], record['size'], record.get('rotation_step'),
+            record.get('vertical_step'))
+
+
+def compare(new, base, threshold=1.10):
+    '''
+    Print the timings of 'new' relative to 'base' and return the records that are slower by more than
+    'threshold' times. Records are matched by benchmark name, section and problem size.
+    '''
+    base_records = {record_key(r): r for r in base['results'] if 'min' in r}
+    regressions = []
+    print('{:<26} {:<10} {:>9} {:>12} {:>12} {:>7}'.format('benchmark', 'section', 'size', 'base [s]', 'new [s]',
+                                                             'ratio'))
+    for r in new['results']:
+        b = base_records.get(record_key(r))
+        if b is None or 'min' not in r:
+            continue
+        ratio = r['min'] / b['min']
+        flag = ' <--' if ratio > threshold else ''
+        print('{:<26} {:<10} {:>9} {:>12.4g} {:>12.4g} {:>7.2f}{}'.format(r['name'], r['section'], r['size'],
+                                                                          b['min'], r['min'], ratio, flag))
+        if ratio > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the section analysis hot paths.')
+    parser.add_argument('--output', default='bench_results.json', help='JSON file to write results to')
+    parser.add_argument('--compare', help='JSON file with baseline results to compare against')
+    parser.add_argument('--sections', nargs='+', default=list(SECTIONS), choices=list(SECTIONS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=60,
+                        help='Max. expected time [s] of a single utilization benchmark, larger sizes are skipped')
+    parser.add_argument('--quick', action='store_true', help='Coarse grids and at most 10^3 load combinations')
+    parser.add_argument('--threshold', type=float, default=1.10, help='Ratio new/base reported as regression')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        results = run_benchmarks(args.sections, repeat=1, densities=((15, 10),), load_sizes=(10**2, 10**3),
+                                 budget=args.budget)
+    else:
+        results = run_benchmarks(args.sections, repeat=args.repeat, budget=args.budget)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        return 1 if compare(results, base, args.threshold) else 0
+
+    for r in results['results']:
+        if 'surface_ratio' in r:
+            # A slice should cost a fraction of the capacity surface it is cut from
+            flag = ' <--' if r['surface_ratio'] > 1 else ''
+            print('{:<26} {:<10} {:>9} {:>12.4g} s {:>6.2f} x surface{}'.format(r['name'], r['section'], r['size'],
+                                                                              r['min'], r['surface_ratio'], flag))
+        elif 'min' in r:
+            print('{:<26} {:<10} {:>9} {:>12.4g} s'.format(r['name'], r['section'], r['size'], r['min']))
+        else:
+            print('{:<26} {:<10} {:>9} {:>14}'.format(r['name'], r['section'], r['size'], r['skipped']))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,13 @@ from math import pi, cos, sin, tan, atan, atan2, sqrt, ceil, floor
 
 # Third party modules
 import numpy as np
-from scipy.spatial import ConvexHull
 import logging
 
 # Project specific modules
 import geometry
 import section_calc as sc
+from rebars import RebarLayout
+from section import Section
 
 '''
 DESCRIPTION
@@ -39,12 +40,16 @@ DESCRIPTION
     where
       - 'delta_v' is the vertical distance between the neutral axis and the inner stress block edge
       - 'na_y' is the y-ccordinate of the intersection btw. the y-axis and the neutral axis.
+
+    'cracked_section' solves the strain state of the cracked section for many load cases at once, with linear
+    elastic concrete without tension and linear elastic rebars. It is the basis of the crack width checks in
+    'crack_width'.
 '''
 
 
 # Pseudo code for calculating neutral axis by iteration
 
-def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
+def find_na(section, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
     """
     Return neutral axis of a reinforced concrete section given a loadcase (N, Mx, My).
 
@@ -57,11 +62,7 @@ def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
     Neutral axis has reference point at specified point (x, y).
 
     Args:
-        x (list)        : x-coordinates of cross section vertices
-        y (list)        : y-coordinates of cross section vertices
-        xr (list)       : x-coordinates of rebars
-        yr (list)       : y-coordinates of rebars
-        dia (list)      : Diameters of rebars
+        section (Section) : Cross section with concrete vertices and reinforcement layout
         P (float)       : Axial force (negative in compression)
         Mx (float)      : Moment about x-axis
         My (float)      : Moment about y-axis
@@ -72,6 +73,12 @@ def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
         angle (float)     : Angle in degress between neutral axis and x-axis
     """
 
+    from scipy.spatial import ConvexHull
+
+    # Section geometry
+    x, y = section.x, section.y
+    xr, yr, dia = section.xr, section.yr, section.rebars.dia
+
     # Setup
     itr_yn = 0
     itr_alpha = 0
@@ -96,12 +103,12 @@ def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
         EtAt = sc.transformed_axial_stiffness(x, y, xr, yr, dia, P, Ec=Ec, Es=Es)
 
         # Compute distances from concrete vertices and rebars to neutral axis
-        dv, dr = sc.compute_dist_to_na(x, y, xr, yr, 0, yn)
+        dv, dr = sc.compute_dist_to_na(section, 0, yn)
 
         # Get coordinates of most compressed concrete fiber
         # If section is only in tension this will be the most tensioned fibre
-        xmax = x[dv.index(min(dv))]
-        ymax = y[dv.index(min(dv))]
+        xmax = x[np.argmin(dv)]
+        ymax = y[np.argmin(dv)]
 
         # Compute elastic centroid
         xel, yel = sc.elastic_centroid(x, y, xr, yr, dia, Ec=Ec, Es=Es)
@@ -123,7 +130,7 @@ def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
         # Compute geometry of the concrete stress block
         
         # Get list of indices for stress block and extract corresponding x- and y-coordinates
-        idx_sb = np.where(np.array(dv) <= 0)[0].tolist()    
+        idx_sb = np.where(dv <= 0)[0].tolist()    
         dv_sb = [dv[i] for i in idx_sb]     # Distances from neutral axis to compression vertices
         x_sb = [x[i] for i in idx_sb]       # x-coordinates of stress block vertices
         y_sb = [y[i] for i in idx_sb]       # y-coordinates of stress block vertices
@@ -157,9 +164,9 @@ def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
         # NOTE There should be a notification if any rebars yields
 
         # Compute rebar forces
-        Fr_each = [sigma_r[i] * pi*dia[i]**2/4 for i in range(len(sigma_r))]
+        Fr_each = sigma_r * pi*np.asarray(dia, dtype=float)**2/4
 
-        Fr = sum(Fr_each)
+        Fr = Fr_each.sum()
         print('eps_sb =', eps_sb)
         print('Fc =', Fc)
         print('eps_r =', eps_r)
@@ -224,6 +231,143 @@ def find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=30*10**6, Es=200*10**6):
     return yn
 
 
+def _section_rings(section):
+    '''
+    Return the boundary rings of the concrete of a section as (x_ring, y_ring, sign), with sign -1 for holes.
+    The hole of an annular section is the polygon approximation of its inner circle.
+    '''
+    rings = [(section.x_ring, section.y_ring, 1.0)]
+    if section._is_circular and section.inner_radius > 0:
+        cx, cy = section.center
+        t = np.append(np.linspace(0, 2*pi, section.x.size, endpoint=False), 0)
+        rings.append((cx + section.inner_radius * np.cos(t), cy + section.inner_radius * np.sin(t), -1.0))
+    return rings
+
+
+def clipped_area_moments(rings, g0, gy, gx):
+    '''
+    Return the area moments of the parts of a section where g = g0 + gy*y + gx*x <= 0, for many lines at once.
+
+    The boundary of each part is made of the clipped edges of the section and segments along the line. The
+    moments are summed over triangles from a point on the line to each clipped edge, so the segments along the
+    line do not contribute and the parts need no assembly, also for non-convex sections.
+
+    Args:
+        rings (list)            : Boundary rings of the section, see '_section_rings'
+        g0, gy, gx (ndarray)    : Coefficients of the lines, shape (cases,)
+
+    Returns:
+        moments (ndarray)       : Integrals of 1, y, x, y**2, x*y and x**2 over the parts, shape (cases, 6)
+    '''
+    g0, gy, gx = (np.asarray(a, dtype=float)[:, None] for a in (g0, gy, gx))
+    moments = 0
+    for x_ring, y_ring, sign in rings:
+        # Point on the line closest to the first vertex (any point if the line is at infinity)
+        grad2 = gx**2 + gy**2
+        g_first = g0 + gy * y_ring[0] + gx * x_ring[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = np.where(grad2 > 0, g_first / grad2, 0)
+        ox = x_ring[0] - step * gx
+        oy = y_ring[0] - step * gy
+
+        # Clipped edges from parameter t0 to t1 along each edge, empty where both ends are outside
+        g = g0 + gy * y_ring + gx * x_ring
+        ga, gb = g[:, :-1], g[:, 1:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(ga / (ga - gb), 0, 1)
+        t0 = np.where(ga <= 0, 0, t)
+        t1 = np.where(gb <= 0, 1, t)
+        t1 = np.where((ga > 0) & (gb > 0), t0, t1)
+        dx, dy = np.diff(x_ring), np.diff(y_ring)
+        ax, ay = x_ring[:-1] + t0 * dx - ox, y_ring[:-1] + t0 * dy - oy
+        bx, by = x_ring[:-1] + t1 * dx - ox, y_ring[:-1] + t1 * dy - oy
+
+        # Moments of the triangles (o, a, b) about o
+        A = (ax * by - bx * ay) / 2
+        Sy = A * (ay + by) / 3
+        Sx = A * (ax + bx) / 3
+        Iyy = A * (ay**2 + ay * by + by**2) / 6
+        Ixy = A * (2 * ax * ay + ax * by + bx * ay + 2 * bx * by) / 12
+        Ixx = A * (ax**2 + ax * bx + bx**2) / 6
+        A, Sy, Sx, Iyy, Ixy, Ixx = (a.sum(axis=1) for a in (A, Sy, Sx, Iyy, Ixy, Ixx))
+
+        # Shift to the origin
+        ox, oy = ox[:, 0], oy[:, 0]
+        part = np.column_stack((A, Sy + oy * A, Sx + ox * A, Iyy + 2 * oy * Sy + oy**2 * A,
+                                Ixy + ox * Sy + oy * Sx + ox * oy * A, Ixx + 2 * ox * Sx + ox**2 * A))
+        moments = moments + sign * part
+    return moments
+
+
+def cracked_section(section, P, Mx, My, Ec, Es, reference=None, tol=1e-9, max_iter=50):
+    '''
+    Return the plane strain states of a cracked section for many load cases.
+
+    The concrete is linear elastic without tension and the rebars are linear elastic, with the concrete they
+    displace deducted in compression. The strain is eps(x, y) = eps0 - kx*y - ky*x as in
+    'moment_curvature.MomentCurvature', and the section forces are
+
+        (N, Mx, My) = K (eps0, kx, ky),   K = Ec * sum over the compression zone of g g^T dA + sum(Es_i * As_i g g^T)
+
+    with g = (1, -y, -x). K only depends on the compression zone and the bars in compression, which are
+    computed exactly for all cases at once (see 'clipped_area_moments'). The Newton iteration for the strain
+    state then reduces to solving K(u) u = F for the next state, starting from the uncracked section, and stops
+    when the compression zone does not change anymore.
+
+    Args:
+        section (Section)       : Section
+        P, Mx, My (ndarray)     : Load cases (P negative in compression)
+        Ec (float)              : Concrete modulus, e.g. the effective modulus for long term loads
+        Es (float/list)         : Rebar modulus, a single value or a sequence indexed by material ID
+        reference               : Moment reference point, see 'calc_uls.compute_capacity_surface'
+        tol (float)             : Tolerance of the relative residual of the section forces
+        max_iter (int)          : Maximum number of iterations
+
+    Returns:
+        eps0, kx, ky (ndarray)  : Strain at the origin and curvatures of each load case, NaN where the iteration
+                                  did not converge
+    '''
+    if reference is not None:
+        section = section.translated(-reference[0], -reference[1])
+    F = np.column_stack([np.atleast_1d(np.asarray(a, dtype=float)) for a in np.broadcast_arrays(P, Mx, My)])
+    n_cases = F.shape[0]
+    rings = _section_rings(section)
+    xr, yr = section.xr, section.yr
+    Es = section.rebars.per_bar(Es)
+    displaced = np.where(section.rebars_in_concrete, Ec, 0.0)
+    gr = np.column_stack((np.ones_like(xr), -yr, -xr))
+
+    def stiffness(u):
+        ''' Return the secant (and tangent) stiffness of strain states, shape (cases, 3, 3). '''
+        c = clipped_area_moments(rings, u[:, 0], -u[:, 1], -u[:, 2])
+        A, Sy, Sx, Iyy, Ixy, Ixx = c.T
+        K = Ec * np.stack((np.column_stack((A, -Sy, -Sx)),
+                           np.column_stack((-Sy, Iyy, Ixy)),
+                           np.column_stack((-Sx, Ixy, Ixx))), axis=1)
+        eps_r = u[:, :1] - u[:, 1:2] * yr - u[:, 2:] * xr
+        E_r = (Es - np.where(eps_r < 0, displaced, 0)) * section.As
+        return K + np.einsum('cm,mi,mj->cij', E_r, gr, gr)
+
+    # Start from the uncracked section, where the whole section is in compression
+    u = np.tile([-1.0, 0.0, 0.0], (n_cases, 1))
+    size = max(section.bbox[2] - section.bbox[0], section.bbox[3] - section.bbox[1])
+    weights = np.array([1, 1 / size, 1 / size])
+    scale = np.abs(F) @ weights
+    scale[scale == 0] = 1
+    active = np.arange(n_cases)
+    converged = np.zeros(n_cases, dtype=bool)
+    for _ in range(max_iter):
+        u[active] = np.linalg.solve(stiffness(u[active]), F[active][:, :, None])[:, :, 0]
+        residual = np.einsum('cij,cj->ci', stiffness(u[active]), u[active]) - F[active]
+        done = np.abs(residual) @ weights <= tol * scale[active]
+        converged[active[done]] = True
+        active = active[~done]
+        if active.size == 0:
+            break
+    u[~converged] = np.nan
+    return u[:, 0], u[:, 1], u[:, 2]
+
+
 # # Compute stress block centroid
 
 # # NOTE Assumed solution: Only vertices have wieghts. They are set equal to 2/3 times 
@@ -239,7 +383,6 @@ if __name__ == '__main__':
 
     b = 0.250
     h = 0.500
-    dia = [pi*0.020**2/4] * 3      # Rebar diameters [in] (No. 7 bars)
     c = 0.040
     Ec = 33 
     Es = 200      
@@ -247,11 +390,10 @@ if __name__ == '__main__':
 
     x = [0, b, b, 0]
     y = [0, 0, h, h]
-    xr = [b/3, b/2, 2/3*b]
-    yr = [c, c, c]
+    section = Section(x, y, RebarLayout([b/3, b/2, 2/3*b], [c, c, c], dia=0.020))
 
     P = -80
     Mx = 91
     My = 0
 
-    print('yn =', find_na(x, y, xr, yr, dia, P, Mx, My, fyd, Ec=Ec, Es=Es))
+    print('yn =', find_na(section, P, Mx, My, fyd, Ec=Ec, Es=Es))
@@ -4,23 +4,16 @@ import logging
 
 # Third party packages
 import numpy as np
-import pandas as pd
-from scipy.spatial import ConvexHull
-import matplotlib.pyplot as plt
-import matplotlib.path as mpath
-import matplotlib.lines as mlines
-import matplotlib.patches as mpatches
-import matplotlib.patches as patches
-from matplotlib.collections import PatchCollection
-from matplotlib.patches import Circle, Wedge, Polygon
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib.pyplot as plt
 
 # Project specific packages
 import section_calc as sc
-import section_plot_uls
-from geometry import point_to_point_dist_3d
-from geometry import line_hull_intersection
+import instrumentation
+import kernels
+from rebars import RebarLayout
+from section import Section
+from geometry import point_to_point_dist_3d, line_offset, line_y_intersect, signed_distances
+from geometry import line_hull_intersection, hull_gauge
+from facet_index import FacetIndex
 
 '''
 DESCRIPTION
@@ -43,73 +36,410 @@ DESCRIPTION
     where
       - 'delta_v' is the vertical distance between the neutral axis and the inner stress block edge
       - 'na_y' is the y-ccordinate of the intersection btw. the y-axis and the neutral axis.
+
+    The calculations use the neutral axis in normal form, d = x*sin(alpha) - y*cos(alpha) + o with the offset
+    o = na_y*cos(alpha), which is also defined for vertical neutral axes, see 'geometry.line_normal'.
 '''
 
-# TODO Neutral axis rotation should about plastic centroid, see 'Structural Analysis of Cross Sections', p. 190
+# NOTE Neutral axis rotation should be about plastic centroid, see 'Structural Analysis of Cross Sections', p. 190. Use
+#      reference='plastic' in 'compute_capacity_surface' for this.
 # TODO Check for EQ between P, C and T after each run
 
-# Create log file and set default logging statement
-FORMAT = '%(name)-15s %(message)s'
-filename = 'test.log'
-logging.basicConfig(filename=filename, level=logging.DEBUG, filemode='w', format=FORMAT)
-
 np.set_printoptions(precision=2)
 
 
 def compute_capacities(Fc, Fr, Mcx, Mcy, Mrx, Mry):
     '''    Returns capacities P, Mx and My    '''
     # Total capacities
-    P = sum(Fr) + Fc
-    Mx = sum(Mrx) + Mcx
-    My = sum(Mry) + Mcy
+    P = np.sum(Fr) + Fc
+    Mx = np.sum(Mrx) + Mcx
+    My = np.sum(Mry) + Mcy
 
     return P, Mx, My
 
 
-def compute_capacity_surface(x, y, xr, yr, fcd, fyd, Es, eps_cu, As, lambda_=0.80,  rotation_step=5, vertical_step=10):
-    ''' Returns coordinates for capacity surface of cross section (axial load and moments)'''
-    # TODO Find a good way to define steps and loop over entire function
-    # TODO Find a better way to represent increments for na_y, right now 0 is being computed twice __
-    # TODO __ Stop varying na_y if pure tension or compression is found, i.e. if the moment capacities both become 0 __
-    # TODO __ See GitHub Issue #2
-    vs = vertical_step
-    h = max(x) - min(x)
-    na_y_list = list(np.linspace((min(x)-h/3), 0, vs)) + list(np.linspace(0, (max(x)+h/3), vs))
-    alpha_list = [alpha for alpha in range(0, 360, rotation_step)]
+def fundamental_angles(alpha_list, sym_x, sym_y):
+    '''
+    Return the neutral axis angles that need to be evaluated for a section with the given symmetry. The
+    remaining part of the capacity surface is found by reflecting the results, see 'reflect_capacities'.
+    '''
+    if sym_x and sym_y:
+        return [a for a in alpha_list if 0 <= a % 360 <= 90]
+    elif sym_y:
+        return [a for a in alpha_list if 0 <= a % 360 <= 180]
+    elif sym_x:
+        return [a for a in alpha_list if a % 360 <= 90 or a % 360 >= 270]
+    return list(alpha_list)
 
-    P_list = []
-    Mx_list = []
-    My_list = []
-    na_y_computed = []
-    alpha_computed = []
-    for na_y in na_y_list:
-        for alpha_deg in alpha_list:
 
-            # Perform cross section ULS analysis
-            Fc, Fr, Asb, sb_cog, _, _ = sc.perform_section_analysis(x, y, xr, yr, fcd, fyd, Es, eps_cu, As, alpha_deg, na_y, lambda_=lambda_)
+def reflect_capacities(P, Mx, My, na_y, alpha, axis, centroid):
+    '''
+    Return capacities of the mirror images of the given neutral axis states for a section that is symmetric
+    about a horizontal (axis='x') or vertical (axis='y') axis through its centroid.
 
-            # Compute individual moments generated in the section
-            Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(xr, yr, Asb, sb_cog, Fc, Fr)
+    States whose neutral axis is mapped onto itself by the reflection are left out, as they would only
+    duplicate existing points.
 
-            # Compute capacities
-            P, Mx, My = compute_capacities(Fc, Fr, Mcx, Mcy, Mrx, Mry)
+    Args:
+        P, Mx, My (ndarray)     : Capacities of the evaluated states
+        na_y, alpha (ndarray)   : Neutral axis locations and angles [deg] of the evaluated states
+        axis (str)              : 'x' for reflection y -> -y, 'y' for reflection x -> -x (about the centroid)
+        centroid (tuple)        : Centroid of the section
 
-            # Update lists of calculated pairs of vertical local and anlge for neutral axis
-            na_y_computed.append(na_y)
-            alpha_computed.append(alpha_deg)
+    Returns:
+        P, Mx, My, na_y, alpha (ndarray) for the reflected states
+    '''
+    Cx, Cy = centroid
+    alpha_rad = np.radians(alpha)
+
+    # Offset of neutral axis in normal form, d = x*sin(a) - y*cos(a) + o
+    offset = line_offset(alpha, na_y)
+    if axis == 'x':
+        # Neutral axis with angle a is mirrored into angle 180 - a, i.e. y = 2*Cy - na_y for non-vertical axes
+        keep = (alpha % 180) != 90
+        alpha_m = (180 - alpha) % 360
+        offset_m = offset - 2*Cy*np.cos(alpha_rad)
+        Mx_m = -2*Cy*P - Mx
+        My_m = My
+    else:
+        # Neutral axis with angle a is mirrored into angle -a, i.e. na_y + 2*Cx*tan(a) for non-vertical axes
+        keep = (alpha % 180) != 0
+        alpha_m = (-alpha) % 360
+        offset_m = offset + 2*Cx*np.sin(alpha_rad)
+        Mx_m = Mx
+        My_m = -2*Cx*P - My
+    na_y_m = line_y_intersect(alpha_m, offset_m)
+
+    return P[keep], Mx_m[keep], My_m[keep], na_y_m[keep], alpha_m[keep]
+
+
+def rotate_capacities(P, Mx, My, na_y, alpha, order, center):
+    '''
+    Return capacities of the rotated images of the given neutral axis states for a section with rotational
+    symmetry of the given order about 'center', i.e. rotations by k*360/order degrees for k = 1, ..., order-1.
 
-            # Store iteration results
-            P_list.append(P)
-            Mx_list.append(Mx)
-            My_list.append(My)
+    The moment vector (My, Mx) = -sum(F*(x, y)) rotates with the section about its centre, while the axial
+    force is unchanged.
 
-    return P_list, Mx_list, My_list, na_y_computed, alpha_computed
+    Args:
+        P, Mx, My (ndarray)     : Capacities of the evaluated states
+        na_y, alpha (ndarray)   : Neutral axis locations and angles [deg] of the evaluated states
+        order (int)             : Order of rotational symmetry
+        center (tuple)          : Centre of rotation
+
+    Returns:
+        P, Mx, My, na_y, alpha (ndarray) for the rotated states
+    '''
+    cx, cy = center
+    alpha_rad = np.radians(alpha)
+
+    # Offset of neutral axis in normal form, d = x*sin(a) - y*cos(a) + o
+    offset = line_offset(alpha, na_y)
+
+    # Moment vector about the centre of rotation
+    mx = My + P * cx
+    my = Mx + P * cy
+
+    rotated = [[], [], [], [], []]
+    for k in range(1, order):
+        theta = 2*pi * k / order
+        alpha_k = alpha_rad + theta
+        offset_k = (offset + (np.sin(alpha_rad) - np.sin(alpha_k)) * cx
+                    - (np.cos(alpha_rad) - np.cos(alpha_k)) * cy)
+        alpha_k = np.degrees(alpha_k) % 360
+        rotated[0].append(P)
+        rotated[1].append(mx * sin(theta) + my * cos(theta) - P * cy)
+        rotated[2].append(mx * cos(theta) - my * sin(theta) - P * cx)
+        rotated[3].append(line_y_intersect(alpha_k, offset_k))
+        rotated[4].append(alpha_k)
+
+    return [np.concatenate(r) for r in rotated]
+
+
+def pole_capacities(section, fcd, fyd, Es, eps_cu, lambda_=0.80):
+    '''
+    Return capacities of the limit states where the neutral axis is infinitely far from the section, i.e.
+    uniform strain 'eps_cu' in tension (no concrete) and in compression (entire section as stress block).
+    These are the poles where all meridians of the capacity surface meet.
+
+    Returns:
+        tension (tuple)         : (P, Mx, My) of the pure tension pole
+        compression (tuple)     : (P, Mx, My) of the pure compression pole
+    '''
+    strain = np.full(len(section.rebars), float(eps_cu))
+    poles = []
+    for sign, Asb, sb_cog, inside in ((1, 0, None, np.zeros(strain.size, dtype=bool)),
+                                      (-1, section.area, section.centroid, section.rebars_in_concrete)):
+        sigma_r = sc.compute_rebar_stress(sign * strain, Es, fyd)
+        Fr = sc.compute_rebar_forces(section.xr, section.yr, section.As, sigma_r, inside, fcd, lambda_=lambda_)
+        Fc = sc.compute_concrete_force(fcd, Asb, lambda_=lambda_)
+        Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(section.xr, section.yr, Asb, sb_cog, Fc, Fr)
+        poles.append(compute_capacities(Fc, Fr, Mcx, Mcy, Mrx, Mry))
+    return tuple(poles)
+
+
+def capacity_mesh(P, Mx, My, alpha, boundary=None):
+    '''
+    Return a triangle mesh of a capacity surface from the structure of its (angle, depth) parameter grid.
+
+    The states of each neutral axis angle form a meridian of the surface from the tension side to the
+    compression side, and consecutive meridians are connected by quads split into two triangles. States with
+    a non-finite angle are the two poles (see 'pole_capacities'), where the first and last points of all
+    meridians are connected by triangle fans. The mesh is closed and its facets are oriented outwards.
+
+    States inside the surface, e.g. the pure tension states of neutral axes outside the tension edge, fold the
+    mesh inwards and are left out with 'boundary'. Each quad is split along the diagonal that keeps it convex,
+    i.e. with the fourth vertex on the inner side of the first triangle.
+
+    The states of each angle must appear in order of increasing depth of the compression zone, which is
+    the case for the results of 'compute_capacity_surface'.
+
+    Args:
+        P, Mx, My (ndarray)     : Capacity surface points
+        alpha (ndarray)         : Neutral axis angle [deg] of each point, NaN for the poles
+        boundary (ndarray)      : Boolean mask of the states on the surface, all states if not given. The same
+                                  number of states of each angle must be on the surface.
+
+    Returns:
+        faces (ndarray)         : Array of shape (m, 3) with vertex indices of each triangle
+    '''
+    P = np.asarray(P, dtype=float)
+    alpha = np.asarray(alpha, dtype=float)
+    on_surface = np.ones(alpha.size, dtype=bool) if boundary is None else np.asarray(boundary, dtype=bool)
+    finite = np.flatnonzero(np.isfinite(alpha) & on_surface)
+    poles = np.flatnonzero(~np.isfinite(alpha))
+
+    # Group states by angle, a stable sort keeps the depth order within each meridian
+    angles = np.round(alpha[finite] % 360, 9)
+    order = finite[np.argsort(angles, kind='stable')]
+    _, counts = np.unique(angles, return_counts=True)
+    if counts.size < 3 or np.any(counts != counts[0]):
+        raise ValueError('Capacity surface states do not form a structured (angle, depth) grid.')
+    grid = order.reshape(counts.size, counts[0])
+
+    # Quads (a0, b0, b1, a1) between each meridian and the next one (cyclic)
+    a = grid
+    b = np.roll(grid, -1, axis=0)
+    a0, b0, b1, a1 = a[:, :-1], b[:, :-1], b[:, 1:], a[:, 1:]
+    faces = [np.stack((a0, b0, b1), axis=-1).reshape(-1, 3), np.stack((a0, b1, a1), axis=-1).reshape(-1, 3)]
+
+    # Triangle fans to the poles, the pole with the largest axial force is the tension pole
+    if poles.size == 2:
+        tension, compression = poles[np.argsort(-P[poles])]
+        faces.append(np.column_stack((np.full(a.shape[0], tension), b[:, 0], a[:, 0])))
+        faces.append(np.column_stack((np.full(a.shape[0], compression), a[:, -1], b[:, -1])))
+
+    # Orientation of the facets, positive if the enclosed volume is positive, i.e. the facets point outwards
+    v = np.column_stack((P, Mx, My))
+    v = v - v.mean(axis=0)
+    f = np.concatenate(faces)
+    sign = 1.0 if np.einsum('ij,ij->i', v[f[:, 0]], np.cross(v[f[:, 1]], v[f[:, 2]])).sum() >= 0 else -1.0
+
+    # Split the quads where a1 is outside the triangle (a0, b0, b1) along the other diagonal
+    normal = sign * np.cross(v[b0] - v[a0], v[b1] - v[a0])
+    flip = (np.einsum('...i,...i->...', normal, v[a1] - v[a0]) > 0)[..., None]
+    faces[0] = np.where(flip, np.stack((a0, b0, a1), axis=-1), np.stack((a0, b0, b1), axis=-1)).reshape(-1, 3)
+    faces[1] = np.where(flip, np.stack((b0, b1, a1), axis=-1), np.stack((a0, b1, a1), axis=-1)).reshape(-1, 3)
+    faces = np.concatenate(faces)
+    if sign < 0:
+        faces = faces[:, ::-1]
+    return np.ascontiguousarray(faces)
+
+
+def reference_section(section, fcd, fyd, lambda_=0.80, reference=None):
+    '''
+    Return the section translated so the moment reference point is at the origin, see
+    'compute_capacity_surface'. The section itself is returned if 'reference' is None.
+    '''
+    if reference is None:
+        return section
+    if reference == 'plastic':
+        reference = section.plastic_centroid(fcd, fyd, eta=lambda_)
+    return section.translated(-reference[0], -reference[1])
+
+
+def neutral_axis_offsets(section, alpha_deg, depths):
+    '''
+    Return the offsets in normal form (see 'geometry.line_normal') of neutral axes with angle 'alpha_deg' at
+    relative depths of the compression zone, where 0 is the tension edge (entire section in tension) and 1 is
+    the compression edge (entire section in compression) of the section. Use 'geometry.line_y_intersect' for
+    the corresponding locations 'na_y'.
+    '''
+    # Offsets 'o' of the neutral axis in normal form, d = x*sin(a) - y*cos(a) + o, from the tension edge
+    # (all d >= 0) to the compression edge (all d <= 0) of the section
+    x, y = section.fibre_points(alpha_deg)
+    s = signed_distances(x, y, alpha_deg, 0)
+    return -s.min() - np.asarray(depths, dtype=float) * (s.max() - s.min())
+
+
+def section_capacity(section, fcd, fyd, Es, eps_cu, alpha_deg, na_y, lambda_=0.80, offset=None):
+    '''
+    Return the capacities P, Mx and My of the section for a single neutral axis state, given by 'na_y' or by
+    its offset in normal form.
+    '''
+    Fc, Fr, Asb, sb_cog, _, _ = sc.perform_section_analysis(section, fcd, fyd, Es, eps_cu, alpha_deg, na_y,
+                                                            lambda_=lambda_, offset=offset)
+    Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(section.xr, section.yr, Asb, sb_cog, Fc, Fr)
+    return compute_capacities(Fc, Fr, Mcx, Mcy, Mrx, Mry)
+
+
+def compute_capacity_surface(section, fcd, fyd, Es, eps_cu, lambda_=0.80,  rotation_step=5, vertical_step=10,
+                             reference=None, use_symmetry=True, return_mesh=False, backend=None):
+    '''
+    Returns coordinates for capacity surface of cross section (axial load and moments)
+
+    Rebar properties 'fyd' and 'Es' can be given as single values for all bars or as arrays
+    with one value per bar, see 'rebars.RebarLayout.per_bar'.
+
+    For each neutral axis angle, 2*vertical_step neutral axis locations are evaluated. They run
+    from a third of the section depth (normal to the neutral axis) outside the tension edge to a
+    third of the depth outside the compression edge, so each angle gives a meridian of the surface
+    from the tension side to the compression side. The two poles where the meridians meet (see
+    'pole_capacities') are included as the last two points with NaN as neutral axis location and
+    angle. For vertical neutral axes, 'na_y' is very large but converts back to the offset of the
+    neutral axis in normal form, see 'geometry.line_y_intersect'.
+
+    Moments are taken about the origin of the section coordinate system by default. With
+    reference='plastic' they are taken about the plastic centroid of the section, and a tuple
+    (x0, y0) gives an arbitrary reference point. The neutral axis locations 'na_y' are then
+    measured in a coordinate system with origin at the reference point, so the surface does
+    not depend on where the section was placed when it was defined.
+
+    If the section is symmetric (see 'Section.symmetry'), only the neutral axis angles in the
+    fundamental sector are evaluated and the rest of the surface is found by reflection. For
+    circular sections with rotational symmetry (see 'Section.rotational_symmetry') the sector
+    is 360/n degrees for n equally spaced bars, and the rest is found by rotation. Steel
+    properties must be the same for all bars of the same material ID for this to hold, which is
+    always the case when they are given by 'RebarLayout.per_bar'.
+
+    With return_mesh=True, the triangles of the surface (see 'capacity_mesh') are returned as
+    well, as an array of vertex indices into the returned points. Only the states with the neutral
+    axis within the section are connected, the others are inside the surface.
+
+    The section states are analysed by the JIT compiled kernel when numba is installed and the
+    section is a polygon, see 'kernels'. Use backend='numpy' to analyse each state with
+    'section_calc.perform_section_analysis'.
+
+    Stage timings and the number of states of each type (pure tension, pure compression, mixed) are recorded
+    when profiling is enabled, see 'instrumentation'. The kernel analyses all states in one call, so the stages
+    of the analysis of each state ('perform_section_analysis.*') are only timed with backend='numpy'.
+    '''
+    prof = instrumentation.active()
+    if prof is not None:
+        t = prof.call('compute_capacity_surface')
+
+    section = reference_section(section, fcd, fyd, lambda_, reference)
 
+    # Angles of the neutral axis
+    alpha_list = list(range(0, 360, rotation_step))
 
-from scipy.optimize import linprog
+    # Only evaluate the fundamental sector of angles for symmetric sections
+    order = section.rotational_symmetry() if use_symmetry else 1
+    if order > 1:
+        sym_x, sym_y = False, False
+        alpha_list = [a for a in alpha_list if a < 360 / order]
+    else:
+        sym_x, sym_y = section.symmetry() if use_symmetry else (False, False)
+        alpha_list = fundamental_angles(alpha_list, sym_x, sym_y)
+    if prof is not None:
+        t = prof.lap('compute_capacity_surface.setup', t)
+
+    # Relative locations of the neutral axis from the tension edge (0) to the compression edge (1)
+    depths = np.linspace(-1/3, 4/3, 2*vertical_step)
+
+    P_list = []
+    Mx_list = []
+    My_list = []
+    na_y_computed = []
+    alpha_computed = []
+    if backend is None:
+        backend = kernels.select_backend(section)
+    if backend == 'numba':
+        # All states in one batch
+        alpha_computed = np.repeat(np.array(alpha_list, dtype=float), depths.size)
+        offsets = [neutral_axis_offsets(section, alpha_deg, depths) for alpha_deg in alpha_list]
+        if prof is not None:
+            # State types as counted by 'section_calc.perform_section_analysis' on the NumPy path
+            for alpha_deg, o in zip(alpha_list, offsets):
+                dv, _ = sc.compute_dist_to_na(section, alpha_deg, None, offset=o)
+                tension = dv.min(axis=1) >= 0
+                compression = ~tension & (dv.max(axis=1) <= 0)
+                prof.count('states.pure_tension', int(tension.sum()))
+                prof.count('states.pure_compression', int(compression.sum()))
+                prof.count('states.mixed', int((~tension & ~compression).sum()))
+            t = prof.lap('compute_capacity_surface.state_types', t)
+        offsets = np.concatenate(offsets)
+        P_list, Mx_list, My_list = kernels.section_states(section, fcd, fyd, Es, eps_cu, alpha_computed, offsets,
+                                                          lambda_=lambda_, backend=backend)
+        na_y_computed = line_y_intersect(alpha_computed, offsets)
+        if prof is not None:
+            t = prof.lap('compute_capacity_surface.kernel', t)
+    else:
+        for alpha_deg in alpha_list:
+            # Distances to the neutral axis for all locations of this angle at once
+            offsets = neutral_axis_offsets(section, alpha_deg, depths)
+            dv_all, dr_all = sc.compute_dist_to_na(section, alpha_deg, None, offset=offsets)
+
+            for na_y, dv, dr in zip(line_y_intersect(alpha_deg, offsets), dv_all, dr_all):
+
+                # Perform cross section ULS analysis
+                Fc, Fr, Asb, sb_cog, _, _ = sc.perform_section_analysis(section, fcd, fyd, Es, eps_cu, alpha_deg, na_y,
+                                                                        lambda_=lambda_, distances=(dv, dr))
+                if prof is not None:
+                    t = prof.lap('compute_capacity_surface.section_analysis', t)
+
+                # Compute individual moments generated in the section
+                Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(section.xr, section.yr, Asb, sb_cog, Fc, Fr)
+
+                # Compute capacities
+                P, Mx, My = compute_capacities(Fc, Fr, Mcx, Mcy, Mrx, Mry)
+
+                # Update lists of calculated pairs of vertical local and anlge for neutral axis
+                na_y_computed.append(na_y)
+                alpha_computed.append(alpha_deg)
+
+                # Store iteration results
+                P_list.append(P)
+                Mx_list.append(Mx)
+                My_list.append(My)
+                if prof is not None:
+                    t = prof.lap('compute_capacity_surface.capacities', t)
+
+    # Generate the remaining part of the surface by rotation or reflection
+    results = [np.array(r, dtype=float) for r in (P_list, Mx_list, My_list, na_y_computed, alpha_computed)]
+    if order > 1:
+        rotated = rotate_capacities(*results, order=order, center=section.centroid)
+        results = [np.concatenate((r, m)) for r, m in zip(results, rotated)]
+    for axis, symmetric in (('y', sym_y), ('x', sym_x)):
+        if symmetric:
+            mirrored = reflect_capacities(*results, axis=axis, centroid=section.centroid)
+            results = [np.concatenate((r, m)) for r, m in zip(results, mirrored)]
+
+    # Add the poles of the surface
+    for pole in pole_capacities(section, fcd, fyd, Es, eps_cu, lambda_=lambda_):
+        results = [np.append(r, v) for r, v in zip(results, pole + (np.nan, np.nan))]
+    P_list, Mx_list, My_list, na_y_computed, alpha_computed = [list(r) for r in results]
+    if prof is not None:
+        t = prof.lap('compute_capacity_surface.symmetry', t)
+        n_evaluated = depths.size * len(alpha_list)
+        prof.count('states.evaluated', n_evaluated)
+        prof.count('states.by_symmetry', len(P_list) - n_evaluated - 2)
+
+    if return_mesh:
+        # Only mixed states are on the surface, the neutral axes outside the section give interior states
+        boundary = np.tile((depths > 0) & (depths < 1), (len(results[0]) - 2) // depths.size)
+        boundary = np.append(boundary, [True, True])
+        faces = capacity_mesh(results[0], results[1], results[2], results[4], boundary=boundary)
+        if prof is not None:
+            prof.lap('compute_capacity_surface.mesh', t)
+        return P_list, Mx_list, My_list, na_y_computed, alpha_computed, faces
+
+    return P_list, Mx_list, My_list, na_y_computed, alpha_computed
 
 
 def in_point_cloud(points, x):
+    from scipy.optimize import linprog
+
     n_points = len(points)
     n_dim = len(x)
     c = np.zeros(n_points)
@@ -119,7 +449,8 @@ def in_point_cloud(points, x):
     return lp.success
 
 
-def utilization_ratio(Ped, Mxed, Myed, P_capsurf, Mx_capsurf, My_capsurf):
+def utilization_ratio(Ped, Mxed, Myed, P_capsurf, Mx_capsurf, My_capsurf, hull_equations=None, faces=None,
+                      index=None):
     '''
     Return the utilization ratio as the ratio between the distance from the load
     combination point to Origo and the distance from Origo to capacity surface in
@@ -127,42 +458,132 @@ def utilization_ratio(Ped, Mxed, Myed, P_capsurf, Mx_capsurf, My_capsurf):
 
     Args:
     all inputs are lists...
+    hull_equations (ndarray)    : Facet equations of the convex hull of the capacity surface, e.g. from a
+                                  'surface_store.SurfaceStore'. Computed from the surface points if not given.
+    faces (ndarray)             : Triangles of the capacity surface, see 'capacity_mesh'. If given, the
+                                  utilization is found by intersecting the load directions with the mesh
+                                  directly instead of with the convex hull of the points.
+    index (FacetIndex)          : Angular index of the mesh facets, see 'facet_index'. Built from 'faces' if
+                                  not given, pass it to reuse the index for several calls.
 
     Returns
         ur as list
     '''
+    if faces is not None or index is not None:
+        comb_array = np.transpose(np.array([Ped, Mxed, Myed], dtype=float))
+        if index is None:
+            index = FacetIndex(np.column_stack((P_capsurf, Mx_capsurf, My_capsurf)), faces)
+        with np.errstate(divide='ignore'):
+            ur = 1 / index.intersect(comb_array)
+
+        # Load combinations where all loads are 0 have no direction
+        ur[np.all(comb_array == 0, axis=1)] = 0.0
+        return list(ur)
+
 
     # Compute convex hull of the capacity surface point cloud
-    cap_surf = np.transpose(np.array([P_capsurf, Mx_capsurf, My_capsurf]))
-    convex_hull = ConvexHull(cap_surf)
-
-    # Compute distance from Origo to all load combination points
-    comb_array = np.transpose(np.array([Ped, Mxed, Myed]))
-    lc_dist = [point_to_point_dist_3d([0, 0, 0], lc) for lc in comb_array]
-
-    # Compute distance from Origo to all capacity surface points in line with load combinations
-    # cap_intersections = [line_hull_intersection(lc, convex_hull) for lc in comb_array]
-    cap_intersections = [line_hull_intersection(lc, convex_hull) for lc in comb_array]
-    cap_dist = [point_to_point_dist_3d([0, 0, 0], cap) for cap in cap_intersections]
-
-    # A for loop is made here in favor of a list comprehension in order to catch
-    # the case where all loads in combination is 0. In that case, the Vector
-    # has no direction.
-    # Compute utilization ratios for all load combinations
-    ur = []
-    for i in range(len(comb_array)):
-        # if not np.all(np.nonzero(comb_array[i])):
-        if np.all(comb_array[i] == 0):
-            # All external loads are 0, i.e. P=0, Mx=0 and My=0
-            ur.append(0.00)
-        else:
-            # Some loads are nonzero
-            ur.append(lc_dist[i] / cap_dist[i])
+    if hull_equations is None:
+        from scipy.spatial import ConvexHull
+        cap_surf = np.transpose(np.array([P_capsurf, Mx_capsurf, My_capsurf]))
+        convex_hull = ConvexHull(cap_surf)
+    else:
+        convex_hull = hull_equations
+
+    # The utilization ratio is the gauge of the load combination point with respect to the convex hull, i.e.
+    # the ratio between the distances from Origo to the point and to the hull in the direction of the point.
+    # Load combinations where all loads are 0 have no direction and get 0
+    comb_array = np.transpose(np.array([Ped, Mxed, Myed], dtype=float))
+    equations = getattr(convex_hull, 'equations', convex_hull)
+    ur = hull_gauge(comb_array.reshape(-1, 3), equations).tolist()
 
     return ur
 
+
+def extreme_loads(Ped, Mxed, Myed, tol=1e-9):
+    '''
+    Return the indices of the load combinations at the vertices of the convex hull of the load combination points.
+
+    Load clouds that are flat or on a line (e.g. My = 0 for all combinations) are handled by taking the hull in
+    the plane or on the line of the points.
+
+    Args:
+        tol (float)         : Relative tolerance on the extent of the cloud for a direction to count as flat
+
+    Returns:
+        idx (ndarray)       : Sorted indices of the extreme load combinations
+    '''
+    points = np.column_stack((Ped, Mxed, Myed)).astype(float)
+    if points.shape[0] <= 4:
+        return np.arange(points.shape[0])
+
+    # Scale the axes to comparable magnitudes, which does not change which points are extreme
+    scale = np.abs(points).max(axis=0)
+    scale[scale == 0] = 1
+    points = points / scale
+    points = points - points.mean(axis=0)
+
+    # Principal directions of the cloud, where directions without extent are left out
+    eigval, eigvec = np.linalg.eigh(points.T @ points)
+    extent = np.sqrt(np.maximum(eigval, 0))
+    axes = eigvec[:, extent > tol * extent.max()] if extent.max() > 0 else eigvec[:, :0]
+    projected = points @ axes
+
+    if axes.shape[1] == 0:
+        # All load combinations are the same point
+        return np.array([0])
+    if axes.shape[1] == 1:
+        return np.unique([np.argmin(projected[:, 0]), np.argmax(projected[:, 0])])
+
+    from scipy.spatial import ConvexHull
+    return np.sort(ConvexHull(projected).vertices)
+
+
+def governing_load(Ped, Mxed, Myed, P_capsurf, Mx_capsurf, My_capsurf, pinned=None, hull_equations=None, faces=None,
+                   index=None):
+    '''
+    Return the largest utilization ratio of a set of load combinations and the index of the governing one.
+
+    The utilization ratio is the gauge function of the convex hull of the capacity surface, which is convex in
+    the load combination. Its maximum over a set of load combinations is then reached at a vertex of the convex
+    hull of the load combinations, so only these (see 'extreme_loads') and the 'pinned' ones are checked.
+
+    With 'faces' or 'index', the utilization ratio is measured against the mesh, which connects only the states
+    on the surface and is split into convex quads (see 'capacity_mesh'), so the same load combinations are checked.
+
+    Args:
+        Ped, Mxed, Myed (ndarray)   : Load combinations
+        pinned (list)               : Indices of load combinations that are always checked
+        hull_equations, faces, index: See 'utilization_ratio'
+
+    Returns:
+        ur (float)                  : Largest utilization ratio
+        i (int)                     : Index of the governing load combination in the input
+    '''
+    prof = instrumentation.active()
+    candidates = extreme_loads(Ped, Mxed, Myed)
+    if pinned is not None:
+        candidates = np.union1d(candidates, np.asarray(pinned, dtype=int))
+    if prof is not None:
+        prof.count('loads.total', len(Ped))
+        prof.count('loads.checked', candidates.size)
+
+    ur = utilization_ratio(np.asarray(Ped, dtype=float)[candidates], np.asarray(Mxed, dtype=float)[candidates],
+                           np.asarray(Myed, dtype=float)[candidates], P_capsurf, Mx_capsurf, My_capsurf,
+                           hull_equations=hull_equations, faces=faces, index=index)
+    k = int(np.argmax(ur))
+    return ur[k], int(candidates[k])
+
 if __name__ == '__main__':
 
+    # Plotting and reporting packages are only needed when the module is run as a script
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    from mpl_toolkits.mplot3d import Axes3D
+    import section_plot_ULS as section_plot_uls
+    from scipy.spatial import ConvexHull
+
+    sc.configure_logging(level=logging.DEBUG)
+
     '''
     1 ksi       ===>  6.895 MPa       (4 ksi          ===>    27.57 MPa)
     1 kip       ===>  4.448 kN        (400 kip        ===>    1779 kN                 1300 kip    ===>    5783 kN)
@@ -190,7 +611,6 @@ if __name__ == '__main__':
     FYK = 500     # [MPa]
     GAMMA_S = 1.15
     FYD = FYK/GAMMA_S
-    AS = pi*25**2/4  # [mm^2]
 
     # Define concrete geometry by polygon vertices
     x = [-8, 8, 8, -8]
@@ -245,9 +665,9 @@ if __name__ == '__main__':
     # yr = [ 0,  4.5,  7.8,  8,  7.8,  4.5,   0,   -4.5,  -7.8, -7.8, -7.8, -4.5 ]
 
 
-    # Ø = ['insert rebar sizes']    # IMPLEMENT
-    # Ø = 25
-    # As = pi * (Ø / 2)**2   # [in^2]    FIXME This is only the area of a single bar
+    # Rebar sizes (bars can have different sizes and steel grades)
+    bars = RebarLayout(xr, yr, dia=[25, 25, 20, 20, 16, 25])
+    section = Section(x, y, bars)
 
     # NOTE lambda = 0.8 in Eurocode for concrete strengths < C50
     beta_1 = 0.80      # Factor for compression zone height of Whitney stress block
@@ -261,7 +681,7 @@ if __name__ == '__main__':
     na_y = -50       # Distance from x-axis to intersection btw. neutral axis and y-axis
     # NOTE na_y Should be infinite if alpha is 90 or 270
 
-    # P, Mx, My, na_y_computed, alpha_computed = compute_capacity_surface(x, y, xr, yr, FCD, FYD, ES, EPS_CU, AS, lambda_=LAMBDA)
+    # P, Mx, My, na_y_computed, alpha_computed = compute_capacity_surface(section, FCD, FYD, ES, EPS_CU, lambda_=LAMBDA)
 
     # Plot capacity surface
     plot_capacity_surface = 'No'
@@ -272,10 +692,10 @@ if __name__ == '__main__':
         df.to_csv('df_results.csv', sep='\t')
 
     # Compute force for neutral axis location
-    Fc, Fr, Asb, sb_cog, x_sb, y_sb = sc.perform_section_analysis(x, y, xr, yr, FCD, FYD, ES, EPS_CU, AS, alpha_deg, na_y, lambda_=LAMBDA)
+    Fc, Fr, Asb, sb_cog, x_sb, y_sb = sc.perform_section_analysis(section, FCD, FYD, ES, EPS_CU, alpha_deg, na_y, lambda_=LAMBDA)
 
     # Compute individual moments generated in the section
-    Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(xr, yr, Asb, sb_cog, Fc, Fr)
+    Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(section.xr, section.yr, Asb, sb_cog, Fc, Fr)
     print('Mcx = ', Mcx/10**6)
     print('Mcy = ', Mcy/10**6)
     print('Mrx = ', sum(Mrx)/10**6)
@@ -291,7 +711,7 @@ if __name__ == '__main__':
     plot_uls_section = 'Yes'
     if plot_uls_section == 'Yes':
         section_plot_uls.plot_ULS_section(
-            x, y, xr, yr, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mrx, Mry, Mx_float, My_float, alpha_deg, na_y)
+            section, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mrx, Mry, Mx_float, My_float, alpha_deg, na_y)
 
     Mx = [i/10**6 for i in Mx]
     My = [i/10**6 for i in My]
@@ -0,0 +1,201 @@
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import calc_uls
+import geometry
+import instrumentation
+import kernels
+
+
+'''
+Inner and outer approximations of the capacity surface of a section, refined only where a check needs it.
+
+The capacity of a section is the convex hull of the capacities of all neutral axis states. A surface sampled at
+a finite number of states, as by 'calc_uls.compute_capacity_surface', gives the convex hull of its points as
+inner approximation, so the utilization ratio against it is an upper bound of the true utilization ratio. The
+outer approximation is the intersection of supporting planes: for a direction 'n', the largest value of n.S over
+all states S bounds the capacity in that direction. It is found by a grid search over the neutral axis angle and
+depth, starting from the best sampled states, and the state found is added to the inner approximation as well.
+The utilization ratio against the outer approximation is a lower bound of the true utilization ratio.
+
+Supporting planes are computed for the facets of the inner approximation hit by load combinations, and only
+for load combinations that are not already decided by the bounds, i.e. whose utilization ratio against the
+inner approximation is at least the limit. The planes and states are kept, so the approximations only improve.
+Load combinations whose bounds contain the limit are refined by repeating this on the refined inner
+approximation, which converges to the capacity in the direction of the load combination.
+
+The planes of the facet normals are not in general the planes normal to the strain of the states (the stress
+block and elastic steel near the neutral axis are not a plastic stress distribution), hence the search. Where
+the surface is nearly flat, the values n.S of states far apart differ by less than the small jumps of the
+capacities where bars enter the stress block, and the search can miss the largest value by a few tenths of a
+percent. The planes are therefore moved outwards by a margin (0.5% by default), so the lower bounds hold when
+the search is within the margin of the largest value. A sampling that resolves the shape of the surface is
+needed for the search to start near the largest value.
+
+Axes are scaled to comparable magnitudes as in 'facet_index', which does not change the utilization ratios.
+'''
+
+
+class CapacityBounds:
+    '''
+    Inner and outer approximations of the capacity surface of a section.
+
+    Args:
+        rotation_step, vertical_step    : Initial sampling, see 'calc_uls.compute_capacity_surface'. It must
+                                          resolve the shape of the surface, but not its capacities, as they
+                                          are refined where needed
+        reference                       : Moment reference point, see 'calc_uls.compute_capacity_surface'
+        margin (float)                  : Relative distance the supporting planes are moved outwards, see module
+                                          docstring
+
+    Attributes:
+        points (ndarray)                : Capacities (P, Mx, My) of the states of the inner approximation
+        planes (ndarray)                : Supporting planes of the outer approximation as facet equations, see
+                                          'scipy.spatial.ConvexHull.equations', in scaled axes
+    '''
+
+    def __init__(self, section, fcd, fyd, Es, eps_cu, lambda_=0.80, rotation_step=5, vertical_step=10,
+                 reference=None, margin=5e-3):
+        from scipy.spatial import ConvexHull
+        self.section = calc_uls.reference_section(section, fcd, fyd, lambda_, reference)
+        self.materials = (fcd, fyd, Es, eps_cu, lambda_)
+        self.margin = margin
+        self.steps = (rotation_step, 1 / (2 * vertical_step))
+        P, Mx, My, na_y, alpha = calc_uls.compute_capacity_surface(self.section, fcd, fyd, Es, eps_cu,
+                                                                   lambda_=lambda_, rotation_step=rotation_step,
+                                                                   vertical_step=vertical_step)
+        self.points = np.column_stack((P, Mx, My))
+        self.scale = np.abs(self.points).max(axis=0)
+        self.scale[self.scale == 0] = 1
+
+        # Neutral axis angle and relative depth of each state, NaN for the poles
+        alpha = np.asarray(alpha, dtype=float)
+        self.states = np.full((alpha.size, 2), np.nan)
+        for i in np.flatnonzero(np.isfinite(alpha)):
+            offset = geometry.line_offset(alpha[i], na_y[i])
+            tension, compression = calc_uls.neutral_axis_offsets(self.section, alpha[i], [0, 1])
+            self.states[i] = alpha[i], (offset - tension) / (compression - tension)
+
+        self._hull = ConvexHull(self.points / self.scale, incremental=True)
+        self.planes = np.empty((0, 4))
+        self._supported = set()
+
+    def _capacities(self, alpha_deg, depths):
+        '''
+        Return the capacities (P, Mx, My) of the states on the grid of neutral axis angles 'alpha_deg' and relative
+        depths 'depths', as array of shape (angles, depths, 3).
+        '''
+        fcd, fyd, Es, eps_cu, lambda_ = self.materials
+        alpha_deg = np.asarray(alpha_deg, dtype=float) % 360
+        offsets = np.array([calc_uls.neutral_axis_offsets(self.section, a, depths) for a in alpha_deg])
+        angles = np.repeat(alpha_deg, len(depths))
+        P, Mx, My = kernels.section_states(self.section, fcd, fyd, Es, eps_cu, angles, offsets.ravel(),
+                                           lambda_=lambda_)
+        return np.stack((P, Mx, My), axis=-1).reshape(alpha_deg.size, len(depths), 3)
+
+    def support(self, normal, starts=3, size=7, min_step=1e-2):
+        '''
+        Return the state with the largest value n.S of its capacities S, found by a grid search over the neutral
+        axis angle and depth around each of the 'starts' best states of the inner approximation. Each step
+        evaluates a grid of size x size states covering the neighbouring states of the initial sampling at once,
+        and the grid is centred on its best state and halved until the spacing of the angles is below 'min_step'
+        [deg].
+
+        A grid search is used rather than a local optimizer, as the capacities jump slightly where bars enter
+        the stress block (see 'section_calc.compute_rebar_forces'), which traps local optimizers on ridges.
+
+        Returns:
+            point (ndarray)     : Capacities (P, Mx, My) of the state
+            state (tuple)       : Neutral axis angle [deg] and relative depth of the state, NaN for a pole
+        '''
+        prof = instrumentation.active()
+        if prof is not None:
+            prof.count('bounds.support')
+        normal = np.asarray(normal, dtype=float)
+        values = self.points @ normal
+        best = int(np.argmax(values))
+        point, state, value = self.points[best], tuple(self.states[best]), values[best]
+
+        grid = np.linspace(-1, 1, size)
+        finite = np.flatnonzero(np.isfinite(self.states[:, 0]))
+        for center in self.states[finite[np.argsort(-values[finite])[:starts]]]:
+            half = np.array(self.steps, dtype=float)
+            while half[0] * 2 / (size - 1) >= min_step:
+                alphas = center[0] + grid * half[0]
+                depths = center[1] + grid * half[1]
+                points = self._capacities(alphas, depths)
+                i, j = np.unravel_index(np.argmax(points @ normal), (size, size))
+                center = np.array([alphas[i], depths[j]])
+                if points[i, j] @ normal > value:
+                    point, state, value = points[i, j], (alphas[i] % 360, depths[j]), points[i, j] @ normal
+                half /= 2
+        return point, state
+
+    def _add_planes(self, facets):
+        '''
+        Add the supporting planes and states of the given facets of the inner approximation, and return the number
+        of planes added.
+        '''
+        equations = self._hull.equations
+        points = []
+        states = []
+        for f in facets:
+            key = tuple(np.round(equations[f, :3], 12))
+            if key in self._supported:
+                continue
+            self._supported.add(key)
+            point, state = self.support(equations[f, :3] / self.scale)
+            normal = equations[f, :3]
+            h = normal @ (point / self.scale)
+            self.planes = np.vstack((self.planes, np.append(normal, -h * (1 + self.margin))))
+            points.append(point)
+            states.append(state)
+        if points:
+            self.points = np.vstack((self.points, points))
+            self.states = np.vstack((self.states, states))
+            self._hull.add_points(np.array(points) / self.scale)
+        return len(points)
+
+    def utilization_bounds(self, Ped, Mxed, Myed, limit=1.0, tol=1e-3, batch=32, max_iter=1000):
+        '''
+        Return lower and upper bounds of the utilization ratios of load combinations.
+
+        The approximations are refined until the bounds of each load combination are both below or both above
+        'limit', or closer than 'tol' + 'margin' (relative to 'limit'). Each refinement adds the supporting planes
+        of the 'batch' facets of the inner approximation hit by most undecided load combinations. The bounds of
+        load combinations that are decided by the initial inner approximation are not tightened, so the lower
+        bound can be far below the utilization ratio for them.
+
+        Returns:
+            low, high (ndarray) : Bounds of the utilization ratios
+        '''
+        U = np.column_stack((Ped, Mxed, Myed)).astype(float) / self.scale
+        low = np.zeros(U.shape[0])
+        high, facets = geometry.hull_gauge(U, self._hull.equations, return_facets=True)
+        if self.planes.shape[0]:
+            low = geometry.hull_gauge(U, self.planes)
+        active = np.flatnonzero((low <= limit) & (high >= limit))
+        for _ in range(max_iter):
+            if active.size == 0:
+                break
+
+            # Supporting planes of the facets hit by most undecided load combinations, which also refines the inner
+            # approximation
+            hits, counts = np.unique(facets[active], return_counts=True)
+            if not self._add_planes(hits[np.argsort(-counts, kind='stable')[:batch]]):
+                break
+            high[active], facets[active] = geometry.hull_gauge(U[active], self._hull.equations,
+                                                               return_facets=True)
+            low[active] = geometry.hull_gauge(U[active], self.planes)
+            active = active[(low[active] <= limit) & (high[active] >= limit)
+                            & (high[active] - low[active] > (tol + self.margin) * limit)]
+
+        prof = instrumentation.active()
+        if prof is not None:
+            prof.count('bounds.loads', U.shape[0])
+            prof.count('bounds.undecided', active.size)
+        if self.planes.shape[0]:
+            decided = high < limit
+            low[decided] = geometry.hull_gauge(U[decided], self.planes)
+        return low, high
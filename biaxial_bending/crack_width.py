@@ -0,0 +1,229 @@
+# Built-in packages
+import argparse
+import csv
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import batch
+import calc_sls
+
+
+'''
+Serviceability checks of rebar stresses and crack widths for many load cases, e.g. quasi-permanent combinations.
+
+Each load case is solved once for the strain state of the cracked section ('calc_sls.cracked_section'), and the
+rebar stresses, the effective tension area and the crack widths by EN 1992-1-1, 7.3.4 are then computed for all
+bars and load cases at once:
+
+    wk = sr,max * (eps_sm - eps_cm)
+    eps_sm - eps_cm = max(sigma_s - kt*fct_eff/rho_eff*(1 + alpha_e*rho_eff), 0.6*sigma_s) / Es
+    sr,max = k3*c + k1*k2*k4*phi/rho_eff
+
+The section depth 'h', the compression depth 'x' and the effective depth 'd' (of the most tensioned bar) are
+measured along the strain gradient, so biaxial bending is treated like uniaxial bending about the neutral axis.
+The effective tension area is the part of the section within hc,ef = min(2.5(h - d), (h - x)/3, h/2) of the most
+tensioned face (Figure 7.1). Sections entirely in tension have an effective area at both faces, with the (h - x)/3
+limit left out. 'phi' is the equivalent diameter of the bars in the effective area and 'c' the clear cover of each
+bar. Bars outside the effective area, or with a spacing to the nearest bar in it larger than 5(c + phi/2), get
+sr,max = 1.3(h - x) (7.3.4 (3)). Bars in compression have no cracks.
+
+A library of sections (see 'batch') is checked as a batch job, with one row per load combination in the report:
+
+    python crack_width.py sections.json loads.csv --report sls.csv --workers 4
+'''
+
+K3 = 3.4
+K4 = 0.425
+
+
+def bar_cover(section):
+    ''' Return the clear cover of each bar, the distance from its centre to the nearest concrete face less its radius. '''
+    xr, yr = section.xr, section.yr
+    if section._is_circular:
+        rr = np.hypot(xr - section.center[0], yr - section.center[1])
+        dist = section.radius - rr
+        if section.inner_radius > 0:
+            dist = np.minimum(dist, rr - section.inner_radius)
+    else:
+        x0, y0 = section.x_ring[:-1], section.y_ring[:-1]
+        length2 = section.dx**2 + section.dy**2
+        t = np.clip(((xr[:, None] - x0) * section.dx + (yr[:, None] - y0) * section.dy) / length2, 0, 1)
+        dist = np.hypot(xr[:, None] - x0 - t * section.dx, yr[:, None] - y0 - t * section.dy).min(axis=1)
+    return dist - section.rebars.dia / 2
+
+
+def crack_widths(section, P, Mx, My, Ec, Es, fct_eff, kt=0.4, alpha_e=None, cover=None, k1=0.8, reference=None):
+    '''
+    Return rebar stresses and crack widths of load cases by EN 1992-1-1, 7.3.4.
+
+    Args:
+        section (Section)       : Section
+        P, Mx, My (ndarray)     : Load cases (P negative in compression)
+        Ec (float)              : Concrete modulus of the cracked section analysis, e.g. the effective modulus
+                                  Ecm/(1 + phi) for quasi-permanent loads
+        Es (float/list)         : Rebar modulus, a single value or a sequence indexed by material ID
+        fct_eff (float)         : Mean tensile strength of the concrete when the cracks form, usually fctm
+        kt (float)              : Duration of load factor, 0.4 for long term and 0.6 for short term loading
+        alpha_e (float)         : Modular ratio Es/Ecm, by default Es/Ec
+        cover (float/ndarray)   : Clear cover of the bars, by default from the bar positions ('bar_cover')
+        k1 (float)              : Bond factor, 0.8 for high bond bars and 1.6 for plain bars
+        reference               : Moment reference point, see 'calc_uls.compute_capacity_surface'
+
+    Returns:
+        results (dict)          : Arrays with one entry per load case, or shape (cases, bars) for bar results
+            'sigma_s'           : Rebar stresses, positive in tension
+            'sigma_c'           : Largest concrete compressive stress (negative)
+            'x'                 : Depth of the compression zone
+            'Ac_eff'            : Effective tension area
+            'rho_eff'           : Reinforcement ratio of the effective tension area
+            'sr_max'            : Maximum crack spacing at each bar
+            'wk'                : Crack width at each bar
+    '''
+    if reference is not None:
+        section = section.translated(-reference[0], -reference[1])
+    eps0, kx, ky = calc_sls.cracked_section(section, P, Mx, My, Ec, Es)
+    rebars = section.rebars
+    Es = rebars.per_bar(Es)
+    alpha_e = Es / Ec if alpha_e is None else alpha_e
+    c = bar_cover(section) if cover is None else np.broadcast_to(np.asarray(cover, dtype=float), Es.shape)
+    dia = rebars.dia
+    eps_s = eps0[:, None] - kx[:, None] * section.yr - ky[:, None] * section.xr
+    sigma_s = Es * eps_s
+
+    # Coordinate z along the strain gradient, eps = eps0 + k*z (any direction for a uniform strain)
+    k = np.hypot(kx, ky)
+    uniform = k == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ny = np.where(uniform, 1.0, -kx / k)
+        nx = np.where(uniform, 0.0, -ky / k)
+        z = ny[:, None] * section.y + nx[:, None] * section.x
+        zmin, zmax = z.min(axis=1), z.max(axis=1)
+        h = zmax - zmin
+        x = np.where(uniform, np.where(eps0 < 0, h, 0), np.clip(-eps0 / k - zmin, 0, h))
+    eps_max = eps0 + k * zmax
+    eps_min = eps0 + k * zmin
+    sigma_c = Ec * np.minimum(eps_min, 0)
+
+    # Effective tension area
+    zr = ny[:, None] * section.yr + nx[:, None] * section.xr
+    tension = sigma_s > 0
+    d = np.where(tension.any(axis=1), np.max(np.where(tension, zr, -np.inf), axis=1) - zmin, h)
+    two_sided = x <= 0
+    hc_ef = np.minimum(2.5 * (h - d), h / 2)
+    hc_ef = np.where(two_sided, hc_ef, np.minimum(hc_ef, (h - x) / 3))
+    rings = calc_sls._section_rings(section)
+    Ac_eff = calc_sls.clipped_area_moments(rings, zmax - hc_ef, -ny, -nx)[:, 0]
+    Ac_eff += np.where(two_sided, calc_sls.clipped_area_moments(rings, -zmin - hc_ef, ny, nx)[:, 0], 0)
+    in_eff = (zr >= (zmax - hc_ef)[:, None]) | (two_sided[:, None] & (zr <= (zmin + hc_ef)[:, None]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho_eff = np.where(Ac_eff > 0, in_eff @ rebars.area / Ac_eff, 0)
+        phi = (in_eff @ dia**2) / (in_eff @ dia)
+        k2 = np.where(eps_max > 0, (eps_max + np.maximum(eps_min, 0)) / (2 * eps_max), 1)
+
+    # Crack spacing, the upper bound where bars are far apart or outside the effective area
+    spacing = np.hypot(section.xr[:, None] - section.xr, section.yr[:, None] - section.yr)
+    np.fill_diagonal(spacing, np.inf)
+    nearest = np.min(np.where(in_eff[:, None, :], spacing, np.inf), axis=2)
+    bonded = in_eff & (nearest <= 5 * (c + dia / 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sr_formula = K3 * c + (k1 * k2 * K4 * phi / rho_eff)[:, None]
+    sr_max = np.where(bonded, sr_formula, 1.3 * (h - x)[:, None])
+
+    # Crack widths
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relief = np.where(rho_eff > 0, kt * fct_eff / rho_eff, 0)[:, None] * (1 + alpha_e * rho_eff[:, None])
+    delta_eps = np.maximum(sigma_s - relief, 0.6 * sigma_s) / Es
+    wk = np.where(tension, sr_max * delta_eps, 0)
+    return {'sigma_s': sigma_s, 'sigma_c': sigma_c, 'x': x, 'Ac_eff': Ac_eff, 'rho_eff': rho_eff,
+            'sr_max': sr_max, 'wk': wk}
+
+
+def check_section(spec, loads):
+    '''
+    Compute the rebar stresses and crack widths of the load combinations of a section library entry, see
+    'batch.read_library'.
+
+    Returns:
+        name (str)          : Name of the section
+        columns (dict)      : Report columns 'load', 'P', 'Mx', 'My', 'sigma_c', 'sigma_s' (largest rebar stress)
+                              and 'wk' (largest crack width)
+        elapsed (float)     : Computation time [s]
+    '''
+    t0 = time.perf_counter()
+    section = batch.build_section(spec)
+    sls = spec['sls']
+    load_names, Ped, Mxed, Myed = loads
+    results = crack_widths(section, Ped, Mxed, Myed, sls['Ec'], spec['materials']['Es'], sls['fct_eff'],
+                           kt=sls['kt'], alpha_e=sls.get('alpha_e'), cover=sls.get('cover'))
+    columns = {'load': np.array(load_names, dtype=str), 'P': Ped, 'Mx': Mxed, 'My': Myed,
+               'sigma_c': results['sigma_c'], 'sigma_s': results['sigma_s'].max(axis=1),
+               'wk': results['wk'].max(axis=1)}
+    return spec['name'], columns, time.perf_counter() - t0
+
+
+def check_library(library, loads, workers=None, log=print):
+    '''
+    Check all sections of a library that have load combinations, in parallel.
+
+    Args:
+        library (list)          : Section entries, see 'batch.read_library'
+        loads (dict)            : Load combinations per section, see 'batch.read_loads'
+        workers (int)           : Number of worker processes, runs in the current process if 1
+
+    Returns:
+        report (dict)           : Columns of 'check_section' and 'section' for all load combinations, in the order
+                                  of the library
+    '''
+    todo = [spec for spec in library if spec['name'] in loads]
+    results = {}
+
+    def store_result(name, columns, elapsed):
+        columns['section'] = np.full(columns['wk'].size, name)
+        results[name] = columns
+        log('{}: {} load combinations, max sigma_s = {:.1f}, max wk = {:.3f} ({:.2f} s)'.format(
+            name, columns['wk'].size, np.max(columns['sigma_s'], initial=0), np.max(columns['wk'], initial=0),
+            elapsed))
+
+    if workers == 1:
+        for spec in todo:
+            store_result(*check_section(spec, loads[spec['name']]))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(check_section, spec, loads[spec['name']]) for spec in todo]
+            for future in as_completed(futures):
+                store_result(*future.result())
+
+    keys = ('section', 'load', 'P', 'Mx', 'My', 'sigma_c', 'sigma_s', 'wk')
+    ordered = [results[spec['name']] for spec in todo]
+    return {key: np.concatenate([c[key] for c in ordered]) if ordered else np.array([]) for key in keys}
+
+
+def write_report(filename, report):
+    ''' Write the columns of a report to a CSV file. '''
+    keys = list(report)
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(keys)
+        writer.writerows(zip(*(report[key].tolist() for key in keys)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute rebar stresses and crack widths for a library of sections.')
+    parser.add_argument('library', help='JSON file with section definitions')
+    parser.add_argument('loads', help='CSV file with load combinations (section, load, P, Mx, My)')
+    parser.add_argument('--report', '-o', default='sls.csv', help='CSV file to write the results to')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes')
+    args = parser.parse_args(argv)
+
+    report = check_library(batch.read_library(args.library), batch.read_loads(args.loads), workers=args.workers)
+    write_report(args.report, report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Built-in packages
+from math import pi
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import geometry
+
+
+'''
+Angular index of the facets of a triangle mesh for ray queries from the origin.
+
+The directions from the origin are binned on a latitude/longitude grid. Each facet is bounded by the
+smallest spherical cap around its direction that contains the directions of its vertices, and the facet
+is registered in all bins overlapping the cap. A ray then only has to be tested against the facets of
+the bin its direction falls in, so the cost of a query depends on the number of facets near the ray
+rather than on the total number of facets.
+
+The rays are grouped by bin and each group is tested against its candidate facets at once. Axes are
+scaled to comparable magnitudes before binning (P in N and moments in Nmm would otherwise put nearly all
+facets around the equator), which does not change where a ray hits the mesh.
+'''
+
+
+class FacetIndex:
+    '''
+    Angular bins of the facets of a triangle mesh as seen from the origin.
+
+    Args:
+        vertices (ndarray)  : Mesh vertices, shape (N, 3). The origin should be inside the mesh
+        faces (ndarray)     : Vertex indices of the triangles, shape (F, 3)
+        n_lat (int)         : Number of latitude bins, chosen from the number of facets if not given. There are
+                              twice as many longitude bins
+    '''
+    __slots__ = ('scale', 'v0', 'e1', 'e2', 'n_lat', 'n_lon', 'offsets', 'facets', 'global_facets')
+
+    def __init__(self, vertices, faces, n_lat=None):
+        vertices = np.asarray(vertices, dtype=float)
+        faces = np.asarray(faces, dtype=np.intp)
+        self.scale = np.abs(vertices).max(axis=0)
+        self.scale[self.scale == 0] = 1
+        v = vertices / self.scale
+
+        v0, v1, v2 = v[faces[:, 0]], v[faces[:, 1]], v[faces[:, 2]]
+        self.v0 = v0
+        self.e1 = v1 - v0
+        self.e2 = v2 - v0
+
+        n_faces = faces.shape[0]
+        self.n_lat = n_lat if n_lat is not None else int(np.clip(round(np.sqrt(n_faces / 32)), 4, 128))
+        self.n_lon = 2 * self.n_lat
+
+        # Bounding cap of each facet, i.e. centre direction and angular radius
+        norms = np.linalg.norm(v, axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            d = v / norms[:, None]
+        dirs = np.stack((d[faces[:, 0]], d[faces[:, 1]], d[faces[:, 2]]), axis=1)
+        center = dirs.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            center /= np.linalg.norm(center, axis=1)[:, None]
+            cos_r = np.einsum('fik,fk->fi', dirs, center).min(axis=1)
+        radius = np.arccos(np.clip(cos_r, -1, 1)) + 1e-9
+
+        # Facets with vertices at the origin or spanning a hemisphere are tested for all rays
+        wide = ~np.isfinite(radius) | ~(cos_r > 0)
+        self.global_facets = np.flatnonzero(wide)
+
+        # Latitude and longitude range of the cap of each facet
+        idx = np.flatnonzero(~wide)
+        c = center[idx]
+        r = radius[idx]
+        lat = np.arcsin(np.clip(c[:, 0], -1, 1))
+        lon = np.arctan2(c[:, 2], c[:, 1])
+        lat0 = np.maximum(lat - r, -pi/2)
+        lat1 = np.minimum(lat + r, pi/2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dlon = np.arcsin(np.clip(np.sin(r) / np.cos(lat), -1, 1))
+        full = (lat + r >= pi/2) | (lat - r <= -pi/2) | ~np.isfinite(dlon) | (np.sin(r) >= np.cos(lat))
+
+        i0, i1 = self._lat_bin(lat0), self._lat_bin(lat1)
+        j0 = np.where(full, 0, self._lon_bin(lon - dlon, wrap=False))
+        j1 = np.where(full, self.n_lon - 1, self._lon_bin(lon + dlon, wrap=False))
+        n_j = np.minimum(j1 - j0 + 1, self.n_lon)
+        n_i = i1 - i0 + 1
+
+        # Expand each facet into all (latitude bin, longitude bin) pairs of its range
+        count = n_i * n_j
+        facet = np.repeat(idx, count)
+        k = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        n_j_rep = np.repeat(n_j, count)
+        bins = ((np.repeat(i0, count) + k // n_j_rep) * self.n_lon
+                + (np.repeat(j0, count) + k % n_j_rep) % self.n_lon)
+
+        # Compressed rows of facets per bin
+        order = np.argsort(bins, kind='stable')
+        self.facets = facet[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(bins, minlength=self.n_lat * self.n_lon))))
+
+    def _lat_bin(self, lat):
+        return np.clip(((lat + pi/2) / pi * self.n_lat).astype(np.intp), 0, self.n_lat - 1)
+
+    def _lon_bin(self, lon, wrap=True):
+        j = np.floor((lon + pi) / (2*pi) * self.n_lon).astype(np.intp)
+        return j % self.n_lon if wrap else j
+
+    def __len__(self):
+        return self.v0.shape[0]
+
+    def intersect(self, U, tol=1e-9):
+        '''
+        Return the scale factors 't' where the rays 't*U' from the origin first hit the mesh, see
+        'geometry.ray_mesh_intersection'.
+
+        Args:
+            U (ndarray)     : Ray directions, shape (L, 3)
+
+        Returns:
+            t (ndarray)     : Scale factor of the first intersection of each ray, NaN if the ray does not hit
+        '''
+        U = np.atleast_2d(np.asarray(U, dtype=float)) / self.scale
+        t = np.full(U.shape[0], np.inf)
+
+        norms = np.linalg.norm(U, axis=1)
+        rays = np.flatnonzero(norms > 0)
+        d = U[rays] / norms[rays, None]
+        bins = self._lat_bin(np.arcsin(np.clip(d[:, 0], -1, 1))) * self.n_lon + self._lon_bin(np.arctan2(d[:, 2], d[:, 1]))
+
+        # Test each group of rays in the same bin against the facets of the bin
+        order = np.argsort(bins, kind='stable')
+        rays, bins = rays[order], bins[order]
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]]) if bins.size else bins
+        for start, end in zip(starts, np.r_[starts[1:], bins.size]):
+            b = bins[start]
+            candidates = self.facets[self.offsets[b]:self.offsets[b+1]]
+            if self.global_facets.size:
+                candidates = np.concatenate((candidates, self.global_facets))
+            group = rays[start:end]
+            t[group] = geometry.ray_triangles_first_hit(U[group], self.v0[candidates], self.e1[candidates],
+                                                        self.e2[candidates], tol=tol)
+
+        t[np.isinf(t)] = np.nan
+        return t
@@ -10,104 +10,197 @@ import numpy as np
 def radius_from_3_points():
     pass
 
+# Lines in normal form
+def line_normal(angle_deg):
+    '''
+    Return the unit normal (sin(a), -cos(a)) of lines with angle 'angle_deg' [deg] with the x-axis. Lines are
+    represented in normal form, d = x*sin(a) - y*cos(a) + offset, where 'd' is the signed distance from the line
+    to the point (x, y). The normal is defined for all angles, including vertical lines.
+
+    Returns:
+        n (ndarray)     : Array of shape (2,), or (S, 2) for an array of S angles
+    '''
+    angle = np.asarray(angle_deg) * pi / 180
+    return np.stack((np.sin(angle), -np.cos(angle)), axis=-1)
+
+
+def line_offset(angle_deg, y_intersect):
+    ''' Return the offset in normal form of lines with angle 'angle_deg' intersecting the y-axis at 'y_intersect'. '''
+    return y_intersect * np.cos(np.asarray(angle_deg) * pi / 180)
+
+
+def line_y_intersect(angle_deg, offset):
+    '''
+    Return the intersection with the y-axis of lines in normal form, see 'line_normal'. Inverse of 'line_offset',
+    where vertical lines give very large values that still convert back to the offset.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return offset / np.cos(np.asarray(angle_deg) * pi / 180)
+
+
+def signed_distances(x, y, angle_deg, offset):
+    '''
+    Return signed distances from lines in normal form to points, see 'line_normal', as one matrix product for all
+    lines and points.
+
+    Args:
+        x, y (ndarray)          : Coordinates of N points
+        angle_deg (float)       : Angle of the lines with the x-axis [deg], single value or array of S angles
+        offset (float)          : Offset of the lines in normal form, single value or array of S offsets
+
+    Returns:
+        d (ndarray)             : Signed distances of shape (N,) for a single line, otherwise (S, N)
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if np.ndim(angle_deg) == 0:
+        # Single direction, the distances of all offsets differ by a constant
+        angle = angle_deg * pi / 180
+        d = x * sin(angle) - y * cos(angle)
+    else:
+        d = line_normal(angle_deg) @ np.vstack((x, y))
+    offset = np.asarray(offset, dtype=float)
+    return d + (offset[..., None] if offset.ndim else offset)
+
+
 # Compute intersection between line and polygon
-def line_polygon_collisions(angle_deg, y_intersect, x_vertex, y_vertex):
+def line_polygon_collisions(angle_deg, y_intersect, x_vertex, y_vertex, offset=None):
     '''
     Return intersection points between a line and a polygon. If no intersections are present, return original polygon
     vertices.
 
     INPUT ARGUMENTS:
-        angle           -   Angle of line with x-axis (in radians)
-        y_intersect     -   Intersection between line and y-axis
+        angle_deg       -   Angle of line with x-axis (in degrees)
+        y_intersect     -   Intersection between line and y-axis (not used if 'offset' is given)
         x_vertex        -   x-coordinates of polygon vertices
         y_vertex        -   y-coordinates of polygon vertices
+        offset          -   Offset of the line in normal form, see 'line_normal'
 
     OUTPUT:
         xint            -   x-coordinates for intersections
         yint            -   y-coordinates for intersections
 
     '''
-    # Convert input angle from [deg] to [rad]
-    angle = angle_deg * pi / 180 
-
-    # Evaluate the neutral axis linear equation for each vertex
-    vertex_eval = [tan(angle)*x_vertex[i]-y_vertex[i]+y_intersect for i in range(len(x_vertex))]
-
-    # TODO Code below can be shortened considerably by use of list comprehensions and the all() method
-    # If corners are either all positive or all negative, the neutral axis is outside the cross section
-    count_pos = 0
-    count_neg = 0
-    for vertex in vertex_eval:
-        if vertex > 0:
-            count_pos += 1
-        else:
-            count_neg += 1
-
-    if count_neg == len(vertex_eval):
-        # Neutral axis is located outside of cross section, return polygon vertices as output
-        return x_vertex, y_vertex
-        # TODO Logging! print('Neutral axis is outside of cross section - Entire section is in compression')
-    elif count_pos == len(vertex_eval):
-        # Neutral axis is located outside of cross section, return polygon vertices as output
-        # TODO Logging! print('Neutral axis is outside of cross section - Entire section is in tension')
+    if offset is None:
+        offset = line_offset(angle_deg, y_intersect)
+
+    # Signed distances from the line to each vertex
+    xv = np.asarray(x_vertex, dtype=float)
+    yv = np.asarray(y_vertex, dtype=float)
+    vertex_eval = signed_distances(xv, yv, angle_deg, offset)
+
+    # If corners are either all positive or all negative, the line is outside the polygon
+    if np.all(vertex_eval <= 0) or np.all(vertex_eval > 0):
+        # Line is located outside of the polygon, return polygon vertices as output
         return x_vertex, y_vertex
-    else:
-        # Neutral axis is inside the cross section (impliying two intersecting points with the section boundary)
-
-        # Copy first entry to last entry to create a closed polygon
-        vertex_eval.append(vertex_eval[0])
-        xv = x_vertex + [x_vertex[0]]       # New local variable for vertices of closed polygon
-        yv = y_vertex + [y_vertex[0]]       # New local variable for vertices of closed polygon
-
-        xint = []           # Initiate list for holding two x-coordinates for intersections btw. neutral axis and section
-        yint = []           # Initiate list for holding two y-coordinates for intersections btw. neutral axis and section
-        for i in range(len(vertex_eval)-1):
-            if np.sign(vertex_eval[i]) != np.sign(vertex_eval[i+1]):
-
-                # NOTE DOES THIS ASSUME THAT VERTICES ARE ORDERED??????
-
-                # Intersection detected
-                # TODO Logging! print('Intersection detected between corner {} and {}'.format(i+1, i+2))    # Count starts from 0
-                # Determine equation for line between corners (y = mx + k)
-                x1 = xv[i]
-                y1 = yv[i]
-                x2 = xv[i+1]
-                y2 = yv[i+1]
-
-                if x1 == x2:
-                    # Cross section line is vertical => slope is infinite. Line equation is just equal to x-coordinate
-                    x = x1                                      # x-coordinate of intersection
-                    y = tan(angle) * x + y_intersect            # y-coordinate of intersection
-                    xint.append(x)
-                    yint.append(y)
-                else:
-                    m = (y2 - y1) / (x2 - x1)                   # Slope of line btw. corner points
-                    k = y2 - m * x2                             # Intersection with y-axis for line btw. corner points
-
-                    x = (y_intersect - k) / (m - tan(angle))    # x-coordinate for intersection
-                    y =  m * x + k                              # y-coordinate for intersection
-                    xint.append(x)
-                    yint.append(y)
-
-    return xint, yint
+
+    # Intersections are located on the polygon edges where the distance changes sign (the vertices are assumed to
+    # be ordered along the perimeter)
+    e0 = vertex_eval
+    e1 = np.roll(vertex_eval, -1)
+    idx = np.nonzero(np.sign(e0) != np.sign(e1))[0]
+
+    # Interpolate linearly along the intersected edges
+    t = e0[idx] / (e0[idx] - e1[idx])
+    xint = xv[idx] + t * (np.roll(xv, -1)[idx] - xv[idx])
+    yint = yv[idx] + t * (np.roll(yv, -1)[idx] - yv[idx])
+
+    return list(xint), list(yint)
+
+
+def clip_polygon(x_ring, y_ring, d_ring, level=0):
+    '''
+    Return the part of a polygon where the signed distance to a line is less than or equal to 'level', i.e. the
+    polygon is clipped by a half plane (Sutherland-Hodgman for a single clipping edge).
+
+    The output vertices are in the same consecutive order as the input vertices, so the result is a valid polygon
+    also for non-convex sections. Parts of the boundary of the clipped polygon can run along the clipping line.
+
+    Args:
+        x_ring (ndarray)    : x-coordinates of polygon vertices as a closed ring (first vertex repeated at the end)
+        y_ring (ndarray)    : y-coordinates of polygon vertices as a closed ring
+        d_ring (ndarray)    : Signed distances from the line to each vertex of the ring
+        level (float)       : Signed distance from the line to the clipping edge
+
+    Returns:
+        x_clip, y_clip (ndarray) : Vertices of the clipped polygon
+    '''
+    e0 = d_ring[:-1] - level
+    e1 = d_ring[1:] - level
+
+    # Vertices that are kept and edges that cross the clipping edge
+    inside = e0 <= 0
+    crossing = e0 * e1 < 0
+
+    # Intersection points (only used where edges are crossing)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(crossing, e0 / (e0 - e1), 0)
+    x_int = x_ring[:-1] + t * (x_ring[1:] - x_ring[:-1])
+    y_int = y_ring[:-1] + t * (y_ring[1:] - y_ring[:-1])
+
+    # Each edge contributes its start vertex (if kept) followed by its intersection (if crossing)
+    keep = np.column_stack((inside, crossing)).ravel()
+    x_clip = np.column_stack((x_ring[:-1], x_int)).ravel()[keep]
+    y_clip = np.column_stack((y_ring[:-1], y_int)).ravel()[keep]
+
+    return x_clip, y_clip
+
+
+def points_in_polygon(px, py, x_ring, y_ring):
+    '''
+    Return boolean array with entry 'True' for points located inside a polygon (crossing number test).
+
+    Args:
+        px, py (ndarray)        : Coordinates of the points to test
+        x_ring, y_ring (ndarray): Polygon vertices as a closed ring (first vertex repeated at the end)
+    '''
+    px = np.asarray(px, dtype=float)[:, None]
+    py = np.asarray(py, dtype=float)[:, None]
+    x0, y0 = x_ring[:-1], y_ring[:-1]
+    x1, y1 = x_ring[1:], y_ring[1:]
+
+    # Edges that straddle the horizontal ray from each point
+    straddle = (y0 > py) != (y1 > py)
+
+    # x-coordinate of intersection between ray and edge
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+
+    # Point is inside if the ray crosses the boundary an odd number of times
+    return np.count_nonzero(straddle & (px < x_cross), axis=1) % 2 == 1
+
+
+def circular_segment(r, h):
+    '''
+    Return area and first moment of area of the part of a circle with radius 'r' where the signed distance 'u'
+    from the centre, measured along an arbitrary direction, satisfies u <= h (closed-form circular segment).
+
+    Works element-wise on arrays. For h <= -r the part is empty and for h >= r it is the entire circle.
+
+    Returns:
+        A (float/ndarray)   : Area of the segment
+        S (float/ndarray)   : First moment of area about the centre along the direction, i.e. the segment
+                              centroid is located at u = S / A
+    '''
+    h = np.clip(h, -r, r)
+    root = np.sqrt(np.maximum(r**2 - h**2, 0))
+    A = r**2 * np.arccos(-h / r) + h * root
+    S = -2/3 * root**3
+    return A, S
 
 
 # Calculate the area of a polygon by using the Shoelace Formula
 def polygon_area(x, y, signed=False):
     ''' Return the area of a non-self-intersecting polygon given the coordinates of its vertices'''
-    if x is not None and y is not None:
-        # Copy coordinates of first point and append to list to create a closed polygon
-        x = x + [x[0]]
-        y = y + [y[0]]
+    if x is not None and y is not None and len(x) > 0:
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
 
-        # Perform shoelace multiplication
-        a1 = [x[i] * y[i+1] for i in range(len(x)-1)]
-        a2 = [y[i] * x[i+1] for i in range(len(y)-1)]
+        # Perform shoelace multiplication (next vertex is found by rolling, i.e. the polygon is closed)
+        A = 1/2 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
 
-        if signed == True:
-            A = 1/2 * ( sum(a1) - sum(a2) )
-        else:
-            A = 1/2 * abs( sum(a1) - sum(a2) )
+        if signed == False:
+            A = abs(A)
 
     else:
         A = 0
@@ -136,26 +229,18 @@ def polygon_centroid(x, y, return_area=False):
     # Compute signed area of polygon
     A = polygon_area(x, y, signed=True)
 
-    # TODO -----------
-    # TODO In order for the formulas to work, the vertices must be en consecutive order along the polygon perimeter. _
-    # TODO Make sure the function organizes the vertices if they are not already. The 'order_polygon_vertices' _
-    # TODO function calls this function to order the vertices though. How to order them with unknown the centroid?
-    # TODO -----------
+    # NOTE In order for the formulas to work, the vertices must be in consecutive order along the polygon perimeter.
     if A == 0:
         return np.nan
     else:
-        # Copy coordinates of first point to last entry to create a closed polygon
-        x = x + [x[0]]
-        y = y + [y[0]]
-        cx = []
-        cy = []
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        xn = np.roll(x, -1)
+        yn = np.roll(y, -1)
+        cross = x * yn - xn * y
 
-        for i in range(len(x)-1):
-            cx.append( ( x[i] + x[i+1] ) * ( x[i] * y[i+1] - x[i+1] * y[i] ) )
-            cy.append( ( y[i] + y[i+1] ) * ( x[i] * y[i+1] - x[i+1] * y[i] ) )
-
-        Cx = sum(cx) / (6*A)
-        Cy = sum(cy) / (6*A)
+        Cx = np.sum((x + xn) * cross) / (6*A)
+        Cy = np.sum((y + yn) * cross) / (6*A)
 
         if return_area:
             return Cx, Cy, A
@@ -258,14 +343,104 @@ def line_hull_intersection(U, c_hull):
 
     Args:
         - U (numpy array)   : Vector defining line, format 'U=np.array([X, Y, Z])' 
-        - c_hull (object)   : Scipy object returned from a convex hull analysis 
+        - c_hull (object)   : Scipy object returned from a convex hull analysis, or its facet equations as array
     '''
-    eq = c_hull.equations.T
+    eq = getattr(c_hull, 'equations', c_hull).T
     V, b = eq[:-1], eq[-1]
     V = np.transpose(V)
     alpha = -b / np.dot(V, U)
     return np.min(alpha[alpha > 0]) * U
 
 
+def hull_gauge(U, equations, chunk_size=2**21, return_facets=False):
+    '''
+    Return the gauge of the vectors U with respect to a convex hull containing the origin, i.e. the factor 'g'
+    such that 'U/g' is on the hull. Equals the ratio between the lengths of 'U' and of the intersection from
+    'line_hull_intersection', and is found for all vectors at once as the largest ratio over the facets between
+    the distance of 'U' along the facet normal and the distance of the facet from the origin.
+
+    Args:
+        U (ndarray)         : Vectors, shape (L, 3)
+        equations (ndarray) : Facet equations of the hull, see 'scipy.spatial.ConvexHull.equations'
+        chunk_size (int)    : Max. number of vector-facet pairs evaluated at a time, limits the memory use
+        return_facets (bool): Also return the index of the facet each vector passes through
+
+    Returns:
+        g (ndarray)         : Gauge of each vector, 0 for zero vectors
+        facets (ndarray)    : Index of the facet of each vector, only if 'return_facets'
+    '''
+    U = np.atleast_2d(np.asarray(U, dtype=float))
+    equations = np.asarray(equations, dtype=float)
+    if not np.all(equations[:, -1] < 0):
+        raise ValueError('The origin is not inside the convex hull.')
+    normals = equations[:, :-1] / -equations[:, -1:]
+
+    g = np.empty(U.shape[0])
+    facets = np.empty(U.shape[0], dtype=np.intp)
+    step = max(1, chunk_size // normals.shape[0])
+    for i in range(0, U.shape[0], step):
+        ratios = U[i:i+step] @ normals.T
+        facets[i:i+step] = ratios.argmax(axis=1)
+        g[i:i+step] = np.maximum(np.take_along_axis(ratios, facets[i:i+step, None], axis=1)[:, 0], 0)
+    return (g, facets) if return_facets else g
+
+
+def ray_triangles_first_hit(U, v0, e1, e2, tol=1e-9, chunk_size=2**21):
+    '''
+    Return the smallest positive scale factor 't' where each ray 't*U' from the origin hits one of the given
+    triangles, or inf if it hits none. Uses the Moller-Trumbore ray-triangle test for all pairs at once.
+
+    Args:
+        U (ndarray)         : Ray directions, shape (L, 3)
+        v0 (ndarray)        : First vertex of each triangle, shape (F, 3)
+        e1, e2 (ndarray)    : Edge vectors from the first to the second and third vertex, shape (F, 3)
+        tol (float)         : Relative tolerance of the barycentric coordinates, so rays through edges and
+                              vertices are not missed
+        chunk_size (int)    : Max. number of ray-triangle pairs tested at a time, limits the memory use
+    '''
+    t_min = np.full(U.shape[0], np.inf)
+    if v0.shape[0] == 0:
+        return t_min
+
+    s = -v0
+    q = np.cross(s, e1)
+    t_num = np.einsum('fk,fk->f', e2, q)
+    step = max(1, chunk_size // v0.shape[0])
+    for i in range(0, U.shape[0], step):
+        u_dir = U[i:i+step]
+        p = np.cross(u_dir[:, None, :], e2)
+        det = np.einsum('lfk,fk->lf', p, e1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv = 1 / det
+            u = np.einsum('lfk,fk->lf', p, s) * inv
+            v = (u_dir @ q.T) * inv
+            t = t_num * inv
+            hit = (det != 0) & (u >= -tol) & (v >= -tol) & (u + v <= 1 + tol) & (t > 0)
+        t_min[i:i+step] = np.where(hit, t, np.inf).min(axis=1)
+    return t_min
+
+
+def ray_mesh_intersection(U, vertices, faces, tol=1e-9, chunk_size=2**21):
+    '''
+    Return the scale factors 't' where the rays 't*U' from the origin first hit a triangle mesh, i.e. the
+    intersection points are 't[:, None] * U'. All triangles are tested for all rays, see 'facet_index' for
+    large meshes.
+
+    Args:
+        U (ndarray)         : Ray directions, shape (L, 3)
+        vertices (ndarray)  : Mesh vertices, shape (N, 3)
+        faces (ndarray)     : Vertex indices of the triangles, shape (F, 3)
+        tol, chunk_size     : See 'ray_triangles_first_hit'
+
+    Returns:
+        t (ndarray)         : Scale factor of the first intersection of each ray, NaN if the ray does not hit
+    '''
+    U = np.atleast_2d(np.asarray(U, dtype=float))
+    v0, v1, v2 = (np.asarray(vertices, dtype=float)[faces[:, k]] for k in range(3))
+    t = ray_triangles_first_hit(U, v0, v1 - v0, v2 - v0, tol=tol, chunk_size=chunk_size)
+    t[np.isinf(t)] = np.nan
+    return t
+
+
 if __name__ == '__main__':
     pass
@@ -0,0 +1,135 @@
+# Built-in packages
+import contextlib
+import time
+
+
+'''
+Opt-in instrumentation of the hot paths of the section analysis.
+
+Instrumented functions ask for the active profiler and only record timings and counters when one is
+installed, so the overhead is a single function call per instrumented function when profiling is off.
+Stage timings are cumulative wall clock times between consecutive laps.
+
+    import instrumentation
+
+    with instrumentation.profile() as prof:
+        compute_capacity_surface(section, fcd, fyd, Es, eps_cu)
+    print(prof.report())
+
+or, e.g. in a long running process,
+
+    instrumentation.enable()
+    ...
+    print(instrumentation.summary())
+    instrumentation.disable()
+
+NOTE The profiler is a module level object and is not thread safe. Each process of a process pool
+     has its own profiler.
+'''
+
+_active = None
+
+
+class Profiler:
+    '''
+    Collection of call counts, event counters and cumulative stage timers.
+
+    Attributes:
+        calls (dict)    : Number of calls of each instrumented function
+        counts (dict)   : Event counters, e.g. the number of states of each type
+        times (dict)    : Cumulative time [s] spent in each stage
+        laps (dict)     : Number of times each stage was timed
+    '''
+    __slots__ = ('calls', 'counts', 'times', 'laps')
+
+    def __init__(self):
+        self.calls = {}
+        self.counts = {}
+        self.times = {}
+        self.laps = {}
+
+    def call(self, name):
+        ''' Count a call of function 'name' and return the current time as start of its first stage. '''
+        self.calls[name] = self.calls.get(name, 0) + 1
+        return time.perf_counter()
+
+    def count(self, name, n=1):
+        ''' Increase counter 'name' by 'n'. '''
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def lap(self, stage, t0):
+        ''' Add the time since 't0' to 'stage' and return the current time as start of the next stage. '''
+        t = time.perf_counter()
+        self.times[stage] = self.times.get(stage, 0.0) + t - t0
+        self.laps[stage] = self.laps.get(stage, 0) + 1
+        return t
+
+    def reset(self):
+        ''' Clear all counters and timers. '''
+        self.calls.clear()
+        self.counts.clear()
+        self.times.clear()
+        self.laps.clear()
+
+    def summary(self):
+        '''
+        Return a copy of the recorded data.
+
+        Returns:
+            summary (dict)  : {'calls': {name: n}, 'counts': {name: n}, 'times': {stage: (total time, laps)}}
+        '''
+        return {'calls': dict(self.calls), 'counts': dict(self.counts),
+                'times': {stage: (t, self.laps[stage]) for stage, t in self.times.items()}}
+
+    def report(self):
+        ''' Return the recorded data as a text table with stages sorted by total time. '''
+        lines = ['{:<50} {:>10} {:>12} {:>12}'.format('stage', 'laps', 'total [s]', 'mean [us]')]
+        for stage, t in sorted(self.times.items(), key=lambda item: -item[1]):
+            n = self.laps[stage]
+            lines.append('{:<50} {:>10} {:>12.4f} {:>12.2f}'.format(stage, n, t, t / n * 1e6))
+        lines.append('')
+        for name, n in sorted(self.calls.items()):
+            lines.append('{:<50} {:>10} calls'.format(name, n))
+        for name, n in sorted(self.counts.items()):
+            lines.append('{:<50} {:>10}'.format(name, n))
+        return '\n'.join(lines)
+
+
+def active():
+    ''' Return the active profiler, or None if profiling is disabled. '''
+    return _active
+
+
+def enable(profiler=None):
+    ''' Install 'profiler' (or a new one) as the active profiler and return it. '''
+    global _active
+    _active = profiler if profiler is not None else Profiler()
+    return _active
+
+
+def disable():
+    ''' Stop profiling and return the profiler that was active. '''
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+def summary():
+    ''' Return the summary of the active profiler, see 'Profiler.summary'. '''
+    if _active is None:
+        raise RuntimeError('Profiling is not enabled.')
+    return _active.summary()
+
+
+@contextlib.contextmanager
+def profile():
+    ''' Context manager that profiles the enclosed code and yields the profiler. '''
+    previous = _active
+    profiler = enable()
+    try:
+        yield profiler
+    finally:
+        if previous is not None:
+            enable(previous)
+        else:
+            disable()
@@ -0,0 +1,272 @@
+# Built-in packages
+from math import pi
+import os
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import section_calc as sc
+from section import Section
+
+
+'''
+Batched section analysis of many neutral axis states, with an optional JIT compiled backend.
+
+'section_states' returns the capacities P, Mx and My for arrays of neutral axis angles and offsets (see
+'geometry.line_normal'). The full analysis of a state, i.e. distances, clipping of the stress block, area and
+centroid, strains, stresses, bar forces and moments, is done by one of two backends:
+
+    numba   : The analysis of a single state is written as plain loops and compiled with numba, and the states
+              are analysed in parallel. Only for polygon sections, i.e. 'Section' itself, as the stress block of
+              circular sections is found in closed form by the section class.
+    numpy   : Each state is analysed by 'section_calc.perform_section_analysis', i.e. the reference
+              implementation. Used for all other sections and when numba is not installed.
+
+'state_function' binds a section and its materials and returns the batched analysis as a function of the angles
+and offsets only, for solvers that analyse many small batches of the same section (see 'slices').
+
+The backend is selected when the first batch is analysed. numba is optional and imported only then, and the
+environment variable BIAXIAL_BENDING_JIT=0 disables it. Compiled kernels are cached on disk by numba, so the
+compilation time is only spent once per installation.
+
+Both backends give the same results up to rounding of the summation order (relative differences of about 1e-15).
+'''
+
+# Compiled kernel, False if numba is not available or disabled, None if not tried yet
+_KERNEL = None
+
+
+def _state(x_ring, y_ring, xr, yr, As, fyd, Es, in_concrete, area, cx, cy, fcd, eps_cu, lambda_, s, c, offset):
+    '''
+    Return P, Mx and My of a polygon section for the neutral axis d = x*s - y*c + offset. Follows the steps of
+    'section_calc.perform_section_analysis' with plain loops, so it can be compiled. Returns NaN for a pure
+    tension state without a bar on the tension side.
+    '''
+    n = x_ring.size - 1
+    m = xr.size
+
+    # Distances from neutral axis to vertices and rebars
+    dv = np.empty(n + 1)
+    v_min = np.inf
+    v_max = -np.inf
+    for i in range(n):
+        dv[i] = x_ring[i] * s - y_ring[i] * c + offset + 0.0
+        v_min = min(v_min, dv[i])
+        v_max = max(v_max, dv[i])
+    dv[n] = dv[0]
+    dr = np.empty(m)
+    r_max = -np.inf
+    for j in range(m):
+        dr[j] = xr[j] * s - yr[j] * c + offset + 0.0
+        if dr[j] > 0:
+            r_max = max(r_max, dr[j])
+
+    # Stress block, see 'section_calc.stress_block_geometry'
+    Asb = 0.0
+    sb_x = 0.0
+    sb_y = 0.0
+    if v_min >= 0:
+        # Pure tension, scaled by the extreme tension bar as in 'section_calc.stress_block_geometry'. Without
+        # one the state is undefined, NaN is returned as exceptions are not raised from the parallel loop
+        if r_max == -np.inf:
+            return np.nan, np.nan, np.nan
+        depth = r_max
+        level = -np.inf
+    elif v_max <= 0:
+        # Pure compression, the stress block is the entire section
+        depth = v_min
+        level = np.inf
+        Asb = area
+        sb_x = cx
+        sb_y = cy
+    else:
+        depth = v_min
+        level = depth - lambda_ * depth
+
+        # Clip the polygon by the inner edge of the stress block and accumulate area and first moments of the
+        # clipped polygon along the way (shoelace formula)
+        A2 = 0.0
+        Sx6 = 0.0
+        Sy6 = 0.0
+        first = True
+        x_first = 0.0
+        y_first = 0.0
+        x_prev = 0.0
+        y_prev = 0.0
+        for i in range(n):
+            e0 = dv[i] - level
+            e1 = dv[i+1] - level
+            for k in range(2):
+                if k == 0:
+                    if not e0 <= 0:
+                        continue
+                    xp = x_ring[i]
+                    yp = y_ring[i]
+                else:
+                    if not e0 * e1 < 0:
+                        continue
+                    t = e0 / (e0 - e1)
+                    xp = x_ring[i] + t * (x_ring[i+1] - x_ring[i])
+                    yp = y_ring[i] + t * (y_ring[i+1] - y_ring[i])
+                if first:
+                    x_first = xp
+                    y_first = yp
+                    first = False
+                else:
+                    cross = x_prev * yp - xp * y_prev
+                    A2 += cross
+                    Sx6 += (x_prev + xp) * cross
+                    Sy6 += (y_prev + yp) * cross
+                x_prev = xp
+                y_prev = yp
+        if not first:
+            cross = x_prev * y_first - x_first * y_prev
+            A2 += cross
+            Sx6 += (x_prev + x_first) * cross
+            Sy6 += (y_prev + y_first) * cross
+        Asb = A2 / 2
+        if Asb != 0:
+            sb_x = Sx6 / (6 * Asb)
+            sb_y = Sy6 / (6 * Asb)
+
+    # Rebar strains, stresses and forces
+    Fc = -lambda_ * fcd * Asb
+    P = 0.0
+    Mx = 0.0
+    My = 0.0
+    for j in range(m):
+        sigma = dr[j] / abs(depth) * eps_cu * Es[j]
+        sigma = min(max(sigma, -fyd[j]), fyd[j])
+        if in_concrete[j] and dr[j] <= level:
+            sigma += lambda_ * fcd
+        F = sigma * As[j]
+        P += F
+        Mx += -F * yr[j]
+        My += -F * xr[j]
+
+    # Moments of the stress block
+    P += Fc
+    if Asb != 0:
+        Mx += -Fc * sb_y
+        My += -Fc * sb_x
+    return P, Mx, My
+
+
+def _states(x_ring, y_ring, xr, yr, As, fyd, Es, in_concrete, area, cx, cy, fcd, eps_cu, lambda_, s, c, offset):
+    ''' Return arrays P, Mx and My for all states, see '_state'. '''
+    n = offset.size
+    P = np.empty(n)
+    Mx = np.empty(n)
+    My = np.empty(n)
+    for i in range(n):
+        P[i], Mx[i], My[i] = _state(x_ring, y_ring, xr, yr, As, fyd, Es, in_concrete, area, cx, cy, fcd, eps_cu,
+                                    lambda_, s[i], c[i], offset[i])
+    return P, Mx, My
+
+
+def _compile(numba):
+    '''
+    Return '_states' compiled by numba, with the states analysed in parallel. '_state' is registered as callable
+    from compiled code rather than replaced, so '_state' and '_states' remain the plain Python reference whether
+    numba is used or not.
+    '''
+    numba.extending.register_jitable(_state)
+    prange = numba.prange
+
+    def states(x_ring, y_ring, xr, yr, As, fyd, Es, in_concrete, area, cx, cy, fcd, eps_cu, lambda_, s, c, offset):
+        n = offset.size
+        P = np.empty(n)
+        Mx = np.empty(n)
+        My = np.empty(n)
+        for i in prange(n):
+            P[i], Mx[i], My[i] = _state(x_ring, y_ring, xr, yr, As, fyd, Es, in_concrete, area, cx, cy, fcd, eps_cu,
+                                        lambda_, s[i], c[i], offset[i])
+        return P, Mx, My
+    return numba.njit(parallel=True, cache=True)(states)
+
+
+def _kernel():
+    ''' Return the compiled kernel, or None if numba is not available or disabled. '''
+    global _KERNEL
+    if _KERNEL is None:
+        _KERNEL = False
+        if os.environ.get('BIAXIAL_BENDING_JIT', '1') != '0':
+            try:
+                import numba
+            except ImportError:
+                pass
+            else:
+                _KERNEL = _compile(numba)
+    return _KERNEL or None
+
+
+def select_backend(section):
+    ''' Return the name of the backend used for 'section' by default, 'numba' or 'numpy'. '''
+    return 'numba' if type(section) is Section and _kernel() is not None else 'numpy'
+
+
+def state_function(section, fcd, fyd, Es, eps_cu, lambda_=0.80, backend=None):
+    '''
+    Return a function 'states(alpha_deg, offset)' that returns P, Mx and My of batches of neutral axis states of a
+    section, see 'section_states'. The arguments of the kernel are prepared once, so solvers that analyse many
+    small batches of the same section do not pay for it with every batch.
+    '''
+    if backend is None:
+        backend = select_backend(section)
+
+    if backend == 'numba':
+        kernel = _kernel()
+        if kernel is None or type(section) is not Section:
+            raise ValueError('The numba backend requires numba and a polygon section.')
+        m = len(section.rebars)
+        args = (section.x_ring, section.y_ring, section.xr, section.yr,
+                np.ascontiguousarray(np.broadcast_to(section.As, m), dtype=float),
+                np.ascontiguousarray(np.broadcast_to(fyd, m), dtype=float),
+                np.ascontiguousarray(np.broadcast_to(Es, m), dtype=float),
+                section.rebars_in_concrete, float(section.area), float(section.centroid[0]),
+                float(section.centroid[1]), float(fcd), float(eps_cu), float(lambda_))
+
+        def states(alpha_deg, offset):
+            alpha_deg, offset = np.broadcast_arrays(np.asarray(alpha_deg, dtype=float),
+                                                    np.asarray(offset, dtype=float))
+            alpha = alpha_deg.ravel() * pi / 180
+            offset = np.ascontiguousarray(offset.ravel())
+            P, Mx, My = kernel(*args, np.sin(alpha), np.cos(alpha), offset)
+            if np.any(np.isnan(P) & np.isfinite(offset)):
+                # As 'section_calc.stress_block_geometry' for a pure tension state without tension bar
+                raise ValueError('No rebar on the tension side of a pure tension state.')
+            return P, Mx, My
+        return states
+
+    def states(alpha_deg, offset):
+        alpha_deg, offset = np.broadcast_arrays(np.asarray(alpha_deg, dtype=float), np.asarray(offset, dtype=float))
+        alpha_deg = alpha_deg.ravel()
+        offset = offset.ravel()
+        P = np.empty(offset.size)
+        Mx = np.empty(offset.size)
+        My = np.empty(offset.size)
+        for i in range(offset.size):
+            Fc, Fr, Asb, sb_cog, _, _ = sc.perform_section_analysis(section, fcd, fyd, Es, eps_cu, alpha_deg[i],
+                                                                    None, lambda_=lambda_, offset=offset[i])
+            Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(section.xr, section.yr, Asb, sb_cog, Fc, Fr)
+            P[i] = np.sum(Fr) + Fc
+            Mx[i] = np.sum(Mrx) + Mcx
+            My[i] = np.sum(Mry) + Mcy
+        return P, Mx, My
+    return states
+
+
+def section_states(section, fcd, fyd, Es, eps_cu, alpha_deg, offset, lambda_=0.80, backend=None):
+    '''
+    Return the capacities of a section for a batch of neutral axis states.
+
+    Args:
+        alpha_deg (ndarray)     : Angles of the neutral axes [deg], single value or one per state
+        offset (ndarray)        : Offsets of the neutral axes in normal form, see 'geometry.line_normal'
+        backend (str)           : 'numba' or 'numpy', selected automatically if not given (see module docstring)
+
+    Returns:
+        P, Mx, My (ndarray)     : Capacities of each state
+    '''
+    return state_function(section, fcd, fyd, Es, eps_cu, lambda_=lambda_, backend=backend)(alpha_deg, offset)
@@ -0,0 +1,272 @@
+# Built-in packages
+from math import cos, sin, radians
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import section_calc as sc
+import calc_uls
+from geometry import points_in_polygon
+
+
+'''
+Moment-curvature analysis of a section for a given axial load and moment direction.
+
+The strain is plane, eps(x, y) = eps0 - kx*y - ky*x, with the curvatures (kx, ky) about the x- and y-axis signed
+like the moments (positive kx gives compression at positive y, see 'calc_uls'). The concrete is discretized into
+fibres on a grid and follows the parabola-rectangle diagram of EN 1992-1-1, 3.1.7, without tension. The rebars are
+elastic-perfectly plastic ('section_calc.compute_rebar_stress'), and the concrete they displace is deducted as in
+'section_calc.compute_rebar_forces'. Forces and tangent stiffness are sums over fibres and bars:
+
+    (N, Mx, My) = sum(sigma * A * (1, -y, -x))
+    K = d(N, Mx, My) / d(eps0, kx, ky) = sum(E_t * A * g g^T),   g = (1, -y, -x)
+
+with the tangent modulus E_t of each fibre, so the Newton iterations use the analytical tangent.
+
+A curve is found by stepping the magnitude of the curvature. At each step, the strain at the reference point and
+the angle of the curvature are solved for the axial load and for a moment in the given direction, starting from
+the solution of the previous step extrapolated to the new curvature. The curve ends where the concrete reaches
+'eps_cu' or the steel 'eps_ud', found by bisection of the last step, at the largest curvature, or where
+equilibrium cannot be found. 'curve' returns which of these ended it.
+'''
+
+
+class MomentCurvature:
+    '''
+    Fibre model of a section for moment-curvature analysis.
+
+    Args:
+        section (Section)       : Section
+        fcd (float)             : Concrete strength
+        fyd, Es                 : Rebar yield stress and modulus, single values or sequences indexed by material ID
+        eps_cu (float)          : Ultimate concrete strain
+        eps_c2 (float)          : Concrete strain at which the strength is reached
+        n (float)               : Exponent of the parabola
+        eps_ud (float)          : Ultimate steel strain, unlimited if None
+        reference               : Moment reference point, see 'calc_uls.compute_capacity_surface'
+        mesh (int)              : Number of fibres along the longer side of the bounding box of the section
+
+    Attributes:
+        x, y, area (ndarray)    : Centroids and areas of the concrete fibres, relative to the reference point
+    '''
+
+    def __init__(self, section, fcd, fyd, Es, eps_cu=0.0035, eps_c2=0.002, n=2.0, eps_ud=None, reference=None,
+                 mesh=40):
+        self.section = calc_uls.reference_section(section, fcd, fyd, 1.0, reference)
+        self.fcd = fcd
+        self.eps_cu = eps_cu
+        self.eps_c2 = eps_c2
+        self.n = n
+        self.eps_ud = eps_ud
+        rebars = self.section.rebars
+        self.fyd = rebars.per_bar(fyd)
+        self.Es = rebars.per_bar(Es)
+        self.x, self.y, self.area = self._fibres(mesh)
+
+    def _fibres(self, mesh, subdivisions=4):
+        '''
+        Return the fibres of the concrete as the parts of the cells of a square grid inside the section, with area
+        and centroid from a grid of points in each cell. The areas are scaled to the exact area of the section.
+        '''
+        s = self.section
+        xmin, ymin, xmax, ymax = s.bbox
+        size = max(xmax - xmin, ymax - ymin) / mesh
+        nx = max(int(np.ceil((xmax - xmin) / size)), 1)
+        ny = max(int(np.ceil((ymax - ymin) / size)), 1)
+        offsets = (np.arange(subdivisions) + 0.5) / subdivisions
+        px = xmin + (np.arange(nx)[:, None] + offsets).ravel() * (xmax - xmin) / nx
+        py = ymin + (np.arange(ny)[:, None] + offsets).ravel() * (ymax - ymin) / ny
+        px, py = (a.ravel() for a in np.meshgrid(px, py, indexing='ij'))
+        inside = points_in_polygon(px, py, s.x_ring, s.y_ring)
+        if s._is_circular:
+            inside &= np.hypot(px - s.center[0], py - s.center[1]) >= s.inner_radius
+
+        # Sum the points inside the section per cell
+        i = np.minimum(((px - xmin) / (xmax - xmin) * nx).astype(int), nx - 1)
+        j = np.minimum(((py - ymin) / (ymax - ymin) * ny).astype(int), ny - 1)
+        cell = (i * ny + j)[inside]
+        count = np.bincount(cell, minlength=nx * ny)
+        keep = count > 0
+        x = np.bincount(cell, px[inside], nx * ny)[keep] / count[keep]
+        y = np.bincount(cell, py[inside], nx * ny)[keep] / count[keep]
+        area = count[keep] * s.area / count.sum()
+        return x, y, area
+
+    def concrete_stress(self, eps):
+        ''' Return the concrete stress and tangent modulus for the strains 'eps' (compression negative). '''
+        e = np.clip(-np.asarray(eps, dtype=float) / self.eps_c2, 0, 1)
+        sigma = -self.fcd * (1 - (1 - e)**self.n)
+        tangent = self.fcd * self.n / self.eps_c2 * (1 - e)**(self.n - 1)
+        return sigma, np.where((e > 0) & (e < 1), tangent, 0.0)
+
+    def state(self, eps0, kx, ky):
+        '''
+        Return the section forces and tangent stiffness for a plane strain state.
+
+        Returns:
+            forces (ndarray)    : (N, Mx, My)
+            K (ndarray)         : Tangent stiffness d(N, Mx, My) / d(eps0, kx, ky), shape (3, 3)
+        '''
+        s = self.section
+        sigma_c, E_c = self.concrete_stress(eps0 - kx * self.y - ky * self.x)
+        eps_r = eps0 - kx * s.yr - ky * s.xr
+        sigma_r = sc.compute_rebar_stress(eps_r, self.Es, self.fyd)
+        E_r = np.where(np.abs(eps_r) * self.Es < self.fyd, self.Es, 0.0)
+
+        # Concrete displaced by the rebars inside the section
+        sigma_d, E_d = self.concrete_stress(eps_r)
+        sigma_r = sigma_r - np.where(s.rebars_in_concrete, sigma_d, 0)
+        E_r = E_r - np.where(s.rebars_in_concrete, E_d, 0)
+
+        g = np.concatenate((np.stack((np.ones(self.x.size), -self.y, -self.x)),
+                            np.stack((np.ones(s.xr.size), -s.yr, -s.xr))), axis=1)
+        A = np.concatenate((self.area, s.As))
+        forces = g @ (np.concatenate((sigma_c, sigma_r)) * A)
+        K = (g * (np.concatenate((E_c, E_r)) * A)) @ g.T
+        return forces, K
+
+    def strain_limits(self, eps0, kx, ky):
+        '''
+        Return the utilization of the ultimate strains, i.e. the largest of the concrete strain at the extreme fibre
+        divided by -eps_cu and the steel strain divided by eps_ud. The section fails where it exceeds 1.
+        '''
+        s = self.section
+        eps_c = eps0 - kx * s.y - ky * s.x
+        eps_r = eps0 - kx * s.yr - ky * s.xr
+        utilization = max(-eps_c.min() / self.eps_cu, 0)
+        if self.eps_ud is not None and eps_r.size:
+            utilization = max(utilization, eps_r.max() / self.eps_ud)
+        return utilization
+
+    def _solve(self, P, theta, kappa, eps0, phi, tol, max_iter):
+        '''
+        Return the strain at the reference point and the angle of the curvature that give the axial load 'P' and
+        a moment in direction 'theta' for curvature 'kappa', by Newton iterations from (eps0, phi). Returns None if
+        the iterations do not converge.
+        '''
+        direction = np.array([-sin(theta), cos(theta)])
+        scale = None
+        for _ in range(max_iter):
+            k = kappa * np.array([cos(phi), sin(phi)])
+            forces, K = self.state(eps0, *k)
+            residual = np.array([forces[0] - P, direction @ forces[1:]])
+            if scale is None:
+                # Force and moment scales of the section, for the convergence test
+                scale = np.array([self.fcd * self.section.area, self.fcd * self.section.area
+                                  * max(np.ptp(self.x), np.ptp(self.y))])
+            if np.all(np.abs(residual) <= tol * scale):
+                return eps0, phi, forces
+            dk = kappa * np.array([-sin(phi), cos(phi)])
+            J = np.array([[K[0, 0], K[0, 1:] @ dk],
+                          [direction @ K[1:, 0], direction @ K[1:, 1:] @ dk]])
+            try:
+                step = np.linalg.solve(J, -residual)
+            except np.linalg.LinAlgError:
+                step = np.linalg.lstsq(J, -residual, rcond=None)[0]
+            if not np.all(np.isfinite(step)):
+                return None
+
+            # Limit the steps, the tangent changes abruptly where fibres crack, yield or reach the plateau
+            step[0] = np.clip(step[0], -self.eps_cu, self.eps_cu)
+            step[1] = np.clip(step[1], -0.5, 0.5)
+            eps0 += step[0]
+            phi += step[1]
+        return None
+
+    def curve(self, P, theta_deg=0.0, kappa_max=None, n_steps=50, tol=1e-8, max_iter=50):
+        '''
+        Return the moment-curvature curve for the axial load 'P' and moments in direction 'theta_deg', i.e.
+        (Mx, My) = M * (cos(theta), sin(theta)).
+
+        Args:
+            P (float)               : Axial load (negative in compression)
+            theta_deg (float)       : Direction of the moment vector [deg]
+            kappa_max (float)       : Largest curvature, by default 10*eps_cu divided by the smallest side of the
+                                      bounding box of the section
+            n_steps (int)           : Number of curvature steps up to 'kappa_max'
+            tol (float)             : Tolerance on the equilibrium relative to the force and moment scales
+
+        Returns:
+            kappa (ndarray)         : Curvatures, starting at 0
+            M (ndarray)             : Moments in direction 'theta_deg'
+            strains (ndarray)       : (eps0, kx, ky) of each point, shape (points, 3)
+            end (str)               : Why the curve ends, 'ultimate' where the ultimate strain is reached,
+                                      'kappa_max' at the largest curvature or 'not_converged' where no equilibrium
+                                      was found for the next step
+        '''
+        theta = radians(theta_deg)
+        if kappa_max is None:
+            xmin, ymin, xmax, ymax = self.section.bbox
+            kappa_max = 10 * self.eps_cu / min(xmax - xmin, ymax - ymin)
+
+        eps0, forces = self._uniform_strain(P, tol, max_iter)
+        kappa = [0.0]
+        M = [forces[1] * cos(theta) + forces[2] * sin(theta)]
+        states = [(eps0, 0.0, 0.0)]
+        phi = theta
+        slope = 0.0
+        end = 'kappa_max'
+        for k in np.linspace(0, kappa_max, n_steps + 1)[1:]:
+            # Warm start from the previous solution, extrapolated to the new curvature
+            result = self._solve(P, theta, k, eps0 + slope * (k - kappa[-1]), phi, tol, max_iter)
+            if result is None:
+                end = 'not_converged'
+                break
+            ultimate = self.strain_limits(result[0], k * cos(result[1]), k * sin(result[1])) > 1
+            if ultimate:
+                k, result = self._ultimate(P, theta, kappa[-1], k, eps0, slope, phi, tol, max_iter)
+                if result is None:
+                    end = 'not_converged'
+                    break
+            slope = (result[0] - eps0) / (k - kappa[-1])
+            eps0, phi, forces = result
+            kappa.append(k)
+            M.append(forces[1] * cos(theta) + forces[2] * sin(theta))
+            states.append((eps0, k * cos(phi), k * sin(phi)))
+            if ultimate:
+                end = 'ultimate'
+                break
+        return np.array(kappa), np.array(M), np.array(states), end
+
+    def _uniform_strain(self, P, tol, max_iter):
+        '''
+        Return the uniform strain for the axial load 'P' and the section forces, by Newton iterations safeguarded
+        by bisection, as the axial force is monotonic in the strain but has plateaus where the tangent is 0.
+        '''
+        lo = -self.eps_cu
+        hi = self.eps_ud if self.eps_ud is not None else 10 * self.eps_cu
+        if not self.state(lo, 0, 0)[0][0] <= P <= self.state(hi, 0, 0)[0][0]:
+            raise ValueError('The axial load {} exceeds the axial capacity of the section.'.format(P))
+        eps0 = 0.0
+        for _ in range(max_iter):
+            forces, K = self.state(eps0, 0, 0)
+            error = forces[0] - P
+            if abs(error) <= tol * self.fcd * self.section.area:
+                break
+            if error > 0:
+                hi = eps0
+            else:
+                lo = eps0
+            eps0 = eps0 - error / K[0, 0] if K[0, 0] > 0 else lo - 1
+            if not lo < eps0 < hi:
+                eps0 = (lo + hi) / 2
+        return eps0, forces
+
+    def _ultimate(self, P, theta, lo, hi, eps0, slope, phi, tol, max_iter):
+        '''
+        Return the curvature between 'lo' (within the strain limits) and 'hi' (beyond) where the ultimate strain is
+        reached, by bisection, and the solution for it. The solution is None if none was found above 'lo'.
+        '''
+        kappa_0 = lo
+        result = None
+        while hi - lo > 1e-4 * hi:
+            mid = (lo + hi) / 2
+            trial = self._solve(P, theta, mid, eps0 + slope * (mid - kappa_0), phi, tol, max_iter)
+            if trial is None:
+                break
+            if self.strain_limits(trial[0], mid * cos(trial[1]), mid * sin(trial[1])) > 1:
+                hi = mid
+            else:
+                lo, result = mid, trial
+        return lo, result
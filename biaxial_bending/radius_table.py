@@ -0,0 +1,209 @@
+# Built-in packages
+from math import pi
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import geometry
+import instrumentation
+
+
+'''
+Lookup table of the capacity radius of a capacity surface as a function of the direction from the origin, for
+screening large numbers of load combinations.
+
+The radius of the convex hull of the capacity surface points, i.e. the distance from the origin to the hull, is
+computed once at the nodes of a latitude/longitude grid of directions (see 'facet_index' for the axes). The
+utilization ratio of a load combination is then the distance of the load combination point from the origin
+divided by the radius interpolated from the four nodes around its direction, which costs a fixed number of
+operations per load combination regardless of the size of the surface.
+
+Each interpolated utilization ratio comes with certified bounds on the radius, which hold up to rounding as the
+hull is convex:
+
+    Inner bound     : The triangles through the hull points at the nodes of a cell are inside the hull, so the
+                      radius is at least the distance to the triangle the direction passes through.
+    Outer bound     : The hull is on the inner side of the facet (supporting plane) hit at each node, so the
+                      radius is at most the distance to the nearest of these planes in the direction.
+    Slope bound     : The log of the radius of a convex body containing the ball of radius 'rho' around the
+                      origin changes with the direction by at most tan(beta) per radian, where beta is the angle
+                      between the direction and the surface normal and tan(beta) <= sqrt(r**2/rho**2 - 1) for a
+                      radius 'r'. With the largest radius possible within the cell, this bounds the change from
+                      each node. Used for directions outside both triangles of their cell, a thin sliver along
+                      the parallels, which are not great circles.
+
+Only load combinations whose bounds contain the limit, typically a small fraction, need the exact query against
+the hull ('geometry.hull_gauge').
+
+Axes are scaled to comparable magnitudes as in 'facet_index', which does not change the utilization ratios.
+'''
+
+
+class RadiusTable:
+    '''
+    Capacity radius of the convex hull of a capacity surface on a latitude/longitude grid of directions.
+
+    Args:
+        P, Mx, My (ndarray)         : Capacity surface points, the origin must be inside their convex hull
+        n_lat (int)                 : Number of latitude cells, there are twice as many longitude cells
+        hull_equations (ndarray)    : Facet equations of the convex hull of the points, computed if not given
+    '''
+    __slots__ = ('scale', 'equations', 'n_lat', 'n_lon', 'directions', 'log_radius', 'normals', 'inverse', 'slope')
+
+    def __init__(self, P, Mx, My, n_lat=90, hull_equations=None):
+        vertices = np.column_stack((P, Mx, My)).astype(float)
+        self.scale = np.abs(vertices).max(axis=0)
+        self.scale[self.scale == 0] = 1
+        if hull_equations is None:
+            from scipy.spatial import ConvexHull
+            hull_equations = ConvexHull(vertices).equations
+
+        # Facet equations in scaled axes with offsets -1, i.e. n.x = 1 on the facets
+        equations = np.asarray(hull_equations, dtype=float)
+        if not np.all(equations[:, -1] < 0):
+            raise ValueError('The origin is not inside the convex hull of the capacity surface.')
+        normals = equations[:, :-1] * self.scale / -equations[:, -1:]
+        self.equations = np.column_stack((normals, -np.ones(normals.shape[0])))
+
+        # Radius and facet hit at the nodes of the grid
+        self.n_lat = n_lat
+        self.n_lon = 2 * n_lat
+        lat = np.linspace(-pi/2, pi/2, self.n_lat + 1)
+        lon = np.linspace(-pi, pi, self.n_lon + 1)
+        lat_grid, lon_grid = np.meshgrid(lat, lon, indexing='ij')
+        self.directions = np.stack((np.sin(lat_grid), np.cos(lat_grid) * np.cos(lon_grid),
+                                    np.cos(lat_grid) * np.sin(lon_grid)), axis=-1)
+        facet = np.argmax(self.directions @ normals.T, axis=-1)
+        self.normals = normals[facet]
+        self.log_radius = -np.log(np.einsum('ijk,ijk->ij', self.directions, self.normals))
+
+        # Inverse of the matrices with the hull points at the nodes of the two triangles of each cell as columns,
+        # the triangles are (00, 10, 11) and (00, 11, 01) with the offsets of the nodes in latitude and longitude.
+        # Triangles with two nodes at a pole are degenerate and never contain a direction
+        points = self.directions * np.exp(self.log_radius)[..., None]
+        p00, p10, p01, p11 = points[:-1, :-1], points[1:, :-1], points[:-1, 1:], points[1:, 1:]
+        matrices = np.stack((np.stack((p00, p10, p11), axis=-1), np.stack((p00, p11, p01), axis=-1)), axis=2)
+        degenerate = np.abs(np.linalg.det(matrices)) <= 1e-12 * np.exp(3 * self.log_radius.max())
+        matrices[degenerate] = np.eye(3)
+        self.inverse = np.linalg.inv(matrices)
+        self.inverse[degenerate] = np.nan
+
+        # Radius of the largest ball around the origin inside the hull and largest radius of the hull
+        rho = 1 / np.linalg.norm(normals, axis=1).max()
+        r_max = np.linalg.norm(vertices / self.scale, axis=1).max()
+        slope_max = np.sqrt(max(r_max**2 / rho**2 - 1, 0))
+
+        # Angular diameter of the cells, bounded by the length of the path along a meridian and a parallel
+        cos_max = np.where(lat[:-1] * lat[1:] <= 0, 1, np.maximum(np.cos(lat[:-1]), np.cos(lat[1:])))
+        diameter = pi / self.n_lat + 2 * pi / self.n_lon * cos_max
+
+        # Largest radius within each cell, reached from the nearest node at the largest slope, and the largest
+        # slope of the log of the radius with that radius
+        corners = np.stack((self.log_radius[:-1, :-1], self.log_radius[1:, :-1], self.log_radius[:-1, 1:],
+                            self.log_radius[1:, 1:]))
+        r_cell = np.exp(corners.min(axis=0) + 2 * slope_max * diameter[:, None])
+        self.slope = np.sqrt(np.maximum(np.minimum(r_cell, r_max)**2 / rho**2 - 1, 0))
+
+    def __len__(self):
+        return self.log_radius.size
+
+    def bounds(self, Ped, Mxed, Myed, chunk_size=2**17):
+        '''
+        Return interpolated utilization ratios of load combinations with lower and upper bounds.
+
+        The interpolated radius is the distance to the triangle of the cell the direction passes through, i.e.
+        the inner bound, and bilinear in the log of the radius where the direction is outside both triangles.
+
+        Args:
+            chunk_size (int)    : Number of load combinations processed at a time, limits the memory use
+
+        Returns:
+            ur (ndarray)        : Interpolated utilization ratios
+            low, high (ndarray) : Bounds of the utilization ratios
+        '''
+        U = np.column_stack((Ped, Mxed, Myed)).astype(float) / self.scale
+        ur = np.empty(U.shape[0])
+        low = np.empty(U.shape[0])
+        high = np.empty(U.shape[0])
+        for k in range(0, U.shape[0], chunk_size):
+            u = U[k:k+chunk_size]
+            norms = np.sqrt(np.einsum('lk,lk->l', u, u))
+
+            # Direction of each load combination, load combinations where all loads are 0 get any direction
+            with np.errstate(invalid='ignore', divide='ignore'):
+                d = u / norms[:, None]
+            d[norms == 0] = (1, 0, 0)
+
+            # Cell of the direction and position within the cell
+            fi = (np.arcsin(np.clip(d[:, 0], -1, 1)) + pi/2) / pi * self.n_lat
+            fj = (np.arctan2(d[:, 2], d[:, 1]) + pi) / (2*pi) * self.n_lon
+            i = np.clip(fi.astype(np.intp), 0, self.n_lat - 1)
+            j = np.clip(fj.astype(np.intp), 0, self.n_lon - 1)
+            a = fi - i
+            b = fj - j
+
+            # Bounds and estimate of the gauge of the direction, i.e. the inverse of the radius. Lower bound from the
+            # planes of the facets hit at the four nodes
+            g_low = np.einsum('lk,lk->l', d, self.normals[i, j])
+            for di, dj in ((1, 0), (0, 1), (1, 1)):
+                g_low = np.maximum(g_low, np.einsum('lk,lk->l', d, self.normals[i+di, j+dj]))
+
+            # Upper bound from the triangle the direction passes through, where the coordinates of the direction in
+            # the basis of the hull points are all positive. The ray then hits the triangle where they sum up to 1
+            g_high = np.full(d.shape[0], np.inf)
+            for t in range(2):
+                coordinates = np.einsum('lkm,lm->lk', self.inverse[i, j, t], d)
+                inside = np.all(coordinates >= 0, axis=1)
+                g_high[inside] = coordinates[inside].sum(axis=1)
+            g = g_high.copy()
+
+            # Slope bounds from the four nodes and bilinear interpolation of the log of the radius for directions
+            # outside both triangles
+            outside = np.flatnonzero(np.isinf(g_high))
+            if outside.size:
+                io, jo, ao, bo, do = i[outside], j[outside], a[outside], b[outside], d[outside]
+                slope = self.slope[io, jo]
+                bilinear = 0
+                lower = np.full(outside.size, -np.inf)
+                upper = np.full(outside.size, np.inf)
+                for di, dj, w in ((0, 0, (1-ao) * (1-bo)), (1, 0, ao * (1-bo)), (0, 1, (1-ao) * bo),
+                                  (1, 1, ao * bo)):
+                    node = self.log_radius[io+di, jo+dj]
+                    chord = np.linalg.norm(do - self.directions[io+di, jo+dj], axis=1)
+                    change = slope * 2 * np.arcsin(np.minimum(chord / 2, 1))
+                    bilinear = bilinear + w * node
+                    lower = np.maximum(lower, node - change)
+                    upper = np.minimum(upper, node + change)
+                g_low[outside] = np.maximum(g_low[outside], np.exp(-upper))
+                g_high[outside] = np.exp(-lower)
+                g[outside] = np.exp(-bilinear)
+
+            # Margin for rounding
+            g_low *= 1 - 1e-12
+            g_high *= 1 + 1e-12
+            ur[k:k+chunk_size] = norms * np.clip(g, g_low, g_high)
+            low[k:k+chunk_size] = norms * g_low
+            high[k:k+chunk_size] = norms * g_high
+        return ur, low, high
+
+    def utilization_ratio(self, Ped, Mxed, Myed, limit=1.0):
+        '''
+        Return utilization ratios of load combinations, interpolated where the bounds are on one side of 'limit'
+        and exact where they contain it. Utilization ratios are thus always on the correct side of 'limit'.
+
+        Returns:
+            ur (ndarray)        : Utilization ratios
+            exact (ndarray)     : True for the load combinations whose utilization ratio was computed exactly
+        '''
+        ur, low, high = self.bounds(Ped, Mxed, Myed)
+        exact = (low <= limit) & (high >= limit)
+        if np.any(exact):
+            U = np.column_stack((Ped, Mxed, Myed)).astype(float)[exact] / self.scale
+            ur[exact] = geometry.hull_gauge(U, self.equations)
+
+        prof = instrumentation.active()
+        if prof is not None:
+            prof.count('table.loads', ur.size)
+            prof.count('table.exact', int(exact.sum()))
+        return ur, exact
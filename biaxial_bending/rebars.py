@@ -0,0 +1,94 @@
+# Built-in libraries
+from math import pi
+
+# Third party libraries
+import numpy as np
+
+
+'''
+This module contains the data structure for the reinforcement layout of a cross section.
+
+A layout stores coordinates, areas and material IDs of all rebars as NumPy arrays, so the
+section calculations can operate on every bar at once instead of looping over Python lists.
+Bars with different sizes and steel grades can be mixed freely in the same layout.
+'''
+
+
+class RebarLayout:
+    '''
+    Reinforcement layout of a cross section.
+
+    Args:
+        x (list)                : x-coordinates of rebars
+        y (list)                : y-coordinates of rebars
+        dia (float/list)        : Rebar diameters, either one for all bars or one per bar
+        area (float/list)       : Rebar areas, either one for all bars or one per bar. Used if 'dia' is not given
+        material (int/list)     : Material ID of each rebar (defaults to 0 for all bars). The ID is used as index
+                                  into sequences of material properties, see 'per_bar'
+
+    Attributes:
+        x, y (ndarray)          : Rebar coordinates
+        dia (ndarray)           : Rebar diameters
+        area (ndarray)          : Rebar areas
+        material (ndarray)      : Integer material ID of each rebar
+    '''
+    __slots__ = ('x', 'y', 'dia', 'area', 'material')
+
+    def __init__(self, x, y, dia=None, area=None, material=0):
+        x = np.array(x, dtype=float).ravel()
+        y = np.array(y, dtype=float).ravel()
+        if x.size != y.size:
+            raise ValueError('Rebar coordinate lists must have equal length.')
+
+        if dia is not None:
+            dia = np.broadcast_to(np.asarray(dia, dtype=float), x.shape).copy()
+            area = pi * dia**2 / 4
+        elif area is not None:
+            area = np.broadcast_to(np.asarray(area, dtype=float), x.shape).copy()
+            dia = np.sqrt(4 * area / pi)
+        else:
+            raise ValueError('Either rebar diameters or rebar areas must be specified.')
+
+        self.x = x
+        self.y = y
+        self.dia = dia
+        self.area = area
+        self.material = np.broadcast_to(np.asarray(material, dtype=np.intp), x.shape).copy()
+
+    def __len__(self):
+        return self.x.size
+
+    def __repr__(self):
+        return 'RebarLayout({} bars, As={:.1f})'.format(len(self), self.total_area)
+
+    @property
+    def total_area(self):
+        ''' Return total area of all rebars in the layout. '''
+        return float(self.area.sum())
+
+    def per_bar(self, value):
+        '''
+        Return a material property as an array with one entry per rebar.
+
+        Args:
+            value (float/list)  : A single value used for all bars, or a sequence of values indexed by material ID
+
+        Returns:
+            values (ndarray)    : Property value for each rebar
+        '''
+        value = np.asarray(value, dtype=float)
+        if value.ndim == 0:
+            return np.full(len(self), float(value))
+        return value[self.material]
+
+    def scaled(self, dia=None, area=None):
+        ''' Return a copy of the layout with the same bar positions and materials, but new bar sizes. '''
+        return RebarLayout(self.x, self.y, dia=dia, area=area, material=self.material)
+
+
+if __name__ == '__main__':
+    # Mixed layout with Ø25 corner bars and Ø16 middle bars of two different steel grades
+    bars = RebarLayout([-140, 140, 140, -140, 0, 0], [140, 140, -140, -140, 140, -140],
+                       dia=[25, 25, 25, 25, 16, 16], material=[0, 0, 0, 0, 1, 1])
+    print(bars)
+    print('fyd per bar =', bars.per_bar([500/1.15, 400/1.15]))
@@ -0,0 +1,193 @@
+# Built-in packages
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import pi
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import batch
+import calc_uls
+from rebars import RebarLayout
+from state_cache import StateCache
+
+
+'''
+Search for the reinforcement layout with the smallest steel area that carries a set of load combinations.
+
+A layout is made of the first 1, 2, ... groups of candidate bar positions (e.g. corner bars, then the middle bars
+of the long faces, ...), with the same bar diameter for all bars. For each number of groups, the geometry of the
+neutral axis states is computed once ('state_cache.StateCache'), and the capacity surface of a diameter is then a
+single matrix product. The smallest passing diameter is found by bisection, where each step evaluates several
+diameters at once, and numbers of groups that cannot beat the best layout found so far are skipped. Only the
+load combinations at the vertices of the convex hull of the load combinations are checked, see
+'calc_uls.governing_load'.
+
+Bisection assumes that the largest utilization ratio does not increase with the bar diameter, which holds as long
+as larger bars do not reduce the capacity in the direction of any load combination.
+
+A library of sections (see 'batch') is sized as a batch job with the candidate bar positions as 'rebars', and
+optionally 'groups' (lists of bar indices) and 'diameters' per section:
+
+    python reinforcement_search.py sections.json loads.csv --diameters 12 16 20 25 32 --output schedule.json
+'''
+
+DEFAULT_DIAMETERS = (12, 16, 20, 25, 32)
+
+
+def _max_utilization(contributions, loads, diameters):
+    ''' Return the largest utilization ratio of the load combinations for each diameter in one product. '''
+    n_bars = contributions.lever.shape[0]
+    areas = np.repeat(pi * np.asarray(diameters, dtype=float)[:, None]**2 / 4, n_bars, axis=1)
+    P, Mx, My = contributions.surfaces(areas)
+    return np.array([max(calc_uls.utilization_ratio(*loads, P[k], Mx[k], My[k])) for k in range(areas.shape[0])])
+
+
+def minimum_reinforcement(section, Ped, Mxed, Myed, fcd, fyd, Es, eps_cu, diameters=DEFAULT_DIAMETERS, groups=None,
+                          lambda_=0.80, rotation_step=5, vertical_step=10, limit=1.0, parallel=3):
+    '''
+    Return the reinforcement layout with the smallest steel area whose largest utilization ratio is at most 'limit'.
+
+    Args:
+        section (Section)       : Section with all candidate bar positions, the bar sizes are not used
+        Ped, Mxed, Myed         : Load combinations
+        fyd, Es                 : Rebar properties, single values or sequences indexed by material ID
+        diameters (list)        : Candidate bar diameters
+        groups (list)           : Lists of indices of bars that are placed together, in the order they are added
+                                  to a layout. All bars form one group if not given
+        lambda_, rotation_step, vertical_step   : See 'calc_uls.compute_capacity_surface'
+        parallel (int)          : Number of diameters evaluated in each bisection step
+
+    Returns:
+        rebars (RebarLayout)    : Bars of the layout
+        ur (float)              : Largest utilization ratio of the load combinations
+    '''
+    diameters = np.unique(np.asarray(diameters, dtype=float))
+    bars = section.rebars
+    if groups is None:
+        groups = [np.arange(len(bars))]
+    idx = calc_uls.extreme_loads(Ped, Mxed, Myed)
+    loads = tuple(np.asarray(a, dtype=float)[idx] for a in (Ped, Mxed, Myed))
+
+    best = None
+    for count in range(1, len(groups) + 1):
+        selected = np.concatenate([np.asarray(g, dtype=int) for g in groups[:count]])
+        n_bars = selected.size
+
+        # Diameters with a smaller area than the best layout so far
+        n_dia = np.searchsorted(n_bars * pi * diameters**2 / 4, best[2] if best else np.inf)
+        if n_dia == 0:
+            continue
+
+        layout = RebarLayout(bars.x[selected], bars.y[selected], dia=diameters[0], material=bars.material[selected])
+        cache = StateCache(section.with_rebars(layout), lambda_=lambda_, rotation_step=rotation_step,
+                           vertical_step=vertical_step)
+        contributions = cache.contributions(fcd, fyd, Es, eps_cu)
+
+        # Bisection on the index of the smallest passing diameter, which is in (lo, hi]
+        lo, hi = -1, n_dia - 1
+        ur_hi = _max_utilization(contributions, loads, diameters[[hi]])[0]
+        if ur_hi > limit:
+            continue
+        while hi - lo > 1:
+            trial = np.unique(np.linspace(lo, hi, parallel + 2).round().astype(int)[1:-1])
+            trial = trial[(trial > lo) & (trial < hi)]
+            if trial.size == 0:
+                trial = np.array([(lo + hi) // 2])
+            ur = _max_utilization(contributions, loads, diameters[trial])
+            passing = trial[ur <= limit]
+            if passing.size:
+                hi = passing[0]
+                ur_hi = ur[ur <= limit][0]
+            lo = max(trial[trial < hi], default=lo)
+        best = (layout.scaled(dia=diameters[hi]), ur_hi, n_bars * pi * diameters[hi]**2 / 4)
+
+    if best is None:
+        raise ValueError('No candidate layout has a utilization ratio of at most {}.'.format(limit))
+    return best[0], float(best[1])
+
+
+def size_section(spec, loads, diameters=DEFAULT_DIAMETERS):
+    '''
+    Size the reinforcement of a section library entry, see 'batch.read_library'.
+
+    Returns:
+        name (str)              : Name of the section
+        result (dict)           : Bar coordinates 'x', 'y' and diameter 'dia' of the layout, total area 'As' and
+                                  largest utilization ratio 'ur', None if no candidate layout passes
+        elapsed (float)         : Computation time [s]
+    '''
+    t0 = time.perf_counter()
+    section = batch.build_section(spec)
+    m = spec['materials']
+    _, Ped, Mxed, Myed = loads
+    try:
+        rebars, ur = minimum_reinforcement(section, Ped, Mxed, Myed, m['fcd'], m['fyd'], m['Es'], m['eps_cu'],
+                                           diameters=spec.get('diameters', diameters), groups=spec.get('groups'),
+                                           lambda_=m['lambda'], **spec['grid'])
+    except ValueError:
+        return spec['name'], None, time.perf_counter() - t0
+    result = {'x': rebars.x.tolist(), 'y': rebars.y.tolist(), 'dia': float(rebars.dia[0]),
+              'As': rebars.total_area, 'ur': ur}
+    return spec['name'], result, time.perf_counter() - t0
+
+
+def size_library(library, loads, diameters=DEFAULT_DIAMETERS, workers=None, log=print):
+    '''
+    Size the reinforcement of all sections of a library that have load combinations, in parallel.
+
+    Args:
+        library (list)          : Section entries, see 'batch.read_library'
+        loads (dict)            : Load combinations per section, see 'batch.read_loads'
+        workers (int)           : Number of worker processes, runs in the current process if 1
+
+    Returns:
+        schedule (dict)         : {section name: result}, see 'size_section'. Sections without a passing layout
+                                  are left out
+    '''
+    todo = [spec for spec in library if spec['name'] in loads]
+    schedule = {}
+
+    def store_result(name, result, elapsed):
+        if result is None:
+            log('{}: no candidate layout passes ({:.2f} s)'.format(name, elapsed))
+            return
+        schedule[name] = result
+        log('{}: {} bars Ø{:g}, As = {:.0f}, max UR = {:.3f} ({:.2f} s)'.format(
+            name, len(result['x']), result['dia'], result['As'], result['ur'], elapsed))
+
+    if workers == 1:
+        for spec in todo:
+            store_result(*size_section(spec, loads[spec['name']], diameters))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(size_section, spec, loads[spec['name']], diameters) for spec in todo]
+            for future in as_completed(futures):
+                store_result(*future.result())
+    return schedule
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find the minimum reinforcement of a library of sections.')
+    parser.add_argument('library', help='JSON file with section definitions, rebars are the candidate positions')
+    parser.add_argument('loads', help='CSV file with load combinations (section, load, P, Mx, My)')
+    parser.add_argument('--diameters', '-d', type=float, nargs='+', default=DEFAULT_DIAMETERS,
+                        help='Candidate bar diameters')
+    parser.add_argument('--output', '-o', help='JSON file to write the reinforcement schedule to')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='Number of worker processes')
+    args = parser.parse_args(argv)
+
+    schedule = size_library(batch.read_library(args.library), batch.read_loads(args.loads),
+                            diameters=args.diameters, workers=args.workers)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(schedule, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
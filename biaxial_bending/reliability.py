@@ -0,0 +1,161 @@
+# Built-in packages
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from math import log, sqrt
+from statistics import NormalDist
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import calc_uls
+from state_cache import StateCache
+
+
+'''
+Monte Carlo reliability analysis of the capacity of a section for given load combinations.
+
+Material properties, the concrete cover and the bar positions are random variables (see 'Normal' and
+'LogNormal'), and each sample is a capacity surface of the section. A load combination fails for a sample when
+its utilization ratio exceeds 1. The failure probability of a load combination is the fraction of samples where
+it fails, and the reliability index is beta = -Phi^-1(pf) with the standard normal distribution Phi. The
+coefficient of variation of the estimated failure probability is sqrt((1 - pf) / (n * pf)) for n samples, so
+small failure probabilities need many samples.
+
+The geometry of the neutral axis states is computed once and the surfaces of all samples of a chunk are evaluated
+at once, see 'state_cache.StateCache.sweep'. Random cover or bar positions do not change the stress block of the
+concrete, so only the strains of the moved bars are recomputed for each sample.
+
+Samples are evaluated in chunks, each with its own random generator spawned from the seed, so the results only
+depend on the seed, the number of samples and the chunk size, and not on the number of worker processes.
+'''
+
+
+class Normal:
+    ''' Normally distributed random variable with mean 'mean' and standard deviation 'std'. '''
+    __slots__ = ('mean', 'std')
+
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.std = std
+
+    def __repr__(self):
+        return 'Normal({}, {})'.format(self.mean, self.std)
+
+    def sample(self, rng, n):
+        return rng.normal(self.mean, self.std, n)
+
+
+class LogNormal:
+    '''
+    Lognormally distributed random variable with mean 'mean' and coefficient of variation 'cov', e.g. for material
+    strengths, which are always positive.
+    '''
+    __slots__ = ('mean', 'cov')
+
+    def __init__(self, mean, cov):
+        self.mean = mean
+        self.cov = cov
+
+    def __repr__(self):
+        return 'LogNormal({}, {})'.format(self.mean, self.cov)
+
+    def sample(self, rng, n):
+        sigma = sqrt(log(1 + self.cov**2))
+        return rng.lognormal(log(self.mean) - sigma**2 / 2, sigma, n)
+
+
+def _sample(value, rng, n):
+    ''' Return 'n' samples of a random variable, or 'n' times a fixed value. '''
+    if hasattr(value, 'sample'):
+        return np.asarray(value.sample(rng, n), dtype=float)
+    return np.full(n, float(value))
+
+
+def cover_directions(section):
+    '''
+    Return the directions in which the bars of a section move when the cover increases by 1, as array of shape
+    (bars, 2). This is the inward normal of the nearest concrete edge, or the sum of the normals of the nearest
+    edges for bars with the same cover to several edges (e.g. corner bars). For circular sections the directions
+    are radial, towards the centre for bars closer to the outer face and away from it for bars closer to the inner
+    face.
+    '''
+    xr, yr = section.xr, section.yr
+    if section._is_circular:
+        cx, cy = section.center
+        rr = np.hypot(xr - cx, yr - cy)
+        rr[rr == 0] = 1
+        sign = np.where(section.radius - rr <= rr - section.inner_radius, -1, 1)
+        return np.column_stack((xr - cx, yr - cy)) * (sign / rr)[:, None]
+
+    # Nearest point on each edge, the vertices are in counterclockwise order so the inside is on the left
+    x0, y0 = section.x_ring[:-1], section.y_ring[:-1]
+    length2 = section.dx**2 + section.dy**2
+    t = np.clip(((xr[:, None] - x0) * section.dx + (yr[:, None] - y0) * section.dy) / length2, 0, 1)
+    dist = np.hypot(xr[:, None] - x0 - t * section.dx, yr[:, None] - y0 - t * section.dy)
+    nearest = dist <= dist.min(axis=1, keepdims=True) + 1e-9 * np.sqrt(length2.max())
+    normals = np.column_stack((-section.dy, section.dx)) / np.sqrt(length2)[:, None]
+    return nearest @ normals
+
+
+def _failure_chunk(section, cache, loads, variables, seed, n):
+    ''' Return the utilization ratios of the load combinations for 'n' samples, shape (samples, load combinations). '''
+    rng = np.random.default_rng(seed)
+    fcd, fyd, Es, eps_cu = (_sample(v, rng, n) for v in variables[:4])
+    cover, position = variables[4:]
+    ur = np.empty((n, loads[0].size))
+    moved = None
+    if cover is not None or position is not None:
+        m = len(section.rebars)
+        dc = _sample(0 if cover is None else cover, rng, n)
+        dxy = _sample(0 if position is None else position, rng, 2 * n * m).reshape(n, m, 2)
+        moved = cover_directions(section) * dc[:, None, None] + dxy
+    P, Mx, My = cache.sweep(fcd, fyd, Es, eps_cu, dxy=moved)
+    for k in range(n):
+        ur[k] = calc_uls.utilization_ratio(*loads, P[k], Mx[k], My[k])
+    return ur
+
+
+def failure_probability(section, Ped, Mxed, Myed, fcd, fyd, Es, eps_cu, cover=None, position=None, n_samples=10000,
+                        seed=0, chunk_size=1000, workers=None, lambda_=0.80, rotation_step=5, vertical_step=10):
+    '''
+    Return the failure probabilities and reliability indices of load combinations by Monte Carlo simulation.
+
+    Args:
+        section (Section)       : Section with the nominal bar positions
+        Ped, Mxed, Myed         : Load combinations
+        fcd, fyd, Es, eps_cu    : Material properties, fixed values or random variables (see 'Normal' and
+                                  'LogNormal'). Steel properties are the same for all bars
+        cover                   : Random deviation of the cover, the same for all bars of a sample. Positive values
+                                  move the bars inwards, see 'cover_directions'
+        position                : Random deviation of each bar coordinate, independent for all bars
+        n_samples (int)         : Number of samples
+        seed (int)              : Seed of the random generators
+        chunk_size (int)        : Number of samples per chunk
+        workers (int)           : Number of worker processes, runs in the current process if 1
+        lambda_, rotation_step, vertical_step   : See 'calc_uls.compute_capacity_surface'
+
+    Returns:
+        pf (ndarray)            : Failure probability of each load combination
+        beta (ndarray)          : Reliability index of each load combination, inf where no sample failed
+    '''
+    loads = tuple(np.atleast_1d(np.asarray(a, dtype=float)) for a in (Ped, Mxed, Myed))
+    variables = (fcd, fyd, Es, eps_cu, cover, position)
+    cache = StateCache(section, lambda_=lambda_, rotation_step=rotation_step, vertical_step=vertical_step)
+
+    sizes = [min(chunk_size, n_samples - k) for k in range(0, n_samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(section, cache, loads, variables, s, n) for s, n in zip(seeds, sizes)]
+    if workers == 1:
+        ur = [_failure_chunk(*a) for a in args]
+    else:
+        # Worker processes are started fresh, as forking a process that has run the parallel numba kernel (see
+        # 'kernels') can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            ur = list(executor.map(_failure_chunk, *zip(*args)))
+
+    failures = sum(np.count_nonzero(u > 1, axis=0) for u in ur)
+    pf = failures / n_samples
+    std_normal = NormalDist()
+    beta = np.array([-std_normal.inv_cdf(p) if 0 < p < 1 else (np.inf if p == 0 else -np.inf) for p in pf])
+    return pf, beta
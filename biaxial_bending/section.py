@@ -0,0 +1,382 @@
+# Built-in libraries
+import hashlib
+from math import pi, cos, sin
+
+# Third party libraries
+import numpy as np
+
+# Project specific modules
+import geometry
+from rebars import RebarLayout
+
+
+'''
+This module contains the data model for a reinforced concrete cross section.
+
+A 'Section' holds the concrete polygon and the reinforcement layout as contiguous float64 arrays
+together with all invariants that the section analyses need, e.g. the closed vertex ring, edge
+vectors, area and centroid. The invariants are computed once when the section is created, and
+the section is immutable afterwards so it can be shared freely between analyses.
+'''
+
+
+def _ring_matches(x, y, xm, ym, tol):
+    ''' Return True if the polygon (xm, ym) has the same vertices as (x, y) in the same cyclic order. '''
+    for k in range(x.size):
+        if np.allclose(np.roll(xm, k), x, rtol=0, atol=tol) and np.allclose(np.roll(ym, k), y, rtol=0, atol=tol):
+            return True
+    return False
+
+
+def _layout_matches(bars, xrm, yrm, atol, tol):
+    ''' Return True if each transformed rebar (xrm, yrm) coincides with a rebar of the same size and material. '''
+    dist = np.hypot(xrm[:, None] - bars.x[None, :], yrm[:, None] - bars.y[None, :])
+    match = ((dist <= atol) & np.isclose(bars.area[:, None], bars.area[None, :], rtol=tol, atol=0)
+             & (bars.material[:, None] == bars.material[None, :]))
+    return bool(np.all(match.any(axis=1)))
+
+
+def _frozen(a, dtype=float):
+    ''' Return a contiguous read-only copy of an array. '''
+    a = np.ascontiguousarray(a, dtype=dtype).copy()
+    a.flags.writeable = False
+    return a
+
+
+class Section:
+    '''
+    Immutable reinforced concrete cross section with precomputed geometric invariants.
+
+    Args:
+        x (list)                : x-coordinates of concrete vertices (in consecutive order along the perimeter)
+        y (list)                : y-coordinates of concrete vertices
+        rebars (RebarLayout)    : Reinforcement layout of the section
+
+    Attributes:
+        x, y (ndarray)              : Concrete vertices in counterclockwise order
+        x_ring, y_ring (ndarray)    : Concrete vertices as a closed ring (first vertex repeated at the end)
+        dx, dy (ndarray)            : Edge vectors of the polygon, i.e. from vertex i to vertex i+1
+        area (float)                : Area of concrete polygon (gross area, rebars not deducted)
+        centroid (tuple)            : Centroid of concrete polygon as (x, y)
+        bbox (tuple)                : Bounding box of concrete polygon as (xmin, ymin, xmax, ymax)
+        rebars (RebarLayout)        : Reinforcement layout
+        xr, yr, As (ndarray)        : Rebar coordinates and areas
+        rebars_in_concrete (ndarray): Boolean array with entry 'True' for rebars located inside the concrete
+    '''
+    __slots__ = ('x', 'y', 'x_ring', 'y_ring', 'dx', 'dy', 'area', 'centroid', 'bbox',
+                 'rebars', 'xr', 'yr', 'As', 'rebars_in_concrete', '_plastic_centroids')
+    _is_circular = False
+
+    def __init__(self, x, y, rebars):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if x.size < 3 or x.size != y.size:
+            raise ValueError('Concrete section must be defined by at least three vertices.')
+
+        # Vertices are stored in counterclockwise order so signed areas of the section and its parts are positive
+        if geometry.polygon_area(x, y, signed=True) < 0:
+            x = x[::-1]
+            y = y[::-1]
+
+        x_ring = np.append(x, x[0])
+        y_ring = np.append(y, y[0])
+        Cx, Cy, A = geometry.polygon_centroid(x, y, return_area=True)
+
+        # Copy reinforcement so later changes to the input layout do not affect the section
+        rebars = RebarLayout(rebars.x, rebars.y, dia=rebars.dia, material=rebars.material)
+        for attr in RebarLayout.__slots__:
+            getattr(rebars, attr).flags.writeable = False
+
+        set_ = object.__setattr__
+        set_(self, 'x', _frozen(x))
+        set_(self, 'y', _frozen(y))
+        set_(self, 'x_ring', _frozen(x_ring))
+        set_(self, 'y_ring', _frozen(y_ring))
+        set_(self, 'dx', _frozen(np.diff(x_ring)))
+        set_(self, 'dy', _frozen(np.diff(y_ring)))
+        set_(self, 'area', float(A))
+        set_(self, 'centroid', (float(Cx), float(Cy)))
+        set_(self, 'bbox', (float(x.min()), float(y.min()), float(x.max()), float(y.max())))
+        set_(self, 'rebars', rebars)
+        set_(self, 'xr', rebars.x)
+        set_(self, 'yr', rebars.y)
+        set_(self, 'As', rebars.area)
+        set_(self, 'rebars_in_concrete',
+             _frozen(geometry.points_in_polygon(rebars.x, rebars.y, x_ring, y_ring), dtype=bool))
+        set_(self, '_plastic_centroids', {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Section is immutable')
+
+    def __reduce__(self):
+        # Pickle by the constructor arguments, e.g. for worker processes, as attributes cannot be set
+        return type(self), (self.x, self.y, self.rebars)
+
+    def __repr__(self):
+        return 'Section({} vertices, A={:.1f}, {} rebars)'.format(self.x.size, self.area, len(self.rebars))
+
+    def digest(self):
+        ''' Return a SHA-256 hex digest of the geometry and reinforcement of the section, e.g. as key for caching. '''
+        h = hashlib.sha256(type(self).__name__.encode())
+        for a in (self.x, self.y, self.xr, self.yr, self.As):
+            h.update(a.tobytes())
+        h.update(self.rebars.material.astype(np.int64).tobytes())
+        return h.hexdigest()
+
+    def plastic_centroid(self, fcd, fyd, eta=0.85):
+        '''
+        Return plastic centroid of the section, i.e. the point of action of the resultant when the entire section
+        is in compression with concrete stress 'eta*fcd' and all rebars at yield. The concrete displaced by rebars
+        inside the section is deducted. The result is cached per set of material parameters.
+
+        Args:
+            fcd (float)         : Design compressive strength of concrete
+            fyd (float/list)    : Design yield stress of rebars, single value or sequence indexed by material ID
+            eta (float)         : Factor on concrete strength (should match the stress block used in the analysis)
+
+        Returns:
+            xpl, ypl (float)    : Coordinates of plastic centroid
+        '''
+        key = (float(fcd), tuple(np.atleast_1d(np.asarray(fyd, dtype=float))), float(eta))
+        if key not in self._plastic_centroids:
+            fc = eta * fcd
+            Fs = self.As * self.rebars.per_bar(fyd)
+
+            # Concrete area and first moments of area with area displaced by rebars deducted
+            As_in = np.where(self.rebars_in_concrete, self.As, 0)
+            Ac = self.area - As_in.sum()
+            Scx = self.area * self.centroid[0] - np.dot(As_in, self.xr)
+            Scy = self.area * self.centroid[1] - np.dot(As_in, self.yr)
+
+            F = fc * Ac + Fs.sum()
+            xpl = (fc * Scx + np.dot(Fs, self.xr)) / F
+            ypl = (fc * Scy + np.dot(Fs, self.yr)) / F
+            self._plastic_centroids[key] = (float(xpl), float(ypl))
+
+        return self._plastic_centroids[key]
+
+    def symmetry(self, tol=1e-6):
+        '''
+        Return mirror symmetry of the section about axes through the centroid of the concrete polygon.
+
+        Both the concrete polygon and the reinforcement layout (positions, areas and material IDs) must be
+        symmetric. Coordinates are compared with a tolerance of 'tol' times the largest dimension of the section.
+
+        Returns:
+            sym_x (bool)    : Section is symmetric about the horizontal axis through the centroid (y -> -y)
+            sym_y (bool)    : Section is symmetric about the vertical axis through the centroid (x -> -x)
+        '''
+        xmin, ymin, xmax, ymax = self.bbox
+        atol = tol * max(xmax - xmin, ymax - ymin)
+        Cx, Cy = self.centroid
+
+        def is_symmetric(xm, ym, xrm, yrm):
+            # Mirroring reverses the orientation of the polygon, reverse vertices to compare in counterclockwise order
+            if not self._is_circular and not _ring_matches(self.x, self.y, xm[::-1], ym[::-1], atol):
+                return False
+            # Each mirrored rebar must coincide with a rebar of the same size and material
+            return _layout_matches(self.rebars, xrm, yrm, atol, tol)
+
+        sym_x = is_symmetric(self.x, 2*Cy - self.y, self.xr, 2*Cy - self.yr)
+        sym_y = is_symmetric(2*Cx - self.x, self.y, 2*Cx - self.xr, self.yr)
+
+        return sym_x, sym_y
+
+    def rotational_symmetry(self, tol=1e-6):
+        '''
+        Return the order of rotational symmetry of the section about its centroid, i.e. the number of
+        rotations (including the identity) that map the section onto itself. Only circular sections
+        are checked, polygons return 1.
+        '''
+        return 1
+
+    def with_rebars(self, rebars):
+        ''' Return a copy of the section with the reinforcement layout 'rebars'. '''
+        return type(self)(self.x, self.y, rebars)
+
+    def translated(self, dx, dy):
+        ''' Return a copy of the section moved by (dx, dy). '''
+        bars = self.rebars
+        return type(self)(self.x + dx, self.y + dy,
+                          RebarLayout(bars.x + dx, bars.y + dy, dia=bars.dia, material=bars.material))
+
+    def fibre_points(self, alpha_deg):
+        '''
+        Return the points of the concrete section whose distances to a neutral axis with angle 'alpha_deg'
+        determine the extreme compression and tension fibres. For a polygon these are the vertices.
+        '''
+        return self.x, self.y
+
+    def stress_block(self, dv, level, alpha_deg):
+        '''
+        Return geometry of the part of the concrete section where the signed distance to the neutral axis is less
+        than or equal to 'level', i.e. the stress block.
+
+        Args:
+            dv (ndarray)        : Signed distances from neutral axis to the points returned by 'fibre_points'
+            level (float)       : Signed distance from neutral axis to the inner edge of the stress block
+            alpha_deg (float)   : Angle of neutral axis with x-axis
+
+        Returns:
+            x_sb, y_sb (ndarray)    : Vertices of the stress block
+            Asb (float)             : Area of stress block
+            sb_cog (tuple)          : Centroid of stress block as (x, y)
+        '''
+        x_sb, y_sb = geometry.clip_polygon(self.x_ring, self.y_ring, np.append(dv, dv[0]), level)
+        Asb = geometry.polygon_area(x_sb, y_sb, signed=True)
+        if Asb == 0:
+            # Stress block has degenerated to a line or a point
+            return x_sb, y_sb, 0, None
+        Cx, Cy = geometry.polygon_centroid(x_sb, y_sb)
+        return x_sb, y_sb, Asb, (Cx, Cy)
+
+
+class CircularSection(Section):
+    '''
+    Solid circular reinforced concrete section.
+
+    The stress block is a circular segment whose area and centroid are computed in closed form, so the cost
+    of a section state does not depend on how finely the circle is discretized. The polygon vertices 'x' and
+    'y' only approximate the circle for plotting and for functions that require a polygon.
+
+    Args:
+        diameter (float)        : Diameter of the section
+        rebars (RebarLayout)    : Reinforcement layout of the section
+        center (tuple)          : Centre of the section as (x, y)
+        n_vertices (int)        : Number of vertices of the polygon approximation
+    '''
+    __slots__ = ('radius', 'inner_radius', 'center')
+    _is_circular = True
+
+    def __init__(self, diameter, rebars, center=(0, 0), n_vertices=72):
+        self._init_circular(diameter / 2, 0.0, rebars, center, n_vertices)
+
+    def _init_circular(self, radius, inner_radius, rebars, center, n_vertices):
+        if not 0 <= inner_radius < radius:
+            raise ValueError('Inner diameter must be smaller than outer diameter.')
+        cx, cy = float(center[0]), float(center[1])
+        t = np.linspace(0, 2*pi, n_vertices, endpoint=False)
+        Section.__init__(self, cx + radius * np.cos(t), cy + radius * np.sin(t), rebars)
+
+        # Replace properties of the polygon approximation by exact ones
+        rr = np.hypot(self.xr - cx, self.yr - cy)
+        set_ = object.__setattr__
+        set_(self, 'radius', float(radius))
+        set_(self, 'inner_radius', float(inner_radius))
+        set_(self, 'center', (cx, cy))
+        set_(self, 'area', pi * (radius**2 - inner_radius**2))
+        set_(self, 'centroid', (cx, cy))
+        set_(self, 'bbox', (cx - radius, cy - radius, cx + radius, cy + radius))
+        set_(self, 'rebars_in_concrete', _frozen((rr <= radius) & (rr >= inner_radius), dtype=bool))
+
+    def __repr__(self):
+        return '{}(D={:.1f}, A={:.1f}, {} rebars)'.format(type(self).__name__, 2*self.radius, self.area,
+                                                          len(self.rebars))
+
+    def digest(self):
+        h = hashlib.sha256(Section.digest(self).encode())
+        h.update(np.float64(self.inner_radius).tobytes())
+        return h.hexdigest()
+
+    def rotational_symmetry(self, tol=1e-6):
+        bars = self.rebars
+        n = len(bars)
+        if n < 2:
+            return 1
+        cx, cy = self.center
+        atol = tol * 2 * self.radius
+
+        # Try the orders dividing the number of bars from the largest, each rotated bar must coincide with a bar
+        # of the same size and material
+        for order in range(n, 1, -1):
+            if n % order:
+                continue
+            theta = 2*pi / order
+            xrm = cx + (self.xr - cx) * cos(theta) - (self.yr - cy) * sin(theta)
+            yrm = cy + (self.xr - cx) * sin(theta) + (self.yr - cy) * cos(theta)
+            if _layout_matches(bars, xrm, yrm, atol, tol):
+                return order
+        return 1
+
+    def __reduce__(self):
+        return CircularSection, (2*self.radius, self.rebars, self.center, self.x.size)
+
+    def with_rebars(self, rebars):
+        return CircularSection(2*self.radius, rebars, center=self.center, n_vertices=self.x.size)
+
+    def translated(self, dx, dy):
+        bars = self.rebars
+        return CircularSection(2*self.radius, RebarLayout(bars.x + dx, bars.y + dy, dia=bars.dia,
+                               material=bars.material), center=(self.center[0] + dx, self.center[1] + dy),
+                               n_vertices=self.x.size)
+
+    def fibre_points(self, alpha_deg):
+        '''
+        Return the extreme points of the circle in the direction normal to a neutral axis with angle 'alpha_deg',
+        i.e. the extreme compression and tension fibres.
+        '''
+        alpha = alpha_deg * pi / 180
+        cx, cy = self.center
+        r = self.radius
+        return (np.array([cx - r * sin(alpha), cx + r * sin(alpha)]),
+                np.array([cy + r * cos(alpha), cy - r * cos(alpha)]))
+
+    def stress_block(self, dv, level, alpha_deg):
+        '''
+        Return geometry of the stress block as closed-form circular segments. The distances 'dv' are those of the
+        two points returned by 'fibre_points'. No vertices are returned for the curved stress block.
+        '''
+        # Distance from neutral axis to the centre of the circle. Distances increase in the direction of the unit
+        # normal (sin(alpha), -cos(alpha)) of the neutral axis
+        d_center = (dv[0] + dv[1]) / 2
+        alpha = alpha_deg * pi / 180
+
+        # Part of the circle where the distance to the neutral axis is less than 'level', measured from the centre
+        h = level - d_center
+        A, S = geometry.circular_segment(self.radius, h)
+        if self.inner_radius > 0:
+            A_i, S_i = geometry.circular_segment(self.inner_radius, h)
+            A, S = A - A_i, S - S_i
+
+        if A <= 0:
+            return None, None, 0, None
+        u = S / A
+        return None, None, float(A), (self.center[0] + u * sin(alpha), self.center[1] - u * cos(alpha))
+
+
+class AnnularSection(CircularSection):
+    '''
+    Annular (hollow circular) reinforced concrete section, e.g. a hollow pile.
+
+    Args:
+        outer_diameter (float)  : Outer diameter of the section
+        inner_diameter (float)  : Inner diameter of the section
+        rebars (RebarLayout)    : Reinforcement layout of the section
+        center (tuple)          : Centre of the section as (x, y)
+        n_vertices (int)        : Number of vertices of the polygon approximation of the outer circle
+    '''
+    __slots__ = ()
+
+    def __init__(self, outer_diameter, inner_diameter, rebars, center=(0, 0), n_vertices=72):
+        self._init_circular(outer_diameter / 2, inner_diameter / 2, rebars, center, n_vertices)
+
+    def __reduce__(self):
+        return AnnularSection, (2*self.radius, 2*self.inner_radius, self.rebars, self.center, self.x.size)
+
+    def with_rebars(self, rebars):
+        return AnnularSection(2*self.radius, 2*self.inner_radius, rebars, center=self.center,
+                              n_vertices=self.x.size)
+
+    def translated(self, dx, dy):
+        bars = self.rebars
+        return AnnularSection(2*self.radius, 2*self.inner_radius, RebarLayout(bars.x + dx, bars.y + dy,
+                              dia=bars.dia, material=bars.material), center=(self.center[0] + dx,
+                              self.center[1] + dy), n_vertices=self.x.size)
+
+
+if __name__ == '__main__':
+    # T-beam
+    bars = RebarLayout([-350, -175, 175, 350, -100, 0, 100], [350, 350, 350, 350, -100, -100, -100], dia=20)
+    section = Section([-150, -400, -400, 400, 400, 150, 150, -150], [200, 200, 400, 400, 200, 200, -150, -150], bars)
+    print(section)
+    print('Centroid =', section.centroid)
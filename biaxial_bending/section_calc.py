@@ -4,10 +4,10 @@ import logging
 
 # Third party libraries
 import numpy as np
-import matplotlib.path as mpltPath
 
 # Project specific modules
 import geometry
+import instrumentation
 
 
 '''
@@ -16,10 +16,14 @@ sections in both ULS and SLS.
 '''
 
 
-# Create log file and set default logging statement
+# Log format of the analysis log file. The log file is only created when the logging is configured by the caller,
+# see 'configure_logging', so importing the module has no side effects.
 FORMAT = '%(name)-15s %(message)s'
-filename = 'test.log'
-logging.basicConfig(filename=filename, level=logging.INFO, filemode='w', format=FORMAT)
+
+
+def configure_logging(filename='test.log', level=logging.INFO):
+    ''' Write the log statements of the section analysis to 'filename'. '''
+    logging.basicConfig(filename=filename, level=level, filemode='w', format=FORMAT)
 
 
 # NOTE Rebars located between neutral axis and stress block, i.e. in the gap with neither
@@ -40,7 +44,7 @@ def Itx(yc, x, y, xr, yr, d, Ec=EC, Es=ES):
         x (list)              : x-coordiantes of concrete vertices
         y (list)              : y-coordiantes of concrete vertices
         yr (list)             : y-coordiantes of rebars
-        d (list)              : Rebar diameters corresponding to rebar coordinates in list yr
+        d (list)              : Rebar diameters corresponding to rebar coordinates in list yr (e.g. 'RebarLayout.dia')
         Ec (float, optional)  : Young's modulus for concrete (defaults to 30*10**6)
         Es (float, optioanl)  : Young's modulus for reinforcement (defaults to 210*10**6 )
 
@@ -55,35 +59,31 @@ def Itx(yc, x, y, xr, yr, d, Ec=EC, Es=ES):
     n = Es / Ec     # Stiffness ratio
 
     # CONCRETE SECTION
-    # Number of vertices
-    nv = len(x)
-
-    # Create a closed polygon by adding the first point to the end of the coordinate lists
-    x = x + [x[0]]
-    y = y + [y[0]]
+    # Create a closed polygon by adding the first point to the end of the coordinate arrays
+    x = np.append(x, x[0])
+    y = np.append(y, y[0])
 
     # Convert y-coordinates to specified axis of rotation
-    y = [yc-i for i in y]
-    yr = [yc-i for i in yr]
+    y = yc - y
+    yr = yc - np.asarray(yr, dtype=float)
 
-    # Compute list of terms for summation
-    Icx_list = [1/12 * (y[i]**2 + y[i]*y[i+1] + y[i+1]**2) *
-               (x[i]*y[i+1] - x[i+1]*y[i]) for i in range(nv)]
+    # Compute terms for summation
+    Icx_terms = 1/12 * (y[:-1]**2 + y[:-1]*y[1:] + y[1:]**2) * (x[:-1]*y[1:] - x[1:]*y[:-1])
 
-    # Sum list elements and use absolute value so order can be clockwise or counter-clockwise
-    Icx = abs(sum(Icx_list))
+    # Sum terms and use absolute value so order can be clockwise or counter-clockwise
+    Icx = abs(Icx_terms.sum())
 
     # REBARS
     # Create separate lists for rebars in compression (c) and tension (t) 
     _, yr_c, d_c, _, yr_t, d_t = compression_tension_rebars(x, y, xr, yr, d)
 
     # Rebars in compression (areas to be multiplied by 'n-1')
-    Isx_c = [pi/64 * d_c[i]**4 + (n-1) * pi*d_c[i]**2/4 * yr_c[i]**2 for i in range(len(d_c))]
+    Isx_c = np.sum(pi/64 * d_c**4 + (n-1) * pi*d_c**2/4 * yr_c**2)
 
     # Rebars in tension (areas to be multiplied by 'n)
-    Isx_t = [pi/64 * d_t[i]**4 + n * pi*d_t[i]**2/4 * yr_t[i]**2 for i in range(len(d_t))]
+    Isx_t = np.sum(pi/64 * d_t**4 + n * pi*d_t**2/4 * yr_t**2)
 
-    return Icx + sum(Isx_c) + sum(Isx_t)
+    return Icx + Isx_c + Isx_t
 
 
 def Ity(xc, x, y, xr, yr, d, Ec=EC, Es=ES):
@@ -96,7 +96,7 @@ def Ity(xc, x, y, xr, yr, d, Ec=EC, Es=ES):
       x (list)              : x-coordinates of concrete vertices
       y (list)              : y-coordiantes of concrete vertices
       xr (list)             : x-coordinates of rebars
-      d (list)              : Rebar diameters corresponding to rebar coordinates in list xr
+      d (list)              : Rebar diameters corresponding to rebar coordinates in list xr (e.g. 'RebarLayout.dia')
       Ec (float, optional)  : Young's modulus for concrete (defaults to 30*10**6)
       Es (float, optioanl)  : Young's modulus for reinforcement (defaults to 210*10**6 )
 
@@ -110,35 +110,31 @@ def Ity(xc, x, y, xr, yr, d, Ec=EC, Es=ES):
     n = Es / Ec     # Stiffness ratio
 
     # CONCRETE SECTION
-    # Number of vertices
-    nv = len(y)
+    # Create a closed polygon by adding the first point to the end of the coordinate arrays
+    x = np.append(x, x[0])
+    y = np.append(y, y[0])
 
-    # Create a closed polygon by adding the first point to the end of the coordinate lists
-    x = x + [x[0]]
-    y = y + [y[0]]
+    # Convert x-coordinates to specified axis of rotation
+    x = xc - x
+    xr = xc - np.asarray(xr, dtype=float)
 
-    # Convert y-coordinates to specified axis of rotation
-    x = [xc-i for i in x]
-    xr = [xc-i for i in xr]
+    # Compute terms for summation
+    Icy_terms = 1/12 * (x[:-1]**2 + x[:-1]*x[1:] + x[1:]**2) * (x[:-1]*y[1:] - x[1:]*y[:-1])
 
-    # Compute list of terms for summation
-    Icy_list = [1/12 * (x[i]**2 + x[i]*x[i+1] + x[i+1]**2) *
-               (x[i]*y[i+1] - x[i+1]*y[i]) for i in range(nv)]
-
-    # Sum list elements and use absolute value so order can be clockwise or counter-clockwise
-    Icy = abs(sum(Icy_list))
+    # Sum terms and use absolute value so order can be clockwise or counter-clockwise
+    Icy = abs(Icy_terms.sum())
 
     # REBARS
     # Create separate lists for rebars in compression (c) and tension (t) 
     xr_c, _, d_c, xr_t, _, d_t = compression_tension_rebars(x, y, xr, yr, d)
 
     # Rebars in compression (areas to be multiplied by 'n-1')
-    Isy_c = [pi/64 * d_c[i]**4 + (n-1) * pi*d_c[i]**2/4 * xr_c[i]**2 for i in range(len(d_c))]
+    Isy_c = np.sum(pi/64 * d_c**4 + (n-1) * pi*d_c**2/4 * xr_c**2)
 
     # Rebars in tension (areas to be multiplied by 'n)
-    Isy_t = [pi/64 * d_t[i]**4 + n * pi*d_t[i]**2/4 * xr_t[i]**2 for i in range(len(d_t))]
+    Isy_t = np.sum(pi/64 * d_t**4 + n * pi*d_t**2/4 * xr_t**2)
 
-    return Icy + sum(Isy_c) + sum(Isy_t)
+    return Icy + Isy_c + Isy_t
 
 
 def elastic_centroid(x, y, xr, yr, dia, Ec=EC, Es=ES):
@@ -148,57 +144,44 @@ def elastic_centroid(x, y, xr, yr, dia, Ec=EC, Es=ES):
     surrounded by ineffective/crakced concrete. 
 
     Args:
-        par1 (type) : 
+        x, y (list)     : Coordinates of concrete vertices
+        xr, yr (list)   : Coordinates of rebars
         dia (list)      : Rebars diameters 
 
     Returns:
-        ret1 (type) :
+        xel, yel (float) : Coordinates of elastic centroid
     '''
 
     # Stiffness ratio
     n = Es / Ec     
 
-    # Number of rebars
-    nb = len(dia)
-
     # Rebars that are surrounded by ineffective/crakced concrete will have a 
     # transformed stiffness of 'n', while rebars in the compression zone
     # has 'n-1'. This is due to the fact that rebars in compression have displaced 
     # concrete that would have had stiffness of 'Ec'.
 
-    # Evaluate if rebars are inside or outside stress block (returns list with 'True' or 'False')
+    # Evaluate if rebars are inside or outside stress block (returns array with 'True' or 'False')
     rebar_eval = rebars_in_stress_block(x, y, xr, yr)
 
-    # Extract rebars in compression 
-    dia_comp = [dia[i] for i in range(nb) if rebar_eval[i]]
-    xr_comp = [xr[i] for i in range(nb) if rebar_eval[i]]
-    yr_comp = [yr[i] for i in range(nb) if rebar_eval[i]]
-
-    # Extract rebars in tension
-    dia_tens = [dia[i] for i in range(nb) if not rebar_eval[i]]
-    xr_tens = [xr[i] for i in range(nb) if not rebar_eval[i]]
-    yr_tens = [yr[i] for i in range(nb) if not rebar_eval[i]]
+    # Transformed area of each rebar
+    As_t = np.where(rebar_eval, n-1, n) * pi*np.asarray(dia, dtype=float)**2/4
     
     # Compute centroid and area of concrete polygon
     xc, yc, Ac = geometry.polygon_centroid(x, y, return_area=True)
 
     # Compute total transformced area of section
-    A_comp = sum([n * pi*d**2/4 for d in dia_tens])
-    A_tens = sum([(n-1) * pi*d**2/4 for d in dia_comp])
-    A = Ac + A_comp + A_tens
+    A = Ac + As_t.sum()
     
     # Compute total 'moment area', i.e. area times moment arm
     Acx = Ac * xc                                                                        
-    Asx_comp = sum([(n-1) * pi*dia_comp[i]**2/4 * xr_comp[i] for i in range(len(dia_comp))])  
-    Asx_tens = sum([n * pi*dia_tens[i]**2/4 * xr_tens[i] for i in range(len(dia_tens))])
+    Asx = np.dot(As_t, xr)
 
     Acy = Ac * yc
-    Asy_comp = sum([(n-1) * pi*dia_comp[i]**2/4 * yr_comp[i] for i in range(len(dia_comp))])  
-    Asy_tens = sum([n * pi*dia_tens[i]**2/4 * yr_tens[i] for i in range(len(dia_tens))])
+    Asy = np.dot(As_t, yr)
 
     # Compute x- and y-coordinate of elastic centroid for transformed section
-    xel = (Acx + Asx_comp + Asx_tens) / A
-    yel = (Acy + Asy_comp + Asy_tens) / A
+    xel = (Acx + Asx) / A
+    yel = (Acy + Asy) / A
 
     return xel, yel
 
@@ -210,7 +193,7 @@ def transformed_axial_stiffness(x, y, xr, yr, dia, P, Ec=EC, Es=ES):
     n = Es / Ec
     
     # Area of rebars
-    As = sum([pi * d**2 / 4 for d in dia])
+    As = np.sum(pi * np.asarray(dia, dtype=float)**2 / 4)
 
     if P <= 0:
         # Axial force is compressive
@@ -259,115 +242,90 @@ def strain_field_eval(x, y, P, Mx, My, E, EA, Itx, Ity):
     return eps_P + y * kappa_x + x * kappa_y
 
 
-def compute_plastic_centroid(x, y, xr, yr, As, fck, fyk):
-    ''' Return plastic centroid of a reinforced concrete section. '''
-    Ac = geometry.polygon_area(x, y)
-    eta = 0.85                          # TODO Look into whether eta should be an input arg
-    F = sum([As[i]*fyk for i in As]) + eta*(Ac - sum(As))*fck
-
-    # TODO Find correct and general arm for concrete force (polygon section)
-    F_dx = sum([As[i]*fyk*xr[i] for i in range(len(xr))]) + eta*(Ac - sum(As))*fck*500/2
-    F_dy = sum([As[i]*fyk*yr[i] for i in range(len(yr))]) + eta*(Ac - sum(As))*fck*375/2
-
-    xpl = F_dx/F
-    ypl = F_dy/F
-
-    return xpl, ypl
+def compute_plastic_centroid(section, fck, fyk, eta=0.85):
+    ''' Return plastic centroid of a reinforced concrete section, see 'Section.plastic_centroid'. '''
+    return section.plastic_centroid(fck, fyk, eta=eta)
 
 
 def compression_tension_rebars(x, y, xr, yr, dia):
     ''' 
-    Return lists of rebar coordinates and diameters for rebars in compression
+    Return arrays of rebar coordinates and diameters for rebars in compression
     and tension, respectively.  
     
     Args:
-        par1 (list)     :
+        x, y (list)     : Coordinates of polygon defining the compression zone
+        xr, yr (list)   : Coordinates of rebars
+        dia (list)      : Rebar diameters
 
     Returns:
-        var10 (list)    :
+        xr_comp, yr_comp, dia_comp, xr_tens, yr_tens, dia_tens (ndarray)
     '''
-    # Evaluate if rebars are inside or outside stress block (returns list with 'True' or 'False')
+    # Evaluate if rebars are inside or outside stress block (returns array with 'True' or 'False')
     rebar_eval = rebars_in_stress_block(x, y, xr, yr)
 
-    # Number of rebars
-    nb = len(dia)
+    xr = np.asarray(xr, dtype=float)
+    yr = np.asarray(yr, dtype=float)
+    dia = np.asarray(dia, dtype=float)
 
-    # Extract rebars in compression
-    dia_comp = [dia[i] for i in range(nb) if rebar_eval[i]]
-    xr_comp = [xr[i] for i in range(nb) if rebar_eval[i]]
-    yr_comp = [yr[i] for i in range(nb) if rebar_eval[i]]
+    # Extract rebars in compression and tension
+    comp = rebar_eval
+    tens = ~rebar_eval
 
-    # Extract rebars in tension
-    dia_tens = [dia[i] for i in range(nb) if not rebar_eval[i]]
-    xr_tens = [xr[i] for i in range(nb) if not rebar_eval[i]]
-    yr_tens = [yr[i] for i in range(nb) if not rebar_eval[i]]
+    return xr[comp], yr[comp], dia[comp], xr[tens], yr[tens], dia[tens]
 
-    return xr_comp, yr_comp, dia_comp, xr_tens, yr_tens, dia_tens
 
+def compute_dist_to_na(section, alpha_deg, na_y, offset=None):
+    '''
+    Return signed distances from the neutral axis to the concrete section points (see 'Section.fibre_points') and
+    to the rebars as arrays. Negative distances are on the compression side.
 
-def compute_dist_to_na(x, y, xr, yr, alpha_deg, na_y):
-    ''' Return distances from neutral axis to all concrete section vertices
-        and rebars. '''
-    # Convert input angle from [deg] to [rad]
-    alpha = alpha_deg * pi / 180   
-
-    # Define two known points on line representing neutral axis
-    # NOTE Could be done more elegant if the function allowed tan(alpha) and na_y as input
-    na_x0 = 0
-    na_y0 = tan(alpha) * na_x0 + na_y
-    na_x1 = 1
-    na_y1 = tan(alpha) * na_x1 + na_y
+    The neutral axis is represented in normal form, d = x*sin(a) - y*cos(a) + offset (see 'geometry.line_normal'),
+    which also holds for vertical neutral axes. All distances are computed as one matrix product, and 'na_y' or
+    'offset' can be arrays of several neutral axis locations with the same angle.
 
-    # Compute signed distances from neutral axis to each vertex (neg. value => vertex in compr. / pos. value => vertex in tension)
-    dv = [geometry.point_to_line_dist(x[i], y[i], na_x0, na_y0, na_x1, na_y1) for i in range(len(x))]
+    Args:
+        alpha_deg (float)   : Angle of neutral axis with x-axis [deg]
+        na_y (float)        : Intersection between neutral axis and y-axis (not used if 'offset' is given)
+        offset (float)      : Offset of the neutral axis in normal form
 
-    # Compute signed distances from neutral axis to each rebar
-    dr = [geometry.point_to_line_dist(xr[i], yr[i], na_x0, na_y0, na_x1, na_y1) for i in range(len(xr))]
+    Returns:
+        dv, dr (ndarray)    : Distances to section points and rebars, with an extra first axis for several locations
+    '''
+    if offset is None:
+        offset = geometry.line_offset(alpha_deg, na_y)
 
-    # Reverse sign of the signed distances if slope of neutral axis becomes negative
-    if alpha_deg > 90 and alpha_deg <= 270:
-        dv = list(np.negative(dv))
-        dr = list(np.negative(dr))
+    x, y = section.fibre_points(alpha_deg)
+    d = geometry.signed_distances(np.concatenate((x, section.xr)), np.concatenate((y, section.yr)), alpha_deg, offset)
 
     # Change potential distances of '-0.0' to '0.0' to avoid getting the wrong cross section state later
-    dv = [0.0 if x == -0.0 else x for x in dv]
-
-    return dv, dr
-
+    d = d + 0.0
 
-# def stress_block_SLS(x, y, alpha_deg, na_y):
+    return d[..., :len(x)], d[..., len(x):]
 
-#     # return
 
-
-def stress_block_geometry(x, y, dv, dr, alpha_deg, na_y, lambda_=0.8):
+def stress_block_geometry(section, dv, dr, alpha_deg, lambda_=0.8):
     '''
     Returns stress block geometry.
 
     INPUT
-        x           -   List of x-coordinates of concrete section vertices
-        y           -   List of y-coordinates of concrete section vertices
-        dv          -   List of distances from neutral axis to each section vertex
-        dr          -   List of distances from neutral axis to each rebar
-        alpha_deg   -
-        na_y        -
+        section     -   Section object
+        dv          -   Array of distances from neutral axis to each section vertex
+        dr          -   Array of distances from neutral axis to each rebar
+        alpha_deg   -   Angle of neutral axis with x-axis
 
     OUTPUT
-        x_sb        -   List of x-coordinates of stress block vertices
-        y_sb        -   List of y-coordinates of stress block vertices
+        x_sb        -   Array of x-coordinates of stress block vertices
+        y_sb        -   Array of y-coordinates of stress block vertices
         Asb         -   Area of stress block
         sb_cog      -   Cenntroid of stress block represented as tuple, i.e. in the format (x, y)
+        c           -   Distance from neutral axis to extreme compression fiber
     '''
 
-    # TODO Split this to multiple functions that are easier to understand and test/debug
-
     # PURE TENSION CASE
     # NOTE Test if this is true! Does not account for gap btw. sb and tension zone
-    if all(d >= 0 for d in dv):
-        cross_section_state = 'PURE TENSION'
-
+    if np.all(dv >= 0):
         # Distance from neutral axis to extreme tension bar (all distances will be positve)
-        c = max([d for d in dr if d > 0])
+        c = dr[dr > 0].max()
 
         # Set vertices of stress block
         x_sb = None
@@ -379,142 +337,105 @@ def stress_block_geometry(x, y, dv, dr, alpha_deg, na_y, lambda_=0.8):
         sb_cog = None
 
     # PURE COMPRESSION CASE
-    elif all(d <= 0 for d in dv):   # NOTE Test if this is true!
-        cross_section_state = 'PURE COMPRESSION'
-
+    elif np.all(dv <= 0):   # NOTE Test if this is true!
         # Distance from neutral axis to extreme compression fiber (all distances will be negative)
-        c = min(dv)     
+        c = dv.min()     
 
         # Set vertices of stress block (entire section)
-        x_sb = x
-        y_sb = y
+        x_sb = section.x
+        y_sb = section.y
 
-        Asb = geometry.polygon_area(x, y)
-        sb_cog = geometry.polygon_centroid(x, y)
+        Asb = section.area
+        sb_cog = section.centroid
 
     # MIXED TENSION/COMPRESSION CASE
     else:
-        cross_section_state = 'MIXED TENSION/COMPRESSION'
-
         # Distance from neutral axis to extreme compression fiber (pos. in tension / negative in compression)
         # FIXME This might not be correct in all cases (if compression zone is very small, tension will dominate)
-        c = min(dv)
+        c = dv.min()
         # NOTE beta_1=0.85 from ACI should be replaced by lambda = 0.8 from Eurocode for concrete strengths < C50 (change also default function input)
         # Signed distance from inner stress block edge to extreme compression fiber
         a = lambda_ * c
 
         # Signed perpendicular distance between neutral axis and stress block   
         delta_p = c - a
-      
-        # Vert. dist. in y-coordinate from neutral axis to inner edge of stress block
-        delta_v = delta_p / cos(alpha_deg*pi/180)
-
-        # Intersection between stress block inner edge and y-axis (parallel with neutral axis)
-
-        # if alpha_deg == 90:
-        #     sb_y_intersect = delta_v - na_y     # NOTE I can't really explain why this conditional is necessary, but it fixed the immediate problem
-        # else:
-        sb_y_intersect = na_y - delta_v
-
-        # Intersections between inner edge of stress block (parrallel with neutral axis) and section
-        sb_xint, sb_yint = geometry.line_polygon_collisions(alpha_deg, sb_y_intersect, x, y)
-
-        # Find concrete section vertices that are in compression
-        x_compr_vertices, y_compr_vertices = geometry.get_section_compression_vertices(x, y, na_y, alpha_deg, delta_v)
 
-        # Collect all stress block vertices
-        x_sb = sb_xint + x_compr_vertices
-        y_sb = sb_yint + y_compr_vertices
+        # Clip the section by the inner edge of the stress block (parallel with neutral axis). The clipped
+        # vertices are ordered along the perimeter, which also holds for non-convex sections, e.g. a T-beam
+        x_sb, y_sb, Asb, sb_cog = section.stress_block(dv, delta_p, alpha_deg)
 
-        # Order stress block vertices with respect to centroid for the entire section
-        # NOTE Might fail for non-convex polygons, e.g. a T-beam
-        x_sb, y_sb = geometry.order_polygon_vertices(x_sb, y_sb, x, y, counterclockwise=True)
+    return x_sb, y_sb, Asb, sb_cog, c
 
-        # NOTE Calc of area and centre of gravity is unnecessary in this function and should be done elsewhere if needed
-        # Compute area of the stress block by shoelace algorithm
-        Asb = geometry.polygon_area(x_sb, y_sb)
 
-        # Compute location of centroid for stress block polygon
-        sb_cog = geometry.polygon_centroid(x_sb, y_sb)
+def section_rebars_in_stress_block(section, dv, dr, c, lambda_=0.8):
+    '''
+    Returns a boolean array with entry 'True' for rebars of the section located inside the stress block.
 
-    return x_sb, y_sb, Asb, sb_cog, c
+    The test is based on the distances to the neutral axis, which avoids a point-in-polygon test for each
+    state of the section.
+    '''
+    if np.all(dv >= 0):
+        # Pure tension, no stress block
+        return np.zeros(dr.size, dtype=bool)
+    elif np.all(dv <= 0):
+        # Pure compression, the stress block is the entire concrete section
+        return section.rebars_in_concrete
+    else:
+        # Rebars between the inner edge of the stress block and the extreme compression fiber
+        return section.rebars_in_concrete & (dr <= c - lambda_ * c)
 
 
 def compute_rebar_strain(dist_to_na, c, eps_cu):
-    ''' Return strain in each rebar as a list '''
-    return [ri / abs(c) * eps_cu for ri in dist_to_na]
+    ''' Return strain in each rebar as an array '''
+    return np.asarray(dist_to_na, dtype=float) / abs(c) * eps_cu
 
 
 def compute_rebar_stress(eps_r, Es, fyd):
-    ''' Return stress in each rebar as a list '''
-    
-    sigma_r = []
-    for i in range(len(eps_r)):
-        # Linear elastic stress in i'th bar
-        si = eps_r[i] * Es
-
-        # NOTE Below could maybe be min(si, fyd), but remember sign! 
-        # Check if rebar yields
-        if abs(si) <= fyd:
-            # Computed stress does not exceed yield stress
-            sigma_r.append(si)
-        else:
-            # Computed stress exceeds yield, use yield stress instead
-            sigma_r.append(np.sign(si)*fyd)
+    '''
+    Return stress in each rebar as an array.
 
-    return sigma_r
+    'Es' and 'fyd' can be single values or arrays with one value per rebar, e.g. from
+    'RebarLayout.per_bar' for layouts with mixed steel grades.
+    '''
+    # Linear elastic stress in each bar, limited to the yield stress (with sign)
+    fyd = np.asarray(fyd, dtype=float)
+    return np.clip(np.asarray(eps_r, dtype=float) * Es, -fyd, fyd)
 
 
 def rebars_in_stress_block(x_sb, y_sb, xr, yr):
-    ''' Returns a list with entry 'True' for rebars located inside the stress block, 'False' otherwise '''
+    ''' Returns a boolean array with entry 'True' for rebars located inside the stress block, 'False' otherwise '''
 
-    if xr and yr:
-        # Arrange rebar coordinates
-        rebar_coords = [[xr[i], yr[i]] for i in range(len(xr))]
-    else:
+    if len(xr) == 0 or len(yr) == 0:
         raise ValueError('No rebars in section.')
 
     # Compute area of stress block
     Asb = geometry.polygon_area(x_sb, y_sb)
 
     if Asb != 0:
-        # Arrange stress block coordinates
-        sb_poly = [[x_sb[i], y_sb[i]] for i in range(len(x_sb))]
-
-        # Check if rebars are inside the stress block
-        path = mpltPath.Path(sb_poly)
-        # Returns 'True' if rebar is inside stress block
-        rebars_inside = path.contains_points(rebar_coords)
+        # Close the stress block polygon and check if rebars are inside it
+        x_ring = np.append(x_sb, x_sb[0])
+        y_ring = np.append(y_sb, y_sb[0])
+        rebars_inside = geometry.points_in_polygon(xr, yr, x_ring, y_ring)
     else:
         # All rebars are in tension (all entries are 'False')
-        rebars_inside = [False] * len(xr)
+        rebars_inside = np.zeros(len(xr), dtype=bool)
 
     return rebars_inside
-    # logging.debug('bar {} is inside stress block'.format(i+1))  # TODO Create logging statement
 
 
 def compute_rebar_forces(xr, yr, As, sigma_r, rebars_inside, fcd, lambda_=0.80):
-    ''' Return rebar forces as list.
+    ''' Return rebar forces as array.
     
      Args:
-      rebars_inside (list)  : List of boolean values, 'True' or 'False' for rebars inside 
+      As (float/array)      : Rebar area, either one for all bars or one per bar
+      rebars_inside (array) : Boolean values, 'True' or 'False' for rebars inside 
                               or outside stress block, respectively
 
     Returns:
-      Fr (list)             : List of rebar forces
+      Fr (array)            : Rebar forces
     '''
-    Fr = []    # Forces in each rebar
-
-    for i in range(len(xr)):
-        if rebars_inside[i]:
-            # Rebar is inside stress block, correct for disp. of concrete
-            Fi = (sigma_r[i] + lambda_ * fcd) * As
-        else:
-            # Rebar is outside stress block
-            Fi = sigma_r[i] * As
-        Fr.append(Fi)
-    
-    return Fr
+    # Rebars inside stress block are corrected for displaced concrete
+    return (np.asarray(sigma_r, dtype=float) + np.where(rebars_inside, lambda_ * fcd, 0.0)) * As
 
 
 def compute_concrete_force(fcd, Asb, lambda_=0.80):
@@ -538,33 +459,35 @@ def compute_moment_vector_angle(Mx, My):
 
 def compute_C_T_forces(Fc, Fr):
     '''    Return Compression (C) and Tension (T) forces of the section    '''
-    Fr_compr = [p for p in Fr if p <= 0]
-    Fr_tension = [p for p in Fr if p > 0]
-    C = sum(Fr_compr) + Fc
-    T = sum(Fr_tension)
+    Fr = np.asarray(Fr, dtype=float)
+    C = Fr[Fr <= 0].sum() + Fc
+    T = Fr[Fr > 0].sum()
 
     return C, T
 
 
-def compute_moment_contributions(xr, yr, Asb, sb_cog, Fc, Fr):
-    ''' Return the moment contributions from concrete and rebars in the cross section. ''' 
+def compute_moment_contributions(xr, yr, Asb, sb_cog, Fc, Fr, ref=(0, 0)):
+    '''
+    Return the moment contributions from concrete and rebars in the cross section.
+
+    Lever arms are measured from the reference point 'ref', e.g. the plastic centroid of
+    the section (see 'Section.plastic_centroid'). Defaults to the origin.
+    ''' 
+    x0, y0 = ref
 
     if Asb == 0:
         Mcx = 0
         Mcy = 0
     else:
-        # FIXME Moment lever arm should be distance between stress block centroid and centroid of transformed section __
-        # FIXME __ Plastic centroid of transformed section happens to be at (0, 0) in the example in MacGregor's example
         # Moment contribution from concrete about x-axis
-        Mcx = -Fc * sb_cog[1]
+        Mcx = -Fc * (sb_cog[1] - y0)
         # Moment contribution from concrete about y-axis
-        Mcy = -Fc * sb_cog[0]
+        Mcy = -Fc * (sb_cog[0] - x0)
 
     # Moment contribution from rebars about x- and y-axis (according to moment sign convention)
-    # FIXME Lever arms should be taken wrt. the centroid of the transformed section, i.e. including reinforcement
-    # NOTE Why not also plastic centroid?
-    Mrx = [-Fr[i] * yr[i] for i in range(len(yr))]
-    Mry = [-Fr[i] * xr[i] for i in range(len(xr))]
+    Fr = np.asarray(Fr, dtype=float)
+    Mrx = -Fr * (np.asarray(yr, dtype=float) - y0)
+    Mry = -Fr * (np.asarray(xr, dtype=float) - x0)
 
     return Mcx, Mcy, Mrx, Mry
 
@@ -575,33 +498,27 @@ def compute_C_T_moments(C, T, Mcx, Mcy, Mry, Mrx, Fr, alpha_deg):
 
     The calculation assumes a left-handed sign convention.
     '''
-    My_compr = []
-    Mx_compr = []
-    My_tension = []
-    Mx_tension = []
-    for i in range(len(Fr)):
-        if Fr[i] <= 0:
-            My_compr.append(Mry[i])
-            Mx_compr.append(Mrx[i])
-        if Fr[i] > 0:
-            My_tension.append(Mry[i])
-            Mx_tension.append(Mrx[i])
+    Fr = np.asarray(Fr, dtype=float)
+    Mrx = np.asarray(Mrx, dtype=float)
+    Mry = np.asarray(Mry, dtype=float)
+    compr = Fr <= 0
+    tension = Fr > 0
 
     # Total moment for compression resisting forces (adapted for LH sign convention)
     if alpha_deg >= 90 and alpha_deg <= 270:
-        My_C = sum(My_compr) + Mcy
-        Mx_C = sum(Mx_compr) + Mcx
+        My_C = Mry[compr].sum() + Mcy
+        Mx_C = Mrx[compr].sum() + Mcx
     else:
-        My_C = -(sum(My_compr) + Mcy)
-        Mx_C = -(sum(Mx_compr) + Mcx)
+        My_C = -(Mry[compr].sum() + Mcy)
+        Mx_C = -(Mrx[compr].sum() + Mcx)
 
     # Total moment for tension resisting forces (adapted for LH sign convention)
     if alpha_deg >= 90 and alpha_deg <= 270:
-        My_T = sum(My_tension)
-        Mx_T = sum(Mx_tension)
+        My_T = Mry[tension].sum()
+        Mx_T = Mrx[tension].sum()
     else:
-        My_T = -sum(My_tension)
-        Mx_T = -sum(Mx_tension)
+        My_T = -Mry[tension].sum()
+        Mx_T = -Mrx[tension].sum()
 
     return Mx_C, My_C, Mx_T, My_T
 
@@ -626,27 +543,63 @@ def compute_C_T_forces_eccentricity(C, T, My_C, Mx_C, Mx_T, My_T):
     return ex_C, ey_C, ex_T, ey_T
 
 
-def perform_section_analysis(x, y, xr, yr, fcd, fyd, Es, eps_cu, As, alpha_deg, na_y, lambda_=0.80):
-    ''' Perform cross section analysis '''
+def perform_section_analysis(section, fcd, fyd, Es, eps_cu, alpha_deg, na_y, lambda_=0.80, offset=None,
+                             distances=None):
+    '''
+    Perform cross section analysis for a given location of the neutral axis.
+
+    Rebar properties 'fyd' and 'Es' can be given as single values for all bars or as arrays
+    with one value per bar, e.g. 'section.rebars.per_bar(fyd)' for layouts with mixed steel
+    grades. Rebar areas are taken from the section.
+
+    The neutral axis location can be given by its offset in normal form instead of 'na_y' (see
+    'compute_dist_to_na'), e.g. for vertical neutral axes. Distances (dv, dr) computed beforehand
+    for a batch of locations with 'compute_dist_to_na' can be passed as 'distances'.
+
+    Stage timings and state type counts are recorded when profiling is enabled, see 'instrumentation'.
+    '''
+
+    prof = instrumentation.active()
+    if prof is not None:
+        t = prof.call('perform_section_analysis')
 
     logging.info('Started logging of section analysis')
 
-    dv, dr = compute_dist_to_na(x, y, xr, yr, alpha_deg, na_y)
-    x_sb, y_sb, Asb, sb_cog, c = stress_block_geometry(x, y, dv, dr, alpha_deg, na_y, lambda_=lambda_)
+    dv, dr = distances if distances is not None else compute_dist_to_na(section, alpha_deg, na_y, offset=offset)
+    if prof is not None:
+        t = prof.lap('perform_section_analysis.distances', t)
+        prof.count('states.pure_tension' if dv.min() >= 0 else
+                   'states.pure_compression' if dv.max() <= 0 else 'states.mixed')
+
+    x_sb, y_sb, Asb, sb_cog, c = stress_block_geometry(section, dv, dr, alpha_deg, lambda_=lambda_)
+    if prof is not None:
+        t = prof.lap('perform_section_analysis.stress_block', t)
+
     eps_r = compute_rebar_strain(dr, c, eps_cu)
     sigma_r = compute_rebar_stress(eps_r, Es, fyd)
-    rebars_inside = rebars_in_stress_block(x_sb, y_sb, xr, yr)
-    Fr = compute_rebar_forces(xr, yr, As, sigma_r, rebars_inside, fcd, lambda_=lambda_)
-    Fc = compute_concrete_force(fcd, Asb)
-
-    logging.info('dv =' + str(np.round(dv, decimals=2)))
-    logging.info('dr =' + str(np.round(dr, decimals=2)))
-    logging.info('Asb =' + str(np.round(Asb, decimals=2)))
-    logging.info('Fc =' + str(np.round(Fc, decimals=2)))
-    logging.info('eps_r =' + str(eps_r))
-    logging.info('sigma_r =' + str(np.round(sigma_r, decimals=2)))
-    logging.info('Fr =' + str(np.round(Fr, decimals=2)))
-    logging.info('Finished logging of section analysis')
+    if prof is not None:
+        t = prof.lap('perform_section_analysis.rebar_stress', t)
+
+    rebars_inside = section_rebars_in_stress_block(section, dv, dr, c, lambda_=lambda_)
+    if prof is not None:
+        t = prof.lap('perform_section_analysis.rebars_in_stress_block', t)
+
+    Fr = compute_rebar_forces(section.xr, section.yr, section.As, sigma_r, rebars_inside, fcd, lambda_=lambda_)
+    Fc = compute_concrete_force(fcd, Asb, lambda_=lambda_)
+    if prof is not None:
+        t = prof.lap('perform_section_analysis.forces', t)
+
+    if logging.getLogger().isEnabledFor(logging.INFO):
+        logging.info('dv =' + str(np.round(dv, decimals=2)))
+        logging.info('dr =' + str(np.round(dr, decimals=2)))
+        logging.info('Asb =' + str(np.round(Asb, decimals=2)))
+        logging.info('Fc =' + str(np.round(Fc, decimals=2)))
+        logging.info('eps_r =' + str(eps_r))
+        logging.info('sigma_r =' + str(np.round(sigma_r, decimals=2)))
+        logging.info('Fr =' + str(np.round(Fr, decimals=2)))
+        logging.info('Finished logging of section analysis')
+    if prof is not None:
+        prof.lap('perform_section_analysis.logging', t)
 
     return Fc, Fr, Asb, sb_cog, x_sb, y_sb
 
@@ -19,8 +19,8 @@ import geometry
 import section_calc as sc
 
 
-def plot_capacity_surface(X, Y, Z, plot_type='scatter', labels=['Mx', 'My', 'P']):
-    '''    Plots capacity surface as 3D graph    '''
+def plot_capacity_surface(X, Y, Z, plot_type='scatter', labels=['Mx', 'My', 'P'], faces=None):
+    '''    Plots capacity surface as 3D graph. With 'faces' from 'calc_uls.capacity_mesh' the surface is drawn as mesh.    '''
     fig_surface = plt.figure()
     ax = Axes3D(fig_surface)
 
@@ -30,7 +30,10 @@ def plot_capacity_surface(X, Y, Z, plot_type='scatter', labels=['Mx', 'My', 'P']
     Z = [i/10**3 for i in Z]
 
 
-    if plot_type == 'trisurf':
+    if faces is not None:
+        surf = ax.plot_trisurf(X, Y, Z, triangles=faces, linewidth=0.2, antialiased=True, alpha=0.6)
+
+    elif plot_type == 'trisurf':
         surf = ax.plot_trisurf(X, Y, Z, linewidth=0.2, antialiased=True)
 
     if plot_type == 'wireframe':
@@ -49,7 +52,7 @@ def plot_capacity_surface(X, Y, Z, plot_type='scatter', labels=['Mx', 'My', 'P']
 
 
 # def plot_ULS_section(x, y, xr, yr, fyd, Es, eps_cu, na_y, alpha_deg):
-def plot_ULS_section(x, y, xr, yr, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mrx, Mry, Mx, My, alpha_deg, na_y):
+def plot_ULS_section(section, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mrx, Mry, Mx, My, alpha_deg, na_y):
     '''    Returns a plot of ULS section state for given neutral axis location    '''
 
     phi = sc.compute_moment_vector_angle(Mx, My)
@@ -58,18 +61,16 @@ def plot_ULS_section(x, y, xr, yr, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mr
     ex_C, ey_C, ex_T, ey_T = sc.compute_C_T_forces_eccentricity(C, T, My_C, Mx_C, Mx_T, My_T)
 
     # Find collision points between neutral axis and concrete section # NOTE Only for plotting puposes, not used in calc
-    na_xint, na_yint = geometry.line_polygon_collisions(alpha_deg, na_y, x, y)
+    na_xint, na_yint = geometry.line_polygon_collisions(alpha_deg, na_y, section.x, section.y)
 
     fig, ax = plt.subplots()
     plt.gca().set_aspect('equal', adjustable='box')
     plt.style.use('seaborn-white')
 
     # Full concrete section
-    x_plot = x
-    x_plot.append(x_plot[0])
-    y_plot = y
-    y_plot.append(y_plot[0])
-    plt.plot(x_plot, y_plot, '-', color='k', linewidth=1)    # Concrete section
+    plt.plot(section.x_ring, section.y_ring, '-', color='k', linewidth=1)    # Concrete section
+    if getattr(section, 'inner_radius', 0) > 0:
+        ax.add_patch(patches.Circle(section.center, radius=section.inner_radius, fill=False, edgecolor='k', linewidth=1))
 
     # Coordinate axes
     # plt.plot([-1.2*b/2, 1.2*b/2], [0, 0], 'k', linewidth=0.3)       # TODO Should be more general, maybe pass thoguh plastic centroid?
@@ -86,7 +87,8 @@ def plot_ULS_section(x, y, xr, yr, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mr
                                         verticalalignment='center', fontsize=12)
 
     # Plot stress block
-    if Asb != 0:
+    # NOTE Circular sections compute the stress block in closed form and return no polygon for it
+    if Asb != 0 and x_sb is not None:
         # Create list of stress block coords. in the format [[x0, y0], [x1, y2], ..., [xn, yn]] for plotting as a polygon patch
         # TODO List comprehension!
         sb_coords = []
@@ -99,10 +101,11 @@ def plot_ULS_section(x, y, xr, yr, x_sb, y_sb, Asb, sb_cog, Fc, Fr, Mcx, Mcy, Mr
     if Asb != 0:
         plt.plot(sb_cog[0], sb_cog[1], 'x', color='grey', markersize='4')
 
-    # TODO Radius of rebars on the plot should match the actual radius of the bars
-    # Plot rebars
-    for i in range(len(xr)):
-        ax.add_patch(patches.Circle((xr[i], yr[i]), radius=8, hatch='/////', facecolor='silver', edgecolor='k', linewidth=1))
+    # Plot rebars with their actual size
+    bars = section.rebars
+    for i in range(len(bars)):
+        ax.add_patch(patches.Circle((bars.x[i], bars.y[i]), radius=bars.dia[i]/2, hatch='/////', facecolor='silver',
+                                    edgecolor='k', linewidth=1))
 
     # margin = b/4
     # plt.axis((-(b/2+margin), b/2+margin, -(h/2+margin), h/2+margin))    # Set axis limits
@@ -0,0 +1,191 @@
+# Built-in packages
+from math import pi, sqrt
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import calc_uls
+
+
+'''
+Second order (slenderness) check of columns by the nominal curvature and nominal stiffness methods of EN 1992-1-1.
+
+The second order moments of each load combination are found per bending direction (5.8.9 (2)), for the moment
+Mx with the effective length 'l0x' (deflection in y) and for the moment My with 'l0y' (deflection in x):
+
+    Nominal curvature (5.8.8)   : M = M0 + N*e2,  e2 = Kr*Kphi*(1/r0)*l0**2/c,  1/r0 = eps_yd/(0.45*d)
+    Nominal stiffness (5.8.7)   : M = M0*(1 + beta/(NB/N - 1)),  NB = pi**2*EI/l0**2,  beta = pi**2/c0
+
+with M0 the first order moment including the geometric imperfection e_i = l0/400 (5.2 (7)) and at least the minimum
+eccentricity max(h/30, 20 mm) (6.1 (4)). Both are the converged result of iterating the moments of the deflected
+column, so the moments are computed directly and for all load combinations at once. A column that buckles
+(N >= NB) gets an infinite moment. The imperfection only needs to be considered in the direction where it is
+most unfavourable, so each load combination is checked with the imperfection in each direction and the larger
+utilization ratio governs.
+
+Lengths and stresses are in mm and MPa (N and Nmm for forces and moments). Axial loads are negative in
+compression as elsewhere in the project.
+'''
+
+
+class SecondOrderCheck:
+    '''
+    Second order check of columns with the same section and materials. The capacity surface is computed once and
+    queried for all load combinations and columns.
+
+    Args:
+        section (Section)       : Section, moments are taken about the origin of its coordinate system
+        fcd, fyd, Es, eps_cu    : Materials, see 'calc_uls.compute_capacity_surface'
+        fck (float)             : Characteristic concrete strength, by default 1.5*fcd
+        phi_ef (float)          : Effective creep ratio
+        lambda_, rotation_step, vertical_step   : See 'calc_uls.compute_capacity_surface'
+        surface (CapacitySurface)   : Capacity surface, e.g. from a 'surface_store.SurfaceStore', computed if not
+                                      given. Utilization ratios are taken against the convex hull of the surface
+                                      points, see 'CapacitySurface.equations'
+
+    Attributes:
+        h (ndarray)             : Depth of the section for bending about x and y, i.e. its extent in y and x
+        i (ndarray)             : Radius of gyration of the concrete section about x and y
+        d (ndarray)             : Effective depth for bending about x and y, h/2 + i_s with the radius of gyration
+                                  'i_s' of the reinforcement (5.8.8.3 (2))
+    '''
+
+    def __init__(self, section, fcd, fyd, Es, eps_cu, fck=None, phi_ef=0.0, lambda_=0.80, rotation_step=5,
+                 vertical_step=10, surface=None):
+        self.fcd = fcd
+        self.fck = 1.5 * fcd if fck is None else fck
+        self.phi_ef = phi_ef
+        if surface is None:
+            from scipy.spatial import ConvexHull
+            P, Mx, My, _, _ = calc_uls.compute_capacity_surface(section, fcd, fyd, Es, eps_cu, lambda_=lambda_,
+                                                                rotation_step=rotation_step,
+                                                                vertical_step=vertical_step)
+            self._surface = (P, Mx, My)
+            self._equations = ConvexHull(np.column_stack(self._surface)).equations
+        else:
+            # Stored surfaces come with the facet equations of their convex hull
+            self._surface = (surface.P, surface.Mx, surface.My)
+            self._equations = surface.equations
+
+        # Concrete section properties about its centroid, from the vertices of the polygon (for circular sections
+        # the polygon approximation)
+        x = section.x - section.centroid[0]
+        y = section.y - section.centroid[1]
+        x1, y1 = np.roll(x, -1), np.roll(y, -1)
+        cross = x * y1 - x1 * y
+        Ix = abs(np.sum(cross * (y**2 + y * y1 + y1**2)) / 12)
+        Iy = abs(np.sum(cross * (x**2 + x * x1 + x1**2)) / 12)
+        self.Ac = section.area
+        self.Ic = np.array([Ix, Iy])
+        self.i = np.sqrt(self.Ic / self.Ac)
+        xmin, ymin, xmax, ymax = section.bbox
+        self.h = np.array([ymax - ymin, xmax - xmin])
+
+        # Reinforcement
+        rebars = section.rebars
+        As = section.As
+        self.As = As.sum()
+        xs = np.dot(As, section.xr) / self.As
+        ys = np.dot(As, section.yr) / self.As
+        self.Is = np.array([np.dot(As, (section.yr - ys)**2), np.dot(As, (section.xr - xs)**2)])
+        self.d = self.h / 2 + np.sqrt(self.Is / self.As)
+        fyd = rebars.per_bar(fyd)
+        Es = rebars.per_bar(Es)
+        self.Es = float(np.dot(As, Es) / self.As)
+        self.eps_yd = float(np.dot(As, fyd / Es) / self.As)
+        self.omega = float(np.dot(As, fyd) / (self.Ac * fcd))
+
+    def slenderness(self, l0x, l0y):
+        ''' Return the slenderness ratios l0/i for bending about x and y, shape (2, ...). '''
+        return np.stack(np.broadcast_arrays(np.asarray(l0x, dtype=float) / self.i[0],
+                                            np.asarray(l0y, dtype=float) / self.i[1]))
+
+    def first_order_moments(self, Ped, M0, l0, axis):
+        '''
+        Return the first order moments about 'axis' (0 for x, 1 for y) with the imperfection e_i = l0/400 and
+        at least the minimum eccentricity, in the direction of M0 (positive for M0 = 0). Only compression gives
+        imperfection moments.
+        '''
+        N = np.abs(np.minimum(Ped, 0))
+        sign = np.where(M0 < 0, -1.0, 1.0)
+        e0 = max(self.h[axis] / 30, 20)
+        return sign * np.maximum(np.abs(M0) + N * l0 / 400, N * e0)
+
+    def second_order_moments(self, Ped, Mx0, My0, l0x, l0y, method='curvature', c=10.0, c0=8.0, imperfection=None,
+                             n_bal=0.4):
+        '''
+        Return the design moments including second order effects.
+
+        Args:
+            Ped, Mx0, My0 (ndarray) : Load combinations with first order moments
+            l0x, l0y (ndarray)      : Effective lengths for bending about x and y, single values or one per load
+                                      combination (e.g. the lengths of the column of each load combination)
+            method (str)            : 'curvature' for nominal curvature or 'stiffness' for nominal stiffness
+            c (float)               : Factor of the curvature distribution for the nominal curvature method
+            c0 (float)              : Factor of the first order moment distribution for the nominal stiffness
+                                      method, 8 for a constant moment
+            imperfection (int)      : Direction of the imperfection, 0 for x, 1 for y, None for both
+            n_bal (float)           : Relative axial force at maximum moment resistance
+
+        Returns:
+            Mx, My (ndarray)        : Design moments
+        '''
+        Ped = np.asarray(Ped, dtype=float)
+        N = np.abs(np.minimum(Ped, 0))
+        n = N / (self.Ac * self.fcd)
+        slenderness = self.slenderness(l0x, l0y)
+        moments = []
+        for axis, (M0, l0) in enumerate(((Mx0, l0x), (My0, l0y))):
+            M0 = np.asarray(M0, dtype=float)
+            l0 = np.asarray(l0, dtype=float)
+            if imperfection is None or imperfection == axis:
+                M0 = self.first_order_moments(Ped, M0, l0, axis)
+            if method == 'curvature':
+                n_u = 1 + self.omega
+                Kr = np.clip((n_u - n) / (n_u - n_bal), 0, 1)
+                beta = 0.35 + self.fck / 200 - slenderness[axis] / 150
+                Kphi = np.maximum(1 + beta * self.phi_ef, 1)
+                e2 = Kr * Kphi * self.eps_yd / (0.45 * self.d[axis]) * l0**2 / c
+                M = M0 + np.where(M0 < 0, -1, 1) * N * e2
+            elif method == 'stiffness':
+                k1 = sqrt(self.fck / 20)
+                k2 = np.minimum(n * slenderness[axis] / 170, 0.20)
+                Ecd = 22000 * ((self.fck + 8) / 10)**0.3 / 1.2
+                EI = k1 * k2 / (1 + self.phi_ef) * Ecd * self.Ic[axis] + self.Es * self.Is[axis]
+                NB = pi**2 * EI / l0**2
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    magnification = np.where(N < NB, 1 + pi**2 / c0 / (NB / np.maximum(N, 1e-300) - 1), np.inf)
+                M = np.where(N > 0, M0 * magnification, M0)
+            else:
+                raise ValueError("Unknown method {!r}, use 'curvature' or 'stiffness'.".format(method))
+            moments.append(M)
+        return tuple(np.broadcast_arrays(*moments))
+
+    def utilization_ratio(self, Ped, Mxed, Myed):
+        ''' Return the utilization ratios of load combinations against the convex hull of the capacity surface. '''
+        return np.asarray(calc_uls.utilization_ratio(Ped, Mxed, Myed, *self._surface,
+                                                     hull_equations=self._equations), dtype=float)
+
+    def check(self, Ped, Mx0, My0, l0x, l0y, **kwargs):
+        '''
+        Return the utilization ratios with second order effects, with the imperfection in the direction where it is
+        most unfavourable. Keyword arguments are passed to 'second_order_moments'.
+
+        Returns:
+            ur (ndarray)            : Utilization ratio of each load combination
+            Mx, My (ndarray)        : Governing design moments
+        '''
+        Ped = np.atleast_1d(np.asarray(Ped, dtype=float))
+        cases = [self.second_order_moments(Ped, Mx0, My0, l0x, l0y, imperfection=axis, **kwargs) for axis in (0, 1)]
+        Mx = np.concatenate([np.broadcast_to(case[0], Ped.shape) for case in cases])
+        My = np.concatenate([np.broadcast_to(case[1], Ped.shape) for case in cases])
+        stable = np.isfinite(Mx) & np.isfinite(My)
+        ur = np.full(Mx.shape, np.inf)
+        if np.any(stable):
+            ur[stable] = self.utilization_ratio(np.tile(Ped, 2)[stable], Mx[stable], My[stable])
+        ur = ur.reshape(2, -1)
+        governing = np.argmax(ur, axis=0)
+        columns = np.arange(Ped.size)
+        return (ur[governing, columns], Mx.reshape(2, -1)[governing, columns],
+                My.reshape(2, -1)[governing, columns])
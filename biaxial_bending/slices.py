@@ -0,0 +1,313 @@
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import calc_uls
+import geometry
+import instrumentation
+import kernels
+
+
+'''
+Two-dimensional slices of the capacity surface, solved directly instead of filtering a full surface.
+
+    Axial force contour     : Mx-My contour at a given axial force P. For each neutral axis angle, the depth
+                              of the compression zone is found where the axial capacity equals P.
+    Moment angle curve      : P-M curve for a given direction of the moment vector, i.e. a constant ratio
+                              My/Mx. For each depth of the compression zone, the neutral axis angle is found
+                              where the moment vector has the given direction.
+
+Both are found by bracketing and regula falsi (Illinois variant) on a single neutral axis parameter per point.
+The iterations advance all points of a slice together, so each iteration is one batched analysis of the points
+that are not solved yet ('kernels.state_function', the JIT compiled kernel for polygon sections), and a slice
+costs about ten batched analyses. The batched functions start each slice from the solution of the previous one,
+which reduces the number of iterations further.
+
+Depths of the compression zone are relative, see 'calc_uls.neutral_axis_offsets'.
+'''
+
+
+def _extents(section, alpha_deg):
+    '''
+    Return the offsets in normal form of neutral axes with angles 'alpha_deg' at the tension edge of the section,
+    and the depths of the section normal to them, so the offsets at relative depths are 'edge - depth*span'.
+    '''
+    if section._is_circular:
+        s = np.array([geometry.signed_distances(*section.fibre_points(a), a, 0) for a in alpha_deg]).reshape(-1, 2)
+    else:
+        s = geometry.signed_distances(section.x, section.y, alpha_deg, 0).reshape(alpha_deg.size, section.x.size)
+    s_min, s_max = s.min(axis=1, initial=np.inf), s.max(axis=1, initial=-np.inf)
+    return -s_min, s_max - s_min
+
+
+def _evaluate(states, alpha_deg, depth, extents):
+    '''
+    Return P, Mx, My, the offset in normal form and alpha_deg of the states with neutral axis angles 'alpha_deg'
+    at relative depths 'depth', shape (5, states), in one batch. 'states' is the analysis of the section, see
+    'kernels.state_function', and 'extents' are those of '_extents' for the angles.
+    '''
+    prof = instrumentation.active()
+    if prof is not None:
+        prof.count('slices.states', alpha_deg.size)
+        prof.count('slices.batches')
+    edge, span = extents
+    offset = edge - depth * span
+    P, Mx, My = states(alpha_deg, offset)
+    return np.array([P, Mx, My, offset, alpha_deg])
+
+
+def _solve(f, x0, step, lower, upper, ftol, max_jump=np.inf, xtol=1e-9, max_steps=60, max_iter=100):
+    '''
+    Return the roots of a set of decreasing functions, with all functions evaluated together at each iteration.
+
+    'f(idx, x)' returns the values of the functions 'idx' at 'x' and their states, shape (5, len(idx)). Each root
+    is bracketed by stepping from 'x0' with growing steps within ('lower', 'upper'), and then found by regula
+    falsi (Illinois variant, the weight of an end point is halved when the same end is kept twice). If a
+    function jumps over zero, the state is interpolated linearly between the two sides of the jump, i.e. the
+    surface is taken as plane across the jump like the facets of 'calc_uls.capacity_mesh'. Sign changes where
+    the values differ by 'max_jump' or more are no roots.
+
+    Returns:
+        x (ndarray)         : Roots, NaN where none was found
+        states (ndarray)    : States at the roots, shape (5, n), NaN where no root was found
+    '''
+    n = x0.size
+    x = np.full(n, np.nan)
+    states = np.full((5, n), np.nan)
+    step, lower, upper = (np.broadcast_to(np.asarray(v, dtype=float), n) for v in (step, lower, upper))
+
+    # Bracketing
+    idx = np.arange(n)
+    fa, sa = f(idx, x0)
+    done = np.abs(fa) <= ftol
+    x[done], states[:, done] = x0[done], sa[:, done]
+    keep = ~done & np.isfinite(fa)
+    idx, a, fa, sa = idx[keep], x0[keep], fa[keep], sa[:, keep]
+    direction = np.where(fa > 0, 1.0, -1.0)
+    step, lower, upper = step[keep], lower[keep], upper[keep]
+    brackets = []
+    for _ in range(max_steps):
+        if idx.size == 0:
+            break
+        b = np.minimum(np.maximum(a + direction * step, lower), upper)
+        moved = b != a
+        idx, a, fa, sa, b = idx[moved], a[moved], fa[moved], sa[:, moved], b[moved]
+        direction, step, lower, upper = direction[moved], step[moved], lower[moved], upper[moved]
+        if idx.size == 0:
+            break
+        fb, sb = f(idx, b)
+        finite = np.isfinite(fb)
+        change = finite & ((fb > 0) != (fa > 0))
+        first = a < b
+        lo = np.where(first, a, b)[change], np.where(first, fa, fb)[change]
+        hi = np.where(first, b, a)[change], np.where(first, fb, fa)[change]
+        brackets.append((idx[change], lo[0], lo[1], np.where(first, sa, sb)[:, change],
+                         hi[0], hi[1], np.where(first, sb, sa)[:, change]))
+        keep = finite & ~change
+
+        # The steps double, or grow up to four times to reach past the root predicted by the secant where the
+        # values get closer to zero
+        with np.errstate(divide='ignore', invalid='ignore'):
+            predicted = np.abs(fb * (b - a) / (fb - fa))
+        step = np.where(np.abs(fb) < np.abs(fa), np.clip(1.5 * predicted, 2 * step, 4 * step), 2 * step)
+        idx, a, fa, sa = idx[keep], b[keep], fb[keep], sb[:, keep]
+        direction, step, lower, upper = direction[keep], step[keep], lower[keep], upper[keep]
+    if not brackets:
+        return x, states
+    idx, a, fa, sa, b, fb, sb = (np.concatenate(parts, axis=-1) for parts in zip(*brackets))
+    keep = np.abs(fa - fb) < max_jump
+    idx, a, fa, sa, b, fb, sb = idx[keep], a[keep], fa[keep], sa[:, keep], b[keep], fb[keep], sb[:, keep]
+
+    # Regula falsi on the brackets (X[0], X[1]) with values F, weights W and states S of the ends
+    X, F, S = np.array([a, b]), np.array([fa, fb]), np.array([sa, sb])
+    W = F.copy()
+    last = np.full(idx.size, -1)
+
+    def interpolate(mask):
+        if not np.any(mask):
+            return
+        t = F[0, mask] / (F[0, mask] - F[1, mask])
+        x[idx[mask]] = X[0, mask] + t * (X[1, mask] - X[0, mask])
+        states[:, idx[mask]] = S[0][:, mask] + t * (S[1][:, mask] - S[0][:, mask])
+
+    for _ in range(max_iter):
+        if idx.size == 0:
+            break
+        xm = (X[0] * W[1] - X[1] * W[0]) / (W[1] - W[0])
+        fx, sx = f(idx, xm)
+        converged = np.abs(fx) <= ftol
+        x[idx[converged]], states[:, idx[converged]] = xm[converged], sx[:, converged]
+
+        # Replace the end with the same sign, the weight of the other end is halved if it is kept twice
+        cols = np.arange(idx.size)
+        j = ((fx > 0) == (F[1] > 0)).astype(int)
+        W[1 - j, cols] *= np.where(j == last, 0.5, 1.0)
+        X[j, cols], F[j, cols], W[j, cols], S[j, :, cols] = xm, fx, fx, sx.T
+        last = j
+
+        keep = ~converged & (X[1] - X[0] > xtol)
+        interpolate(~converged & ~keep)
+        idx, X, F, W, S, last = idx[keep], X[:, keep], F[:, keep], W[:, keep], S[:, :, keep], last[keep]
+    interpolate(np.ones(idx.size, dtype=bool))
+    return x, states
+
+
+def _axial_force_contour(states, P, angles, extents, guess, tol, P_range):
+    P_t, P_c = P_range
+    if not P_c < P < P_t:
+        raise ValueError('Axial force {} is outside the axial capacity of the section ({}, {}).'.format(P, P_c, P_t))
+
+    def f(idx, depth):
+        results = _evaluate(states, angles[idx], depth, (extents[0][idx], extents[1][idx]))
+        return results[0] - P, results
+
+    # The axial capacity decreases with increasing depth of the compression zone
+    x0 = np.full(angles.size, 0.5) if guess is None else np.asarray(guess, dtype=float)
+    depths, results = _solve(f, x0, 0.05, -1e3, 1e3, tol * (P_t - P_c), xtol=tol)
+    missing = np.flatnonzero(np.isnan(depths))
+    if missing.size:
+        raise ValueError('No neutral axis with angle {} gives axial force {}.'.format(angles[missing[0]], P))
+    results[3] = geometry.line_y_intersect(results[4], results[3])
+    return results, depths
+
+
+def axial_force_contour(section, fcd, fyd, Es, eps_cu, P, lambda_=0.80, rotation_step=5, reference=None, tol=1e-6):
+    '''
+    Return the Mx-My contour of the capacity surface at axial force 'P'.
+
+    One point is found for each neutral axis angle 0, rotation_step, 2*rotation_step, ... < 360 by solving for
+    the depth of the compression zone. The points are ordered by neutral axis angle and form a closed polyline
+    (the first point is not repeated at the end).
+
+    Close to the pure tension state, the axial capacity is not monotonic in the depth of the compression zone
+    (see 'section_calc.stress_block_geometry'), and the surface folds. At such axial forces, the depth found for
+    each angle is the one closest to the starting depth, which is half the depth of the section or the depth of
+    the previous contour.
+
+    Args:
+        P (float)               : Axial force, between the capacities in pure compression and pure tension
+        rotation_step (float)   : Step of neutral axis angles [deg]
+        reference               : Moment reference point, see 'calc_uls.compute_capacity_surface'
+        tol (float)             : Tolerance of the axial force relative to the range of axial capacities
+
+    Returns:
+        Mx, My (ndarray)        : Moment capacities along the contour
+        na_y, alpha (ndarray)   : Neutral axis location and angle [deg] of each point
+    '''
+    return axial_force_contours(section, fcd, fyd, Es, eps_cu, [P], lambda_=lambda_, rotation_step=rotation_step,
+                                reference=reference, tol=tol)[0]
+
+
+def axial_force_contours(section, fcd, fyd, Es, eps_cu, P_levels, lambda_=0.80, rotation_step=5, reference=None,
+                         tol=1e-6):
+    '''
+    Return the contours of the capacity surface at several axial forces, see 'axial_force_contour'. Each contour
+    is started from the depths of the previous one.
+
+    Returns:
+        contours (list)     : (Mx, My, na_y, alpha) for each axial force in 'P_levels'
+    '''
+    section = calc_uls.reference_section(section, fcd, fyd, lambda_, reference)
+    states = kernels.state_function(section, fcd, fyd, Es, eps_cu, lambda_=lambda_)
+    tension, compression = calc_uls.pole_capacities(section, fcd, fyd, Es, eps_cu, lambda_=lambda_)
+    angles = np.arange(0, 360, rotation_step, dtype=float)
+    extents = _extents(section, angles)
+
+    contours = []
+    depths = None
+    for P in P_levels:
+        results, depths = _axial_force_contour(states, float(P), angles, extents, depths, tol,
+                                               (tension[0], compression[0]))
+        contours.append(tuple(results[1:]))
+    return contours
+
+
+def _angle_difference(a, b):
+    ''' Return the difference a - b between two angles [deg] in the range [-180, 180). '''
+    return (a - b + 180) % 360 - 180
+
+
+def _moment_angle_curve(section, states, theta, depths, guess, tol):
+    def f(idx, alpha_deg):
+        alpha_deg = alpha_deg % 360
+        results = _evaluate(states, alpha_deg, depths[idx], _extents(section, alpha_deg))
+        with np.errstate(invalid='ignore'):
+            difference = _angle_difference(np.degrees(np.arctan2(results[2], results[1])), theta)
+        return np.where((results[1] == 0) & (results[2] == 0), np.nan, difference), results
+
+    # Start from the angles of the previous curve where known
+    x0 = np.full(depths.size, -theta)
+    if guess is not None and np.any(np.isfinite(guess)):
+        x0 = np.where(np.isfinite(guess), guess, guess[np.isfinite(guess)][0])
+
+    # The moment direction turns opposite to the neutral axis, so the difference decreases with the neutral axis
+    # angle. A sign change is only a root if it is not the jump of the difference at 180 deg
+    _, results = _solve(f, x0, 5.0, x0 - 360, x0 + 360, tol, max_jump=180, xtol=tol)
+
+    # Points without a root are tried once more from the angle of the nearest point found, which is usually
+    # closer than the starting angle of the curve
+    found = np.flatnonzero(np.isfinite(results[4]))
+    missing = np.flatnonzero(np.isnan(results[4]))
+    if found.size and missing.size:
+        x1 = results[4][found[np.abs(missing[:, None] - found).argmin(axis=1)]]
+        moved = np.abs(_angle_difference(x1, x0[missing])) > 1e-9
+        retry, x1 = missing[moved], x1[moved]
+        if retry.size:
+            _, results[:, retry] = _solve(lambda idx, alpha_deg: f(retry[idx], alpha_deg), x1, 5.0, x1 - 360,
+                                          x1 + 360, tol, max_jump=180, xtol=tol)
+    results[3] = geometry.line_y_intersect(results[4], results[3])
+    return results
+
+
+def moment_angle_curve(section, fcd, fyd, Es, eps_cu, theta, lambda_=0.80, vertical_step=10, reference=None,
+                       tol=1e-6):
+    '''
+    Return the P-M curve of the capacity surface for moment vectors with direction 'theta', i.e.
+    atan2(My, Mx) = theta.
+
+    One point is found for each of the relative depths of the compression zone of the meridians of
+    'calc_uls.compute_capacity_surface' by solving for the neutral axis angle. The points are ordered from the
+    tension side to the compression side. Depths where no neutral axis gives a moment in the direction 'theta'
+    (close to the poles of unsymmetric sections) are NaN.
+
+    Args:
+        theta (float)           : Direction of the moment vector [deg], measured from the Mx-axis towards the My-axis
+        vertical_step (int)     : Number of points is 2*vertical_step, see 'calc_uls.compute_capacity_surface'
+        reference               : Moment reference point, see 'calc_uls.compute_capacity_surface'
+        tol (float)             : Tolerance of the moment direction [deg]
+
+    Returns:
+        P, Mx, My (ndarray)     : Capacities along the curve
+        na_y, alpha (ndarray)   : Neutral axis location and angle [deg] of each point
+    '''
+    return moment_angle_curves(section, fcd, fyd, Es, eps_cu, [theta], lambda_=lambda_, vertical_step=vertical_step,
+                               reference=reference, tol=tol)[0]
+
+
+def moment_angle_curves(section, fcd, fyd, Es, eps_cu, thetas, lambda_=0.80, vertical_step=10, reference=None,
+                        tol=1e-6):
+    '''
+    Return the P-M curves of the capacity surface for several moment directions, see 'moment_angle_curve'. Each
+    curve is started from the neutral axis angles of the previous one.
+
+    Returns:
+        curves (list)       : (P, Mx, My, na_y, alpha) for each direction in 'thetas'
+    '''
+    section = calc_uls.reference_section(section, fcd, fyd, lambda_, reference)
+    states = kernels.state_function(section, fcd, fyd, Es, eps_cu, lambda_=lambda_)
+    depths = np.linspace(-1/3, 4/3, 2*vertical_step)
+
+    curves = []
+    guess = None
+    theta_prev = None
+    for theta in thetas:
+        theta = float(theta)
+        if guess is not None:
+            # The neutral axis turns opposite to the moment vector
+            guess = guess - _angle_difference(theta, theta_prev)
+        results = _moment_angle_curve(section, states, theta, depths, guess, tol)
+        curves.append(tuple(results))
+        if np.any(np.isfinite(results[4])):
+            guess = results[4]
+            theta_prev = theta
+    return curves
@@ -0,0 +1,288 @@
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import section_calc as sc
+import calc_uls
+from geometry import line_normal, line_y_intersect
+from rebars import RebarLayout
+
+
+'''
+Cached geometry of the neutral axis states of a capacity surface, for evaluating the surface for other
+reinforcement areas or materials without repeating the section analysis.
+
+For a given neutral axis, the stress block (area and centroid), the strain of each bar relative to the strain at
+the extreme compression fibre and whether a bar is inside the stress block only depend on the geometry of the
+section, the bar positions and lambda_. The capacities of the state are then
+
+    P  = -lambda_*fcd*Asb               + sum(f*As)
+    Mx =  lambda_*fcd*Asb*y_sb          - sum(f*As*yr)
+    My =  lambda_*fcd*Asb*x_sb          - sum(f*As*xr)
+
+where the force per unit area of each bar is f = clip(Es*eps_cu*strain, -fyd, fyd) + lambda_*fcd*inside (see
+'section_calc.compute_rebar_forces'). The concrete terms do not depend on the bars and the bar terms are linear
+in the bar areas, so for fixed materials the surface of any set of bar areas is one matrix-vector product (see
+'BarContributions'). Likewise only the force terms depend on the materials, so 'StateCache.sweep' evaluates
+the surface for many concrete and steel grades or partial factors at once.
+
+Moving the bars leaves the concrete terms unchanged as well. The strains and stress block membership of the
+moved bars follow from their distances to the cached neutral axes, so 'StateCache.sweep' also evaluates the
+surfaces of many sets of bar positions at once, e.g. for random cover in 'reliability'.
+
+The results are the same as 'calc_uls.compute_capacity_surface' up to rounding, with the states in the order of
+use_symmetry=False, i.e. by neutral axis angle and depth followed by the two poles.
+'''
+
+
+class StateCache:
+    '''
+    Geometry of the neutral axis states of the capacity surface of a section.
+
+    Args:
+        section (Section)       : Section, only its concrete geometry and bar positions are used
+        lambda_, rotation_step, vertical_step   : See 'calc_uls.compute_capacity_surface'
+        reference (tuple)       : Moment reference point (x0, y0), or None for the origin. The plastic centroid
+                                  depends on the materials and bar areas and is not supported
+
+    Attributes:
+        section (Section)       : Section, translated to the reference point
+        na_y, alpha (ndarray)   : Neutral axis location and angle [deg] of each state, NaN for the poles
+        Asb (ndarray)           : Area of the stress block of each state
+        sb_x, sb_y (ndarray)    : Centroid of the stress block of each state (0 without stress block)
+        strain (ndarray)        : Strain of each bar relative to the strain at the extreme compression fibre,
+                                  shape (states, bars)
+        inside (ndarray)        : True for bars inside the stress block, shape (states, bars)
+        normal, offset (ndarray): Neutral axis of each state in normal form, see 'geometry.line_normal', shape
+                                  (states, 2) and (states,). The poles have a zero normal and offset 1 (tension)
+                                  and -1 (compression)
+        c (ndarray)             : Distance from the neutral axis to the extreme compression fibre of each state,
+                                  NaN for pure tension states where the extreme tension bar is used instead
+        level (ndarray)         : Distance from the neutral axis to the inner edge of the stress block of each
+                                  state, -inf without and inf with the entire section as stress block
+    '''
+    __slots__ = ('section', 'lambda_', 'na_y', 'alpha', 'Asb', 'sb_x', 'sb_y', 'strain', 'inside', 'normal',
+                 'offset', 'c', 'level')
+
+    def __init__(self, section, lambda_=0.80, rotation_step=5, vertical_step=10, reference=None):
+        if isinstance(reference, str):
+            raise ValueError('The reference point must be given as (x0, y0), as the plastic centroid depends on '
+                             'the materials and bar areas.')
+        section = calc_uls.reference_section(section, None, None, lambda_, reference)
+        self.section = section
+        self.lambda_ = lambda_
+
+        depths = np.linspace(-1/3, 4/3, 2*vertical_step)
+        alpha = []
+        na_y = []
+        Asb = []
+        sb_cog = []
+        strain = []
+        inside = []
+        offset = []
+        extreme = []
+        level = []
+        for alpha_deg in range(0, 360, rotation_step):
+            offsets = calc_uls.neutral_axis_offsets(section, alpha_deg, depths)
+            dv_all, dr_all = sc.compute_dist_to_na(section, alpha_deg, None, offset=offsets)
+            for dv, dr in zip(dv_all, dr_all):
+                _, _, A, cog, c = sc.stress_block_geometry(section, dv, dr, alpha_deg, lambda_=lambda_)
+                Asb.append(A)
+                sb_cog.append(cog if A != 0 else (0, 0))
+                strain.append(sc.compute_rebar_strain(dr, c, 1.0))
+                inside.append(sc.section_rebars_in_stress_block(section, dv, dr, c, lambda_=lambda_))
+                if np.all(dv >= 0):
+                    extreme.append(np.nan)
+                    level.append(-np.inf)
+                else:
+                    extreme.append(c)
+                    level.append(np.inf if np.all(dv <= 0) else c - lambda_ * c)
+            alpha.append(np.full(depths.size, float(alpha_deg)))
+            na_y.append(line_y_intersect(alpha_deg, offsets))
+            offset.append(offsets)
+
+        # Poles, uniform strain in tension without concrete and in compression with the entire section as stress
+        # block, see 'calc_uls.pole_capacities'
+        m = len(section.rebars)
+        Asb += [0, section.area]
+        sb_cog += [(0, 0), section.centroid]
+        strain += [np.ones(m), -np.ones(m)]
+        inside += [np.zeros(m, dtype=bool), section.rebars_in_concrete]
+
+        self.alpha = np.concatenate(alpha + [[np.nan, np.nan]])
+        self.na_y = np.concatenate(na_y + [[np.nan, np.nan]])
+        self.Asb = np.array(Asb, dtype=float)
+        self.sb_x, self.sb_y = np.array(sb_cog, dtype=float).T
+        self.strain = np.array(strain, dtype=float)
+        self.inside = np.array(inside, dtype=bool)
+        self.normal = np.concatenate((line_normal(self.alpha[:-2]), np.zeros((2, 2))))
+        self.offset = np.concatenate(offset + [[1, -1]])
+        self.c = np.array(extreme + [1, 1], dtype=float)
+        self.level = np.array(level + [-np.inf, np.inf])
+
+    def __len__(self):
+        return self.Asb.size
+
+    def concrete(self, fcd):
+        ''' Return the capacities of the concrete of each state as array of shape (states, 3) of (P, Mx, My). '''
+        Fc = -self.lambda_ * fcd * self.Asb
+        return np.column_stack((Fc, -Fc * self.sb_y, -Fc * self.sb_x))
+
+    def bar_forces(self, fcd, fyd, Es, eps_cu):
+        '''
+        Return the force per unit area of each bar in each state, shape (states, bars). Rebar properties can be
+        single values or sequences indexed by material ID, see 'RebarLayout.per_bar'.
+        '''
+        rebars = self.section.rebars
+        sigma = sc.compute_rebar_stress(self.strain * eps_cu, rebars.per_bar(Es), rebars.per_bar(fyd))
+        return sigma + np.where(self.inside, self.lambda_ * fcd, 0.0)
+
+    def contributions(self, fcd, fyd, Es, eps_cu):
+        ''' Return the concrete and bar contributions of the states for the given materials, see 'BarContributions'. '''
+        return BarContributions(self.concrete(fcd), self.bar_forces(fcd, fyd, Es, eps_cu), self.section.xr,
+                                self.section.yr, self.na_y, self.alpha)
+
+    def moved(self, dxy):
+        '''
+        Return the relative strains and stress block membership of the bars moved by 'dxy' in each state, see
+        'strain' and 'inside'.
+
+        Args:
+            dxy (ndarray)           : Displacements of the bars, shape (variants, bars, 2)
+
+        Returns:
+            strain, inside (ndarray): Arrays of shape (variants, states, bars)
+        '''
+        bars = self.section.rebars
+        x = bars.x + dxy[..., 0]
+        y = bars.y + dxy[..., 1]
+        dr = (x[:, None, :] * self.normal[:, 0, None] + y[:, None, :] * self.normal[:, 1, None]
+              + self.offset[:, None] + 0.0)
+
+        # Pure tension states are scaled by the extreme tension bar, see 'section_calc.stress_block_geometry'
+        c = np.broadcast_to(self.c, dr.shape[:2])
+        tension = np.isnan(self.c)
+        if np.any(tension):
+            r_max = np.where(dr[:, tension] > 0, dr[:, tension], -np.inf).max(axis=-1)
+            if np.any(np.isinf(r_max)):
+                raise ValueError('No rebar on the tension side of a pure tension state.')
+            c = c.copy()
+            c[:, tension] = r_max
+        strain = sc.compute_rebar_strain(dr, c[..., None], 1.0)
+
+        in_concrete = np.array([self.section.with_rebars(RebarLayout(xk, yk, area=bars.area,
+                                                                     material=bars.material)).rebars_in_concrete
+                                for xk, yk in zip(x, y)], dtype=bool)
+        inside = in_concrete[:, None, :] & (dr <= self.level[:, None])
+        return strain, inside
+
+    def sweep(self, fcd, fyd, Es, eps_cu, area=None, chunk_size=64, dxy=None):
+        '''
+        Return the capacity surfaces for several sets of materials at once, e.g. for concrete and steel grades or
+        partial factors. Each material property is a single value for all variants or an array with one value per
+        variant, and 'fyd' and 'Es' can be arrays of shape (variants, materials) indexed by material ID of the bars.
+        Note that 1-D arrays are variants here, not values per material ID. The stress block factor 'lambda_' is
+        part of the cached geometry and is the same for all variants.
+
+        Args:
+            area (ndarray)          : Bar areas, the areas of the section if not given
+            chunk_size (int)        : Number of variants processed at a time, limits the memory use
+            dxy (ndarray)           : Displacements of the bars of each variant, shape (variants, bars, 2), see
+                                      'moved'. The bars are at their positions in the section if not given
+
+        Returns:
+            P, Mx, My (ndarray)     : Capacity surface points, shape (variants, states)
+        '''
+        rebars = self.section.rebars
+        area = rebars.area if area is None else np.asarray(area, dtype=float)
+        fcd = np.atleast_1d(np.asarray(fcd, dtype=float))
+        eps_cu = np.atleast_1d(np.asarray(eps_cu, dtype=float))
+        fyd, Es = (self._per_bar_variants(value) for value in (fyd, Es))
+        shapes = [fcd.shape, eps_cu.shape, fyd.shape[:1], Es.shape[:1]]
+        if dxy is not None:
+            dxy = np.asarray(dxy, dtype=float)
+            shapes.append(dxy.shape[:1])
+        n = np.broadcast_shapes(*shapes)[0]
+        fcd = np.broadcast_to(fcd, (n,))
+        eps_cu = np.broadcast_to(eps_cu, (n,))
+        fyd = np.broadcast_to(fyd, (n, len(rebars)))
+        Es = np.broadcast_to(Es, (n, len(rebars)))
+
+        # Unit bar forces times bar areas and levers
+        weights = area[:, None] * np.column_stack((np.ones(len(rebars)), -self.section.yr, -self.section.xr))
+        strain, inside = self.strain, self.inside
+        if dxy is not None:
+            dxy = np.broadcast_to(dxy, (n, len(rebars), 2))
+        result = np.empty((n, len(self), 3))
+        for k in range(0, n, chunk_size):
+            c = slice(k, k + chunk_size)
+            if dxy is not None:
+                strain, inside = self.moved(dxy[c])
+                x = self.section.xr + dxy[c, :, 0]
+                y = self.section.yr + dxy[c, :, 1]
+                weights = area[:, None] * np.stack((np.ones_like(x), -y, -x), axis=-1)
+            limit = fyd[c, None, :]
+            sigma = np.clip(strain * (Es[c] * eps_cu[c, None])[:, None, :], -limit, limit)
+            Fc = -self.lambda_ * fcd[c, None] * self.Asb
+            result[c] = (sigma + self.lambda_ * fcd[c, None, None] * inside) @ weights
+            result[c] += np.stack((Fc, -Fc * self.sb_y, -Fc * self.sb_x), axis=-1)
+        return result[..., 0], result[..., 1], result[..., 2]
+
+    def _per_bar_variants(self, value):
+        ''' Return a material property of the variants of a sweep as array of shape (variants or 1, bars). '''
+        value = np.asarray(value, dtype=float)
+        if value.ndim < 2:
+            return value.reshape(-1, 1)
+        return value[:, self.section.rebars.material]
+
+
+class BarContributions:
+    '''
+    Capacity surface of a section for fixed materials, split into the capacities of the concrete and the forces
+    per unit area of each bar for each state.
+
+    Args:
+        concrete (ndarray)      : Capacities (P, Mx, My) of the concrete, shape (states, 3)
+        forces (ndarray)        : Force per unit area of each bar, shape (states, bars)
+        xr, yr (ndarray)        : Bar coordinates
+        na_y, alpha (ndarray)   : Neutral axis location and angle [deg] of each state
+    '''
+    __slots__ = ('concrete', 'forces', 'lever', 'na_y', 'alpha')
+
+    def __init__(self, concrete, forces, xr, yr, na_y, alpha):
+        self.concrete = concrete
+        self.forces = forces
+        # Contributions of a unit force in each bar to (P, Mx, My)
+        self.lever = np.column_stack((np.ones(len(xr)), -np.asarray(yr), -np.asarray(xr)))
+        self.na_y = na_y
+        self.alpha = alpha
+
+    def __len__(self):
+        return self.concrete.shape[0]
+
+    def surface(self, area):
+        '''
+        Return the capacity surface for the bar areas 'area'.
+
+        Returns:
+            P, Mx, My (ndarray)     : Capacity surface points
+            na_y, alpha (ndarray)   : Neutral axis location and angle [deg] of each point
+        '''
+        P, Mx, My = (self.concrete + self.forces @ (np.asarray(area, dtype=float)[:, None] * self.lever)).T
+        return P, Mx, My, self.na_y, self.alpha
+
+    def surfaces(self, areas):
+        '''
+        Return the capacity surfaces for several sets of bar areas at once.
+
+        Args:
+            areas (ndarray)         : Bar areas, shape (layouts, bars)
+
+        Returns:
+            P, Mx, My (ndarray)     : Capacity surface points, shape (layouts, states)
+        '''
+        areas = np.atleast_2d(np.asarray(areas, dtype=float))
+        # Unit bar forces times bar areas and levers of all layouts as one product
+        weights = (areas[:, :, None] * self.lever).transpose(1, 0, 2).reshape(areas.shape[1], -1)
+        result = (self.forces @ weights).reshape(-1, areas.shape[0], 3) + self.concrete[:, None]
+        return result[..., 0].T, result[..., 1].T, result[..., 2].T
@@ -0,0 +1,171 @@
+# Built-in packages
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# Third party packages
+import numpy as np
+
+# Project specific packages
+import calc_uls
+from facet_index import FacetIndex
+
+
+'''
+Persistent on-disk store for capacity surfaces.
+
+Each surface is stored in its own directory named by a key, which is a hash of the section geometry and
+reinforcement (see 'Section.digest') and all parameters of the capacity surface calculation. A stored
+surface consists of
+
+    surface.npy     : Array of shape (3, n) with the rows P, Mx and My
+    state.npy       : Array of shape (2, n) with the rows na_y and alpha of the neutral axis states
+    faces.npy       : Array of shape (m, 3) with the triangles of the surface mesh, see 'calc_uls.capacity_mesh'
+    equations.npy   : Array of shape (k, 4) with the facet equations of the convex hull of the surface
+    meta.json       : Calculation parameters
+
+Arrays are memory-mapped read-only when a surface is loaded, so worker processes reading the same surface
+share one physical copy through the page cache, and loading is independent of the size of the surface.
+Surfaces are written to a temporary directory that is renamed into place when complete, so concurrent
+writers and interrupted runs never leave partial surfaces behind.
+'''
+
+# Increase when the stored format or the capacity surface calculation changes, to invalidate old surfaces
+FORMAT_VERSION = 5
+
+
+class CapacitySurface:
+    '''
+    Capacity surface loaded from a 'SurfaceStore'.
+
+    Attributes:
+        P, Mx, My (ndarray)     : Capacity surface points
+        na_y, alpha (ndarray)   : Neutral axis location and angle [deg] of each point
+        faces (ndarray)         : Triangles of the surface mesh, or None
+        equations (ndarray)     : Facet equations of the convex hull, see 'scipy.spatial.ConvexHull.equations'
+        meta (dict)             : Calculation parameters
+    '''
+    __slots__ = ('P', 'Mx', 'My', 'na_y', 'alpha', 'faces', 'equations', 'meta', '_index')
+
+    def __init__(self, surface, state, faces, equations, meta):
+        self.P, self.Mx, self.My = surface
+        self.na_y, self.alpha = state
+        self.faces = faces
+        self.equations = equations
+        self.meta = meta
+        self._index = None
+
+    def __len__(self):
+        return self.P.size
+
+    def index(self):
+        ''' Return the facet index of the surface mesh, built once for all queries, or None without mesh. '''
+        if self.faces is not None and self._index is None:
+            self._index = FacetIndex(np.column_stack((self.P, self.Mx, self.My)), self.faces)
+        return self._index
+
+    def utilization_ratio(self, Ped, Mxed, Myed):
+        ''' Return utilization ratios of load combinations, see 'calc_uls.utilization_ratio'. '''
+        return calc_uls.utilization_ratio(Ped, Mxed, Myed, self.P, self.Mx, self.My, hull_equations=self.equations)
+
+    def governing_load(self, Ped, Mxed, Myed, pinned=None):
+        ''' Return the largest utilization ratio and the governing load combination, see 'calc_uls.governing_load'. '''
+        return calc_uls.governing_load(Ped, Mxed, Myed, self.P, self.Mx, self.My, pinned=pinned,
+                                       hull_equations=self.equations)
+
+
+class SurfaceStore:
+    '''
+    Directory of capacity surfaces keyed by section and calculation parameters.
+
+    Args:
+        path (str)  : Root directory of the store, created if it does not exist
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, section, fcd, fyd, Es, eps_cu, lambda_=0.80, rotation_step=5, vertical_step=10, reference=None):
+        ''' Return the key of the capacity surface of 'section' for the given calculation parameters. '''
+        params = self._params(fcd, fyd, Es, eps_cu, lambda_, rotation_step, vertical_step, reference)
+        h = hashlib.sha256(section.digest().encode())
+        h.update(json.dumps(params, sort_keys=True).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _params(fcd, fyd, Es, eps_cu, lambda_, rotation_step, vertical_step, reference):
+        return {'version': FORMAT_VERSION, 'fcd': float(fcd), 'fyd': np.ravel(fyd).tolist(),
+                'Es': np.ravel(Es).tolist(), 'eps_cu': float(eps_cu), 'lambda': float(lambda_),
+                'rotation_step': rotation_step, 'vertical_step': vertical_step,
+                'reference': reference if reference is None or isinstance(reference, str) else list(reference)}
+
+    def _dir(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def __contains__(self, key):
+        return os.path.isdir(self._dir(key))
+
+    def get(self, key):
+        ''' Return the stored surface with key 'key' as memory-mapped arrays, or None if it is not stored. '''
+        directory = self._dir(key)
+        if not os.path.isdir(directory):
+            return None
+        arrays = [np.load(os.path.join(directory, name), mmap_mode='r')
+                  if os.path.exists(os.path.join(directory, name)) else None
+                  for name in ('surface.npy', 'state.npy', 'faces.npy', 'equations.npy')]
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        return CapacitySurface(*arrays, meta)
+
+    def put(self, key, P, Mx, My, na_y, alpha, faces=None, meta=None, equations=None):
+        '''
+        Store a capacity surface under 'key' and return it as loaded from the store. The facet equations of the
+        convex hull are computed if not given, so loaded surfaces never need to build it. An existing surface with
+        the same key is kept.
+        '''
+        surface = np.array([P, Mx, My], dtype=float)
+        state = np.array([na_y, alpha], dtype=float)
+        if equations is None:
+            from scipy.spatial import ConvexHull
+            equations = ConvexHull(surface.T).equations
+
+        directory = self._dir(key)
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.' + key, dir=os.path.dirname(directory))
+        try:
+            np.save(os.path.join(tmp, 'surface.npy'), surface)
+            np.save(os.path.join(tmp, 'state.npy'), state)
+            if faces is not None:
+                np.save(os.path.join(tmp, 'faces.npy'), np.asarray(faces, dtype=np.int64))
+            np.save(os.path.join(tmp, 'equations.npy'), np.asarray(equations, dtype=float))
+            with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                json.dump(meta or {}, f)
+            try:
+                os.rename(tmp, directory)
+            except OSError:
+                # Another process stored the same surface in the meantime
+                if not os.path.isdir(directory):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        return self.get(key)
+
+    def get_or_compute(self, section, fcd, fyd, Es, eps_cu, lambda_=0.80, rotation_step=5, vertical_step=10,
+                       reference=None):
+        '''
+        Return the capacity surface of 'section', computed by 'calc_uls.compute_capacity_surface' and stored if
+        it is not in the store already.
+        '''
+        key = self.key(section, fcd, fyd, Es, eps_cu, lambda_, rotation_step, vertical_step, reference)
+        surface = self.get(key)
+        if surface is None:
+            results = calc_uls.compute_capacity_surface(section, fcd, fyd, Es, eps_cu, lambda_=lambda_,
+                                                        rotation_step=rotation_step, vertical_step=vertical_step,
+                                                        reference=reference, return_mesh=True)
+            meta = self._params(fcd, fyd, Es, eps_cu, lambda_, rotation_step, vertical_step, reference)
+            meta['section'] = section.digest()
+            surface = self.put(key, *results, meta=meta)
+        return surface
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import batch
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        library = {'grid': {'rotation_step': 30, 'vertical_step': 5},
+                   'sections': [{'name': 'C1', 'x': [-200, 200, 200, -200], 'y': [200, 200, -200, -200],
+                                 'rebars': {'x': [-150, 150, 150, -150], 'y': [150, 150, -150, -150], 'dia': 20}},
+                                {'name': 'P/1', 'diameter': 500,
+                                 'rebars': {'x': [200, 0, -200, 0], 'y': [0, 200, 0, -200], 'dia': 20}}]}
+        self.library = os.path.join(self.tmp.name, 'sections.json')
+        with open(self.library, 'w') as f:
+            json.dump(library, f)
+        self.loads = os.path.join(self.tmp.name, 'loads.csv')
+        with open(self.loads, 'w') as f:
+            f.write('section,load,P,Mx,My\n'
+                    'C1,LC1,-1000000,50000000,0\n'
+                    'C1,LC2,0,0,0\n'
+                    'P/1,LC1,-500000,0,80000000\n')
+        self.output = os.path.join(self.tmp.name, 'results')
+
+    def test_run_and_resume(self):
+        library = batch.read_library(self.library)
+        loads = batch.read_loads(self.loads)
+        messages = []
+        self.assertEqual(batch.run(library, loads, self.output, workers=1, log=messages.append), 2)
+        self.assertTrue(os.path.exists(batch.result_filename(self.output, 'P/1')))
+
+        results = batch.read_results(self.output)
+        self.assertEqual(list(results['section']), ['C1', 'C1', 'P/1'])
+        self.assertEqual(list(results['load']), ['LC1', 'LC2', 'LC1'])
+        self.assertEqual(results['ur'][1], 0)
+        self.assertTrue(0 < results['ur'][0] < 1)
+
+        # Completed sections are skipped when the run is restarted, also with other serviceability parameters
+        os.remove(batch.result_filename(self.output, 'C1'))
+        library[1]['sls'] = dict(library[1]['sls'], kt=0.6)
+        self.assertEqual(batch.run(library, loads, self.output, workers=1, log=messages.append), 1)
+        self.assertIn('P/1: already completed, skipped', messages)
+
+        # Report of all sections in one file, which is not read back as a section result
+        report = os.path.join(self.output, 'report.npz')
+        self.assertEqual(batch.main([self.library, self.loads, '--output', self.output, '--workers', '1',
+                                     '--report', report]), 0)
+        with np.load(report) as data:
+            self.assertEqual(list(data['section']), ['C1', 'C1', 'P/1'])
+            np.testing.assert_array_equal(data['ur'], results['ur'])
+        self.assertEqual(list(batch.read_results(self.output)['section']), ['C1', 'C1', 'P/1'])
+
+    def test_similar_names_and_changed_inputs(self):
+        # Names that map to the same characters in file names
+        library = batch.read_library(self.library)
+        library.append(dict(library[1], name='P 1'))
+        loads = batch.read_loads(self.loads)
+        loads['P 1'] = ('LC1', ), np.array([0.0]), np.array([0.0]), np.array([0.0])
+        self.assertEqual(batch.run(library, loads, self.output, workers=1, log=lambda msg: None), 3)
+        results = batch.read_results(self.output)
+        self.assertEqual(sorted(results['section']), ['C1', 'C1', 'P 1', 'P/1'])
+        self.assertEqual(results['ur'][list(results['section']).index('P 1')], 0)
+
+        # Sections with changed load combinations are computed again
+        loads['P 1'] = ('LC1', ), np.array([-500000.0]), np.array([0.0]), np.array([80000000.0])
+        messages = []
+        self.assertEqual(batch.run(library, loads, self.output, workers=1, log=messages.append), 1)
+        self.assertIn('P/1: already completed, skipped', messages)
+        results = batch.read_results(self.output)
+        ur = dict(zip(results['section'], results['ur']))
+        self.assertAlmostEqual(ur['P 1'], ur['P/1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
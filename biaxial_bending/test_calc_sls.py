@@ -0,0 +1,59 @@
+import unittest
+from math import pi
+
+import numpy as np
+
+from calc_sls import _section_rings, clipped_area_moments, cracked_section
+from moment_curvature import MomentCurvature
+from rebars import RebarLayout
+from section import Section, AnnularSection
+
+
+class TestCrackedSection(unittest.TestCase):
+
+    def test_clipped_area_moments(self):
+        section = Section([-200, 200, 200, -200], [-100, -100, 100, 100], RebarLayout([0], [0], dia=10))
+        rings = _section_rings(section)
+
+        # Whole section, upper half and nothing
+        moments = clipped_area_moments(rings, np.array([-1.0, 0, 1]), np.array([0.0, -1, 0]), np.zeros(3))
+        np.testing.assert_allclose(moments[0], [80000, 0, 0, 400 * 200**3 / 12, 0, 200 * 400**3 / 12])
+        np.testing.assert_allclose(moments[1], [40000, 40000 * 50, 0, 400 * 100**3 / 3, 0, 100 * 400**3 / 12])
+        np.testing.assert_allclose(moments[2], 0)
+
+        # Annular sections without the hole
+        annulus = AnnularSection(600, 300, RebarLayout([250], [0], dia=20), n_vertices=720)
+        area = clipped_area_moments(_section_rings(annulus), np.array([-1.0]), np.zeros(1), np.zeros(1))[0, 0]
+        self.assertAlmostEqual(area, annulus.area, delta=1e-4 * annulus.area)
+
+    def test_equilibrium(self):
+        # L-shaped section, the compression zone is not convex for some load cases
+        bars = RebarLayout([-250, -250, 250, 250, -50, -50], [250, -250, -250, -50, -50, 250], dia=16)
+        section = Section([-300, 300, 300, 0, 0, -300], [-300, -300, 0, 0, 300, 300], bars)
+        rng = np.random.default_rng(2)
+        P, Mx, My = rng.uniform(-3e6, 3e5, 20), rng.uniform(-2e8, 2e8, 20), rng.uniform(-2e8, 2e8, 20)
+        eps0, kx, ky = cracked_section(section, P, Mx, My, 15000, 200000)
+
+        # Section forces of the strain states by fibres
+        fibres = MomentCurvature(section, 1, 1, 200000, mesh=200)
+        for k in range(P.size):
+            eps = eps0[k] - kx[k] * fibres.y - ky[k] * fibres.x
+            eps_r = eps0[k] - kx[k] * section.yr - ky[k] * section.xr
+            forces = (np.minimum(eps, 0) * 15000 * fibres.area @ np.column_stack((np.ones_like(eps), -fibres.y,
+                                                                                   -fibres.x))
+                      + (200000 - np.where(eps_r < 0, 15000, 0)) * eps_r * section.As
+                      @ np.column_stack((np.ones_like(eps_r), -section.yr, -section.xr)))
+            # Moments weighted by the size of the section
+            weights = np.array([1, 1 / 600, 1 / 600])
+            error = np.abs(forces - [P[k], Mx[k], My[k]]) @ weights
+            self.assertLess(error, 1e-3 * (np.abs([P[k], Mx[k], My[k]]) @ weights))
+
+    def test_tension(self):
+        bars = RebarLayout([-150, 150, 150, -150], [150, 150, -150, -150], dia=20)
+        section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        eps0, kx, ky = cracked_section(section, [4e5], [0], [0], 15000, 200000)
+        np.testing.assert_allclose([eps0[0], kx[0], ky[0]], [4e5 / (200000 * 4 * pi * 100), 0, 0], atol=1e-15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+from collections import Counter
+
+import numpy as np
+
+import calc_uls
+import instrumentation
+from rebars import RebarLayout
+from section import Section
+
+
+class TestCapacitySurface(unittest.TestCase):
+
+    def setUp(self):
+        # T-beam, symmetric about the vertical axis only
+        x = [-150, -400, -400, 400, 400, 150, 150, -150]
+        y = [200, 200, 400, 400, 200, 200, -150, -150]
+        bars = RebarLayout([-350, 0, 350, -100, 100], [350, 350, 350, -100, -100], dia=20)
+        self.section = Section(x, y, bars)
+        self.args = (self.section, 16.7, 435, 200000, 0.0035)
+
+    def test_mesh_is_closed(self):
+        P, Mx, My, na_y, alpha, faces = calc_uls.compute_capacity_surface(*self.args, rotation_step=15,
+                                                                          vertical_step=5, return_mesh=True)
+        # 24 angles with 10 locations each and two poles, of which the 6 locations with the neutral axis within
+        # the section are on the surface
+        self.assertEqual(len(P), 24 * 10 + 2)
+        self.assertEqual(faces.shape, (2 * 24 * 6, 3))
+        self.assertEqual(np.unique(faces).size, 24 * 6 + 2)
+
+        # Each edge is shared by two triangles with opposite orientation
+        edges = Counter((f[i], f[(i+1) % 3]) for f in faces for i in range(3))
+        self.assertTrue(all(n == 1 and edges[(b, a)] == 1 for (a, b), n in edges.items()))
+
+    def test_mesh_utilization(self):
+        P, Mx, My, _, _, faces = calc_uls.compute_capacity_surface(*self.args, rotation_step=15, vertical_step=5,
+                                                                   return_mesh=True)
+        # Load combinations at half of the mesh vertices are utilized 50%, or slightly more where the mesh is
+        # inside the convex hull of the points
+        idx = np.unique(faces)[::7]
+        loads = [0.5 * np.array(v)[idx] for v in (P, Mx, My)]
+        ur = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My, faces=faces))
+        self.assertTrue(np.all(ur >= 0.5 - 1e-9))
+        self.assertAlmostEqual(np.median(ur), 0.5)
+
+        # The poles are the pure tension and compression capacities
+        P_t, P_c = P[-2:]
+        self.assertAlmostEqual(P_t, 435 * self.section.rebars.total_area)
+        self.assertLess(P_c, -16.7 * 0.8 * self.section.area)
+
+    def test_mesh_matches_hull(self):
+        # The utilization ratio against the mesh equals that against the convex hull of the points up to the
+        # sampling of the surface, and is never smaller as the mesh is inside the hull
+        sections = {'tbeam': self.section,
+                    'rectangle': Section([-200, 200, 200, -200], [-300, -300, 300, 300],
+                                         RebarLayout([-150, 150, 150, -150], [-250, -250, 250, 250], dia=25)),
+                    'triangle': Section([-300, 300, 0], [-200, -200, 300],
+                                        RebarLayout([-200, 200, 0], [-150, -150, 180], dia=20))}
+        from scipy.spatial import ConvexHull
+        rng = np.random.default_rng(2)
+        for name, section in sections.items():
+            for rotation_step in (5, 15):
+                with self.subTest(section=name, rotation_step=rotation_step):
+                    P, Mx, My, _, _, faces = calc_uls.compute_capacity_surface(section, *self.args[1:],
+                                                                               rotation_step=rotation_step,
+                                                                               return_mesh=True)
+                    equations = ConvexHull(np.column_stack((P, Mx, My))).equations
+                    loads = rng.normal(size=(3, 2000)) * np.array([[np.ptp(P)], [np.ptp(Mx)], [np.ptp(My)]])
+                    hull = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My, hull_equations=equations))
+                    mesh = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My, faces=faces))
+                    self.assertTrue(np.all(mesh >= hull * (1 - 1e-9)))
+                    np.testing.assert_allclose(mesh, hull, rtol=0.04)
+
+    def test_governing_load(self):
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(*self.args, rotation_step=15, vertical_step=5)
+        from scipy.spatial import ConvexHull
+        equations = ConvexHull(np.column_stack((P, Mx, My))).equations
+        rng = np.random.default_rng(1)
+        loads = rng.normal(size=(3, 500)) * np.array([[1e6], [5e7], [5e7]])
+        ur = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My, hull_equations=equations))
+        ur_max, i = calc_uls.governing_load(*loads, P, Mx, My, hull_equations=equations)
+        self.assertAlmostEqual(ur_max, ur.max())
+        self.assertEqual(i, np.argmax(ur))
+
+        # Load combinations in a plane and on a line
+        loads[2] = 0
+        ur = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My, hull_equations=equations))
+        self.assertEqual(calc_uls.governing_load(*loads, P, Mx, My, hull_equations=equations)[1], np.argmax(ur))
+        self.assertEqual(list(calc_uls.extreme_loads([3, 1, 2, 5, 4], [0] * 5, [0] * 5)), [1, 3])
+
+        # Pinned load combinations are checked in addition to the extreme ones
+        i = int(np.argmin(np.abs(loads[0]) + np.abs(loads[1])))
+        self.assertNotIn(i, calc_uls.extreme_loads(*loads))
+        with instrumentation.profile() as prof:
+            calc_uls.governing_load(*loads, P, Mx, My, pinned=[i], hull_equations=equations)
+        counts = prof.summary()['counts']
+        self.assertEqual(counts['loads.checked'], calc_uls.extreme_loads(*loads).size + 1)
+        self.assertEqual(counts['loads.total'], 500)
+
+    def test_governing_load_mesh(self):
+        P, Mx, My, _, _, faces = calc_uls.compute_capacity_surface(*self.args, rotation_step=15, vertical_step=5,
+                                                                   return_mesh=True)
+        # Load combinations at 70-100% of the convex hull in random directions, close to the surface. Checking
+        # only the extreme ones gives the same result as checking all of them.
+        from scipy.spatial import ConvexHull
+        equations = ConvexHull(np.column_stack((P, Mx, My))).equations
+        scale = np.array([np.ptp(P), np.ptp(Mx), np.ptp(My)])
+        rng = np.random.default_rng(3)
+        for _ in range(20):
+            U = rng.normal(size=(200, 3)) * scale
+            gauge = np.array(calc_uls.utilization_ratio(*U.T, P, Mx, My, hull_equations=equations))
+            loads = (U / gauge[:, None] * rng.uniform(0.7, 1.0, (200, 1))).T
+            ur = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My, faces=faces))
+            with instrumentation.profile() as prof:
+                ur_max, i = calc_uls.governing_load(*loads, P, Mx, My, faces=faces)
+            self.assertEqual(prof.summary()['counts']['loads.checked'], calc_uls.extreme_loads(*loads).size)
+            self.assertEqual(ur_max, ur.max())
+            self.assertEqual(ur[i], ur.max())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+import geometry
+import instrumentation
+from capacity_bounds import CapacityBounds
+from rebars import RebarLayout
+from section import Section
+
+
+class TestCapacityBounds(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        bars = RebarLayout([-130, 130, 65, -65, 0, 0], [-160, -160, 0, 0, 140, -160], dia=[25, 25, 20, 20, 16, 25])
+        section = Section([0, -200, 200], [200, -200, -200], bars)
+        cls.args = (section, 16.7, 435, 200000, 0.0035)
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(*cls.args, rotation_step=2, vertical_step=30)
+        from scipy.spatial import ConvexHull
+        rng = np.random.default_rng(2)
+        i = rng.integers(0, len(P), 300)
+        cls.loads = np.array([P, Mx, My])[:, i] * rng.uniform(0.5, 1.5, 300)
+        # Utilization ratios against a dense sampling, which are upper bounds of the true utilization ratios
+        cls.dense = geometry.hull_gauge(cls.loads.T, ConvexHull(np.column_stack((P, Mx, My))).equations)
+
+    def test_bounds(self):
+        bounds = CapacityBounds(*self.args)
+        low, high = bounds.utilization_bounds(*self.loads)
+        self.assertTrue(np.all(low <= self.dense))
+        self.assertTrue(np.all(low <= high))
+
+        # Load combinations are decided unless their bounds are within the tolerance and margin around 1
+        undecided = (low <= 1) & (high >= 1)
+        self.assertTrue(np.all(high[undecided] - low[undecided] <= 1e-3 + bounds.margin))
+        decided = np.abs(self.dense - 1) > 0.01
+        np.testing.assert_array_equal((high < 1)[decided], (self.dense < 1)[decided])
+
+    def test_no_refinement_far_from_limit(self):
+        bounds = CapacityBounds(*self.args)
+        with instrumentation.profile() as prof:
+            low, high = bounds.utilization_bounds(*(0.3 * self.loads))
+        self.assertNotIn('bounds.support', prof.summary()['counts'])
+        self.assertTrue(np.all(high < 1))
+
+        # Planes found for other load combinations tighten the lower bounds of later calls
+        bounds.utilization_bounds(*self.loads)
+        self.assertTrue(np.all(bounds.utilization_bounds(*(0.3 * self.loads))[0] >= low))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+from math import pi, sqrt
+
+import numpy as np
+
+import batch
+from crack_width import bar_cover, check_library, crack_widths, write_report
+from rebars import RebarLayout
+from section import Section
+
+
+class TestCrackWidth(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-100, 0, 100], [-200, -200, -200], dia=20)
+        self.beam = Section([-150, 150, 150, -150], [-250, -250, 250, 250], bars)
+
+    def test_beam(self):
+        results = crack_widths(self.beam, [0], [100e6], [0], 11000, 200000, 2.6)
+        np.testing.assert_allclose(bar_cover(self.beam), 40)
+
+        # EN 1992-1-1, 7.3.4 by hand for the cracked rectangular section
+        b, h, d, As, a = 300, 500, 450, 3 * pi * 100, 200000 / 11000
+        x = (-a * As + sqrt((a * As)**2 + 2 * b * a * As * d)) / b
+        sigma_s = a * 100e6 * (d - x) / (b * x**3 / 3 + a * As * (d - x)**2)
+        rho = As / (b * min(2.5 * (h - d), (h - x) / 3))
+        sr_max = 3.4 * 40 + 0.8 * 0.5 * 0.425 * 20 / rho
+        wk = sr_max * max(sigma_s - 0.4 * 2.6 / rho * (1 + a * rho), 0.6 * sigma_s) / 200000
+        self.assertAlmostEqual(results['x'][0], x)
+        np.testing.assert_allclose(results['sigma_s'][0], sigma_s)
+        np.testing.assert_allclose(results['sr_max'][0], sr_max)
+        np.testing.assert_allclose(results['wk'][0], wk)
+        self.assertAlmostEqual(results['sigma_c'][0], -100e6 * x / (b * x**3 / 3 + a * As * (d - x)**2))
+
+    def test_biaxial_and_tension(self):
+        bars = RebarLayout([-150, 0, 150, 150, 150, 0, -150, -150], [150, 150, 150, 0, -150, -150, -150, 0], dia=20)
+        section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        results = crack_widths(section, [-2e5, -2e5, 5e5, -1e6], [80e6, 0, 0, 0], [0, -80e6, 0, 0], 11000, 200000,
+                               2.6)
+
+        # Bending about either axis of the symmetric section gives the same crack width
+        wk = results['wk'].max(axis=1)
+        self.assertAlmostEqual(wk[0], wk[1])
+        self.assertGreater(wk[0], 0)
+
+        # Tension member with effective areas at both faces
+        self.assertEqual(results['x'][2], 0)
+        self.assertAlmostEqual(results['Ac_eff'][2], 2 * 400 * 2.5 * 50)
+        np.testing.assert_allclose(results['sigma_s'][2], 5e5 / (8 * pi * 100))
+
+        # No cracks in compression
+        np.testing.assert_array_equal(results['wk'][3], 0)
+        self.assertTrue(np.all(results['sigma_s'][3] < 0))
+
+    def test_check_library(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            library = os.path.join(tmp, 'sections.json')
+            with open(library, 'w') as f:
+                json.dump({'sls': {'Ec': 11000},
+                           'sections': [{'name': 'B1', 'x': [-150, 150, 150, -150], 'y': [-250, -250, 250, 250],
+                                         'rebars': {'x': [-100, 0, 100], 'y': [-200, -200, -200], 'dia': 20}},
+                                        {'name': 'P1', 'diameter': 500,
+                                         'rebars': {'x': [200, 0, -200, 0], 'y': [0, 200, 0, -200], 'dia': 20},
+                                         'sls': {'kt': 0.6}}]}, f)
+            loads = os.path.join(tmp, 'loads.csv')
+            with open(loads, 'w') as f:
+                f.write('section,load,P,Mx,My\nB1,QP1,0,100000000,0\nB1,QP2,0,50000000,0\nP1,QP1,-500000,0,0\n')
+            messages = []
+            report = check_library(batch.read_library(library), batch.read_loads(loads), workers=1,
+                                   log=messages.append)
+            self.assertEqual(list(report['section']), ['B1', 'B1', 'P1'])
+            self.assertEqual(len(messages), 2)
+
+            expected = crack_widths(self.beam, [0], [100e6], [0], 11000, 200000, 2.6)
+            self.assertAlmostEqual(report['wk'][0], expected['wk'].max())
+            self.assertTrue(report['wk'][0] > report['wk'][1] > 0 == report['wk'][2])
+
+            filename = os.path.join(tmp, 'sls.csv')
+            write_report(filename, report)
+            with open(filename) as f:
+                self.assertEqual(f.readline().strip(), 'section,load,P,Mx,My,sigma_c,sigma_s,wk')
+                self.assertEqual(len(f.readlines()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
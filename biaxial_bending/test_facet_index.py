@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+import geometry
+from facet_index import FacetIndex
+from rebars import RebarLayout
+from section import Section
+
+
+class TestFacetIndex(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-130, 130, 65, -65, 0, 0], [-160, -160, 0, 0, 140, -160], dia=[25, 25, 20, 20, 16, 25])
+        section = Section([0, -200, 200], [200, -200, -200], bars)
+        P, Mx, My, _, _, self.faces = calc_uls.compute_capacity_surface(section, 16.7, 435, 200000, 0.0035,
+                                                                         rotation_step=10, vertical_step=10,
+                                                                         return_mesh=True)
+        self.vertices = np.column_stack((P, Mx, My))
+        rng = np.random.default_rng(1)
+        self.U = self.vertices[rng.integers(0, len(P), 500)] * rng.uniform(0.2, 1.5, (500, 1))
+
+    def test_same_as_brute_force(self):
+        # The index works on axes scaled to comparable magnitudes, which decides edge and vertex hits within
+        # the tolerance when rays pass through vertices of the mesh
+        scale = np.abs(self.vertices).max(axis=0)
+        expected = geometry.ray_mesh_intersection(self.U / scale, self.vertices / scale, self.faces)
+        for n_lat in (None, 1, 30):
+            t = FacetIndex(self.vertices, self.faces, n_lat=n_lat).intersect(self.U)
+            np.testing.assert_allclose(t, expected, rtol=1e-12)
+
+    def test_zero_ray(self):
+        t = FacetIndex(self.vertices, self.faces).intersect([[0, 0, 0], self.U[0]])
+        self.assertTrue(np.isnan(t[0]))
+        self.assertTrue(np.isfinite(t[1]))
+        self.assertTrue(np.isnan(FacetIndex(self.vertices, self.faces).intersect([[0, 0, 0]])[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 
+import numpy as np
+
 import geometry
 
 
@@ -27,7 +29,49 @@ class TestGeometry(unittest.TestCase):
 
 
     def test_polygon_area(self):
-        pass
+        x = [0, 4, 4, 0]
+        y = [0, 0, 3, 3]
+        self.assertEqual(geometry.polygon_area(x, y), 12)
+        self.assertEqual(geometry.polygon_area(x[::-1], y[::-1], signed=True), -12)
+
+
+    def test_clip_polygon(self):
+        # Square clipped by the line y=1 with the part below the line kept
+        x_ring = np.array([0, 4, 4, 0, 0], dtype=float)
+        y_ring = np.array([0, 0, 4, 4, 0], dtype=float)
+        x_clip, y_clip = geometry.clip_polygon(x_ring, y_ring, y_ring, level=1)
+        self.assertEqual(list(x_clip), [0, 4, 4, 0])
+        self.assertEqual(list(y_clip), [0, 0, 1, 1])
+
+
+    def test_points_in_polygon(self):
+        x_ring = np.array([0, 4, 4, 0, 0], dtype=float)
+        y_ring = np.array([0, 0, 4, 4, 0], dtype=float)
+        inside = geometry.points_in_polygon([1, 5, 2], [1, 1, -1], x_ring, y_ring)
+        self.assertEqual(list(inside), [True, False, False])
+
+
+    def test_signed_distances(self):
+        # Horizontal line y = 1 and vertical line x = 1, negative distances above and to the left
+        d = geometry.signed_distances([0, 2], [2, 0], [0, 90], [1, -1])
+        np.testing.assert_allclose(d, [[-1, 1], [-1, 1]])
+        self.assertAlmostEqual(geometry.line_offset(90, geometry.line_y_intersect(90, -1)), -1)
+
+
+    def test_line_polygon_collisions_vertical(self):
+        xint, yint = geometry.line_polygon_collisions(90, None, [0, 4, 4, 0], [0, 0, 4, 4], offset=-1)
+        np.testing.assert_allclose(xint, [1, 1])
+        np.testing.assert_allclose(sorted(yint), [0, 4])
+
+
+    def test_ray_mesh_intersection(self):
+        # Octahedron with vertices at distance 2 from the origin
+        vertices = np.array([[2, 0, 0], [-2, 0, 0], [0, 2, 0], [0, -2, 0], [0, 0, 2], [0, 0, -2]])
+        faces = np.array([[i, j, k] for i in (0, 1) for j in (2, 3) for k in (4, 5)])
+        U = np.array([[1, 0, 0], [0, 0, -4], [1, 1, 1], [0, 0, 0]])
+        t = geometry.ray_mesh_intersection(U, vertices, faces)
+        np.testing.assert_allclose(t[:3], [2, 0.5, 2/3])
+        self.assertTrue(np.isnan(t[3]))
 
 
     def test_point_to_line_dist(self):
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+class TestImports(unittest.TestCase):
+
+    def test_calculation_core_does_not_load_plotting(self):
+        # Run in a fresh interpreter, as other tests may already have imported the packages
+        code = ('import sys, calc_uls, calc_sls; '
+                'print(",".join(m for m in ("matplotlib", "pandas", "mpl_toolkits", "scipy.spatial") '
+                'if m in sys.modules))')
+        out = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                             capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
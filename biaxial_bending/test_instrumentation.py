@@ -0,0 +1,59 @@
+import unittest
+
+import calc_uls
+import instrumentation
+import kernels
+import section_calc as sc
+from rebars import RebarLayout
+from section import Section
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-150, 150, 150, -150], [150, 150, -150, -150], dia=20)
+        self.section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+
+    def analyse(self, na_y):
+        return sc.perform_section_analysis(self.section, 16.7, 435, 200000, 0.0035, 0, na_y)
+
+    def test_profile(self):
+        with instrumentation.profile() as prof:
+            self.analyse(0)         # Mixed
+            self.analyse(-500)      # Pure tension
+            self.analyse(500)       # Pure compression
+        self.assertIsNone(instrumentation.active())
+
+        summary = prof.summary()
+        self.assertEqual(summary['calls'], {'perform_section_analysis': 3})
+        self.assertEqual(summary['counts'], {'states.mixed': 1, 'states.pure_tension': 1,
+                                             'states.pure_compression': 1})
+        total, laps = summary['times']['perform_section_analysis.stress_block']
+        self.assertEqual(laps, 3)
+        self.assertGreater(total, 0)
+
+    @unittest.skipIf(kernels._kernel() is None, 'numba is not installed')
+    def test_state_types_of_backends(self):
+        counts = {}
+        for backend in ('numba', 'numpy'):
+            with instrumentation.profile() as prof:
+                calc_uls.compute_capacity_surface(self.section, 16.7, 435, 200000, 0.0035, rotation_step=30,
+                                                  vertical_step=5, backend=backend)
+            counts[backend] = prof.summary()['counts']
+        self.assertEqual(counts['numba'], counts['numpy'])
+        self.assertGreater(counts['numba']['states.mixed'], 0)
+
+    def test_disabled(self):
+        self.assertIsNone(instrumentation.active())
+        self.analyse(0)
+        with self.assertRaises(RuntimeError):
+            instrumentation.summary()
+
+        prof = instrumentation.enable()
+        self.analyse(0)
+        self.assertIs(instrumentation.disable(), prof)
+        self.assertEqual(prof.calls['perform_section_analysis'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+import kernels
+from rebars import RebarLayout
+from section import Section, CircularSection
+
+
+class TestKernels(unittest.TestCase):
+
+    def setUp(self):
+        # T-beam with mixed steel grades
+        x = [-150, -400, -400, 400, 400, 150, 150, -150]
+        y = [200, 200, 400, 400, 200, 200, -150, -150]
+        bars = RebarLayout([-350, 0, 350, -100, 100], [350, 350, 350, -100, -100], dia=20, material=[0, 0, 0, 1, 1])
+        self.section = Section(x, y, bars)
+        self.args = (self.section, 16.7, bars.per_bar([435, 390]), 200000, 0.0035)
+
+        # States from pure tension to pure compression for all angles, including vertical neutral axes
+        alpha = np.repeat(np.arange(0, 360, 15), 12)
+        depths = np.tile(np.linspace(-0.2, 1.2, 12), 24)
+        offsets = [calc_uls.neutral_axis_offsets(self.section, a, [d])[0] for a, d in zip(alpha, depths)]
+        self.alpha, self.offsets = alpha, np.array(offsets)
+
+    def test_numpy_backend(self):
+        P, Mx, My = kernels.section_states(*self.args, self.alpha, self.offsets, backend='numpy')
+        for i in range(0, self.alpha.size, 17):
+            expected = calc_uls.section_capacity(*self.args, self.alpha[i], None, offset=self.offsets[i])
+            np.testing.assert_allclose([P[i], Mx[i], My[i]], expected, rtol=1e-12)
+
+    @unittest.skipIf(kernels._kernel() is None, 'numba is not installed')
+    def test_numba_backend(self):
+        expected = kernels.section_states(*self.args, self.alpha, self.offsets, backend='numpy')
+        result = kernels.section_states(*self.args, self.alpha, self.offsets, backend='numba')
+        for r, e in zip(result, expected):
+            np.testing.assert_allclose(r, e, rtol=1e-12, atol=1e-9 * np.abs(e).max())
+
+    def test_pure_tension_without_tension_bar(self):
+        # The only bar is on the tension edge, so no bar is on the tension side of the neutral axis
+        section = Section([-200, 200, 200, -200], [-200, -200, 200, 200], RebarLayout([0], [200], dia=20))
+        offset = calc_uls.neutral_axis_offsets(section, 0, [0])
+        for backend in ('numpy', 'numba') if kernels._kernel() is not None else ('numpy',):
+            with self.subTest(backend=backend), self.assertRaises(ValueError):
+                kernels.section_states(section, 16.7, 435, 200000, 0.0035, [0], offset, backend=backend)
+
+    def test_backend_selection(self):
+        circle = CircularSection(500, RebarLayout([0, 200], [200, 0], dia=16))
+        self.assertEqual(kernels.select_backend(circle), 'numpy')
+        self.assertEqual(kernels.select_backend(self.section), 'numpy' if kernels._kernel() is None else 'numba')
+
+
+if __name__ == '__main__':
+    unittest.main()
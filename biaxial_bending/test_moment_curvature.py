@@ -0,0 +1,75 @@
+import unittest
+from math import cos, sin, radians
+
+import numpy as np
+
+import calc_uls
+from moment_curvature import MomentCurvature
+from rebars import RebarLayout
+from section import Section
+
+
+class TestMomentCurvature(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-150, 150, 150, -150, 0], [150, 150, -150, -150, -150], dia=[20, 20, 25, 25, 25])
+        self.section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        self.model = MomentCurvature(self.section, 16.7, 435, 200000)
+
+    def test_fibres(self):
+        self.assertAlmostEqual(self.model.area.sum(), self.section.area)
+        self.assertAlmostEqual(self.model.x @ self.model.area, 0, delta=1e-6 * self.section.area)
+
+    def test_tangent(self):
+        # Analytical tangent against central differences
+        strain = np.array([-2e-4, 8e-6, -3e-6])
+        _, K = self.model.state(*strain)
+        h = np.array([1e-8, 1e-11, 1e-11])
+        for i in range(3):
+            dp, dm = strain.copy(), strain.copy()
+            dp[i] += h[i]
+            dm[i] -= h[i]
+            derivative = (self.model.state(*dp)[0] - self.model.state(*dm)[0]) / (2 * h[i])
+            np.testing.assert_allclose(K[:, i], derivative, rtol=1e-4, atol=1e-6 * np.abs(K).max())
+
+    def test_pure_bending(self):
+        kappa, M, strains, end = self.model.curve(0, 0)
+        self.assertEqual(end, 'ultimate')
+        self.assertEqual(kappa[0], 0)
+        self.assertTrue(np.all(np.diff(kappa) > 0))
+
+        # The curve ends at the ultimate concrete strain, with a capacity close to the stress block model
+        self.assertAlmostEqual(self.model.strain_limits(*strains[-1]), 1, places=3)
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(self.section, 16.7, 435, 200000, 0.0035,
+                                                            rotation_step=2, vertical_step=50)
+        ur = calc_uls.utilization_ratio([0], [M.max()], [0], P, Mx, My)[0]
+        self.assertAlmostEqual(ur, 1, delta=0.03)
+
+    def test_biaxial(self):
+        theta = 30
+        kappa, M, strains, end = self.model.curve(-5e5, theta, n_steps=100)
+        self.assertEqual(end, 'ultimate')
+        self.assertGreater(len(kappa), 5)
+        for strain, m in zip(strains[1:], M[1:]):
+            N, Mx, My = self.model.state(*strain)[0]
+            self.assertAlmostEqual(N / 5e5, -1, places=6)
+            self.assertAlmostEqual(-sin(radians(theta)) * Mx + cos(radians(theta)) * My, 0, delta=1e-6 * abs(m))
+            self.assertAlmostEqual(cos(radians(theta)) * Mx + sin(radians(theta)) * My, m)
+
+    def test_end(self):
+        # Below the ultimate curvature
+        kappa, _, _, end = self.model.curve(0, 0, kappa_max=1e-6, n_steps=5)
+        self.assertEqual((len(kappa), end), (6, 'kappa_max'))
+
+        # In tension the unsymmetric bars give a moment about x without curvature, so there is no equilibrium
+        # for moments about y only at small curvatures
+        kappa, _, _, end = self.model.curve(3e5, 90)
+        self.assertEqual((len(kappa), end), (1, 'not_converged'))
+
+    def test_axial_capacity(self):
+        with self.assertRaises(ValueError):
+            self.model.curve(-1e8, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+import geometry
+from radius_table import RadiusTable
+from rebars import RebarLayout
+from section import Section
+
+
+class TestRadiusTable(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-130, 130, 65, -65, 0, 0], [-160, -160, 0, 0, 140, -160], dia=[25, 25, 20, 20, 16, 25])
+        section = Section([0, -200, 200], [200, -200, -200], bars)
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(section, 16.7, 435, 200000, 0.0035, rotation_step=10,
+                                                            vertical_step=10)
+        from scipy.spatial import ConvexHull
+        self.surface = (P, Mx, My)
+        self.equations = ConvexHull(np.column_stack(self.surface)).equations
+        rng = np.random.default_rng(1)
+        i = rng.integers(0, len(P), 20000)
+        self.loads = np.array(self.surface)[:, i] * rng.uniform(0.2, 1.5, 20000)
+        self.exact = geometry.hull_gauge(self.loads.T, self.equations)
+
+    def test_bounds(self):
+        for n_lat in (10, 90):
+            table = RadiusTable(*self.surface, n_lat=n_lat, hull_equations=self.equations)
+            ur, low, high = table.bounds(*self.loads, chunk_size=3000)
+            self.assertTrue(np.all(low <= self.exact * (1 + 1e-9)))
+            self.assertTrue(np.all(high >= self.exact * (1 - 1e-9)))
+            self.assertTrue(np.all((low <= ur) & (ur <= high)))
+
+        # The bounds are tight for most load combinations with a fine grid
+        self.assertLess(np.median(high / low - 1), 0.01)
+
+    def test_utilization_ratio(self):
+        table = RadiusTable(*self.surface, n_lat=30)
+        ur, exact = table.utilization_ratio(*self.loads)
+        self.assertTrue(np.all((ur <= 1) == (self.exact <= 1)))
+        np.testing.assert_allclose(ur[exact], self.exact[exact], rtol=1e-12)
+        self.assertLess(exact.mean(), 0.1)
+        self.assertEqual(table.utilization_ratio([0], [0], [0])[0][0], 0)
+
+    def test_same_as_utilization_ratio(self):
+        ur = calc_uls.utilization_ratio(*self.loads[:, :200], *self.surface, hull_equations=self.equations)
+        np.testing.assert_allclose(ur, self.exact[:200], rtol=1e-12)
+
+
+if __name__ == '__main__':
+    unittest.main()
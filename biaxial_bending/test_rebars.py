@@ -0,0 +1,32 @@
+import unittest
+from math import pi
+
+import numpy as np
+
+from rebars import RebarLayout
+
+
+class TestRebarLayout(unittest.TestCase):
+
+    def test_areas_from_diameters(self):
+        bars = RebarLayout([0, 100, 200], [0, 0, 0], dia=[25, 16, 25])
+        self.assertEqual(len(bars), 3)
+        self.assertAlmostEqual(bars.area[1], pi*16**2/4)
+        self.assertAlmostEqual(bars.total_area, pi*(2*25**2 + 16**2)/4)
+
+    def test_diameters_from_single_area(self):
+        bars = RebarLayout([0, 100], [0, 0], area=pi*20**2/4)
+        self.assertEqual(['%.1f' % d for d in bars.dia], ['20.0', '20.0'])
+
+    def test_per_bar_material_values(self):
+        bars = RebarLayout([0, 100, 200], [0, 0, 0], dia=20, material=[0, 1, 0])
+        self.assertEqual(list(bars.per_bar([400, 500])), [400, 500, 400])
+        self.assertEqual(list(bars.per_bar(435)), [435, 435, 435])
+
+    def test_missing_size_raises(self):
+        with self.assertRaises(ValueError):
+            RebarLayout([0], [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from math import pi
+
+import numpy as np
+
+import calc_uls
+from rebars import RebarLayout
+import batch
+from reinforcement_search import minimum_reinforcement, size_library
+from section import Section
+
+
+class TestReinforcementSearch(unittest.TestCase):
+
+    def setUp(self):
+        # Corner bars, then middle bars of the faces perpendicular to y, then of the faces perpendicular to x
+        bars = RebarLayout([-150, 150, 150, -150, 0, 0, -150, 150], [150, 150, -150, -150, 150, -150, 0, 0], dia=20)
+        self.section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        self.groups = [[0, 1, 2, 3], [4, 5], [6, 7]]
+        self.diameters = [10, 12, 16, 20, 25, 32]
+        self.materials = (16.7, 435, 200000, 0.0035)
+        self.grid = {'rotation_step': 15, 'vertical_step': 8}
+        self.loads = (np.array([-1.5e6, -0.5e6, 0, -2.5e6]), np.array([180e6, 60e6, 40e6, 10e6]),
+                      np.array([20e6, 90e6, 0, -30e6]))
+
+    def max_ur(self, count, dia):
+        selected = np.concatenate(self.groups[:count])
+        bars = self.section.rebars
+        section = Section(self.section.x, self.section.y, RebarLayout(bars.x[selected], bars.y[selected], dia=dia))
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(section, *self.materials, use_symmetry=False, **self.grid)
+        return max(calc_uls.utilization_ratio(*self.loads, P, Mx, My))
+
+    def test_minimum_reinforcement(self):
+        rebars, ur = minimum_reinforcement(self.section, *self.loads, *self.materials, diameters=self.diameters,
+                                           groups=self.groups, **self.grid)
+        self.assertLessEqual(ur, 1)
+        count = [4, 6, 8].index(len(rebars)) + 1
+        self.assertAlmostEqual(ur, self.max_ur(count, rebars.dia[0]), places=9)
+
+        # No layout with a smaller area passes
+        for count, n_bars in enumerate((4, 6, 8), 1):
+            for dia in self.diameters:
+                if n_bars * pi * dia**2 / 4 < rebars.total_area - 1e-9:
+                    self.assertGreater(self.max_ur(count, dia), 1)
+
+    def test_no_layout(self):
+        with self.assertRaises(ValueError):
+            minimum_reinforcement(self.section, *(10 * a for a in self.loads), *self.materials,
+                                  diameters=self.diameters, groups=self.groups, **self.grid)
+
+    def test_size_library(self):
+        spec = {'name': 'C1', 'x': [-200, 200, 200, -200], 'y': [200, 200, -200, -200],
+                'rebars': {'x': self.section.xr.tolist(), 'y': self.section.yr.tolist(), 'dia': 20},
+                'groups': self.groups, 'diameters': self.diameters,
+                'materials': dict(batch.DEFAULT_MATERIALS, fcd=16.7, fyd=435), 'grid': self.grid}
+        loads = {'C1': (['LC1', 'LC2', 'LC3', 'LC4'],) + self.loads,
+                 'C2': (['LC1'], np.array([-1e9]), np.array([0.0]), np.array([0.0]))}
+        messages = []
+        schedule = size_library([spec, dict(spec, name='C2')], loads, workers=1, log=messages.append)
+        self.assertEqual(list(schedule), ['C1'])
+        self.assertEqual((len(schedule['C1']['x']), schedule['C1']['dia']), (4, 25))
+        self.assertIn('no candidate layout', messages[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
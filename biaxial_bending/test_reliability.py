@@ -0,0 +1,61 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+from rebars import RebarLayout
+from reliability import LogNormal, Normal, cover_directions, failure_probability
+from section import Section, CircularSection
+
+
+class TestReliability(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-150, 150, 150, -150, 0], [150, 150, -150, -150, -150], dia=20)
+        self.section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        self.grid = {'rotation_step': 15, 'vertical_step': 8}
+        P, Mx, My, _, _ = calc_uls.compute_capacity_surface(self.section, 16.7, 435, 200000, 0.0035, **self.grid)
+
+        # Load combinations with utilization ratios 0.5, 0.95 and 1.1 for the mean materials
+        loads = np.array([[-1e6, -1e6, 0], [100e6, 100e6, 100e6], [0, 0, 100e6]])
+        ur = np.array(calc_uls.utilization_ratio(*loads, P, Mx, My))
+        self.loads = tuple(loads * np.array([0.5, 0.95, 1.1]) / ur)
+
+    def test_fixed_materials(self):
+        pf, beta = failure_probability(self.section, *self.loads, 16.7, 435, 200000, 0.0035, n_samples=10,
+                                       workers=1, **self.grid)
+        np.testing.assert_array_equal(pf, [0, 0, 1])
+        np.testing.assert_array_equal(beta, [np.inf, np.inf, -np.inf])
+
+    def test_random_materials(self):
+        materials = (LogNormal(16.7, 0.15), LogNormal(435, 0.05), 200000, 0.0035)
+        pf, beta = failure_probability(self.section, *self.loads, *materials, n_samples=400, seed=3, chunk_size=150,
+                                       workers=1, **self.grid)
+        self.assertEqual(pf[0], 0)
+        self.assertTrue(0 < pf[1] < 0.5 < pf[2] < 1)
+        self.assertTrue(beta[1] > 0 > beta[2])
+
+        # Reproducible with a process pool, and the same samples through the geometry path with zero deviations
+        pf_pool, _ = failure_probability(self.section, *self.loads, *materials, n_samples=400, seed=3,
+                                         chunk_size=150, workers=2, **self.grid)
+        np.testing.assert_array_equal(pf_pool, pf)
+        pf_geometry, _ = failure_probability(self.section, *self.loads, *materials, cover=Normal(0, 0),
+                                             position=0, n_samples=400, seed=3, chunk_size=150, workers=1,
+                                             **self.grid)
+        np.testing.assert_array_equal(pf_geometry, pf)
+
+    def test_cover(self):
+        # Less cover increases the bending capacity
+        for cover, expected in ((-40, [0, 0, 0]), (40, [0, 1, 1])):
+            pf, _ = failure_probability(self.section, *self.loads, 16.7, 435, 200000, 0.0035, cover=cover,
+                                        n_samples=5, workers=1, **self.grid)
+            np.testing.assert_array_equal(pf, expected)
+
+    def test_cover_directions(self):
+        np.testing.assert_allclose(cover_directions(self.section)[4], [0, 1])
+        circle = CircularSection(500, RebarLayout([200, 0], [0, -200], dia=20))
+        np.testing.assert_allclose(cover_directions(circle), [[-1, 0], [0, 1]], atol=1e-15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import pickle
+import unittest
+
+import numpy as np
+
+from rebars import RebarLayout
+from section import Section, CircularSection, AnnularSection
+
+
+class TestSection(unittest.TestCase):
+
+    def setUp(self):
+        # T-beam given in clockwise order
+        self.x = [-150, -400, -400, 400, 400, 150, 150, -150][::-1]
+        self.y = [200, 200, 400, 400, 200, 200, -150, -150][::-1]
+        self.bars = RebarLayout([-350, 0, 350, -100, 100, 300], [350, 350, 350, -100, -100, -100], dia=20)
+        self.section = Section(self.x, self.y, self.bars)
+
+    def test_invariants(self):
+        s = self.section
+        self.assertEqual(s.area, 800*200 + 300*350)
+        self.assertEqual('%.2f' % s.centroid[1], '%.2f' % ((160000*300 + 105000*25) / 265000))
+        self.assertEqual(s.bbox, (-400, -150, 400, 400))
+        self.assertEqual(s.x_ring.size, s.x.size + 1)
+        self.assertEqual(np.sum(s.dx), 0)
+
+    def test_vertices_counterclockwise(self):
+        dy = np.roll(self.section.y, -1)
+        dx = np.roll(self.section.x, -1)
+        self.assertGreater(np.sum(self.section.x * dy - dx * self.section.y), 0)
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.section.area = 1
+        with self.assertRaises(ValueError):
+            self.section.x[0] = 0
+        # Changes to the input layout do not propagate to the section
+        self.bars.area[0] = 0
+        self.assertNotEqual(self.section.As[0], 0)
+
+    def test_rebars_in_concrete(self):
+        self.assertEqual(list(self.section.rebars_in_concrete), [True, True, True, True, True, False])
+
+    def test_stress_block_non_convex(self):
+        # Horizontal cut at y=0 of the T-beam, compression below (distance is positive upwards)
+        dv = self.section.y.copy()
+        _, _, Asb, sb_cog = self.section.stress_block(dv, 0, 0)
+        self.assertEqual(Asb, 300*150)
+        self.assertEqual(sb_cog[1], -75)
+        # Cut through the flange, compression below
+        _, _, Asb, _ = self.section.stress_block(dv, 300, 0)
+        self.assertEqual(Asb, 300*350 + 800*100)
+
+    def test_plastic_centroid(self):
+        # Symmetric rectangle with symmetric reinforcement has plastic centroid at the centroid
+        bars = RebarLayout([50, 350, 50, 350], [50, 50, 450, 450], dia=20)
+        rect = Section([0, 400, 400, 0], [0, 0, 500, 500], bars)
+        xpl, ypl = rect.plastic_centroid(20, 435)
+        self.assertAlmostEqual(xpl, 200)
+        self.assertAlmostEqual(ypl, 250)
+
+        # Stronger bottom reinforcement moves the plastic centroid down
+        bars = RebarLayout([50, 350, 50, 350], [50, 50, 450, 450], dia=[32, 32, 12, 12])
+        rect = Section([0, 400, 400, 0], [0, 0, 500, 500], bars)
+        xpl, ypl = rect.plastic_centroid(20, 435, eta=1.0)
+        As = bars.area
+        Ac = 400*500 - As.sum()
+        F = 20*Ac + 435*As.sum()
+        ypl_hand = (20*(400*500*250 - np.dot(As, bars.y)) + 435*np.dot(As, bars.y)) / F
+        self.assertAlmostEqual(xpl, 200)
+        self.assertAlmostEqual(ypl, ypl_hand)
+        self.assertLess(ypl, 250)
+
+        # Translated section has translated plastic centroid
+        xpl_t, ypl_t = rect.translated(-200, 100).plastic_centroid(20, 435, eta=1.0)
+        self.assertAlmostEqual(xpl_t, xpl - 200)
+        self.assertAlmostEqual(ypl_t, ypl + 100)
+
+    def test_symmetry(self):
+        # T-beam is symmetric about the vertical axis only
+        bars = RebarLayout([-350, 0, 350, -100, 100], [350, 350, 350, -100, -100], dia=20)
+        tbeam = Section(self.x, self.y, bars)
+        self.assertEqual(tbeam.symmetry(), (False, True))
+
+        # Rectangle away from origin with symmetric bars is doubly symmetric
+        bars = RebarLayout([50, 350, 50, 350], [50, 50, 450, 450], dia=20)
+        rect = Section([0, 400, 400, 0], [0, 0, 500, 500], bars)
+        self.assertEqual(rect.symmetry(), (True, True))
+
+        # Different bar sizes or materials break the symmetry
+        bars = RebarLayout([50, 350, 50, 350], [50, 50, 450, 450], dia=[20, 20, 16, 16])
+        self.assertEqual(Section([0, 400, 400, 0], [0, 0, 500, 500], bars).symmetry(), (False, True))
+        bars = RebarLayout([50, 350, 50, 350], [50, 50, 450, 450], dia=20, material=[0, 1, 0, 1])
+        self.assertEqual(Section([0, 400, 400, 0], [0, 0, 500, 500], bars).symmetry(), (True, False))
+
+        # Small deviations are accepted within the tolerance
+        bars = RebarLayout([50, 350.01, 50, 350], [50, 50, 450, 450], dia=20)
+        rect = Section([0, 400, 400, 0], [0, 0, 500, 500], bars)
+        self.assertEqual(rect.symmetry(), (False, False))
+        self.assertEqual(rect.symmetry(tol=1e-4), (True, True))
+
+
+class TestCircularSection(unittest.TestCase):
+
+    def setUp(self):
+        angles = np.linspace(0, 2*np.pi, 8, endpoint=False)
+        self.bars = RebarLayout(100 + 200*np.cos(angles), 50 + 200*np.sin(angles), dia=20)
+
+    def test_area(self):
+        circle = CircularSection(500, self.bars, center=(100, 50))
+        self.assertAlmostEqual(circle.area, np.pi * 250**2)
+        self.assertEqual(circle.centroid, (100, 50))
+        ring = AnnularSection(500, 300, self.bars, center=(100, 50))
+        self.assertAlmostEqual(ring.area, np.pi * (250**2 - 150**2))
+
+    def test_stress_block(self):
+        # Half of the annulus is in compression for a horizontal neutral axis through the centre
+        ring = AnnularSection(500, 300, self.bars, center=(100, 50))
+        dv = 50 - ring.fibre_points(0)[1]
+        _, _, Asb, cog = ring.stress_block(dv, 0, 0)
+        self.assertAlmostEqual(Asb, ring.area / 2)
+        self.assertAlmostEqual(cog[0], 100)
+        self.assertAlmostEqual(cog[1], 50 + 4/(3*np.pi) * (250**3 - 150**3) / (250**2 - 150**2))
+
+    def test_rotational_symmetry(self):
+        self.assertEqual(CircularSection(500, self.bars, center=(100, 50)).rotational_symmetry(), 8)
+        bars = RebarLayout(self.bars.x, self.bars.y, dia=[20, 16]*4)
+        self.assertEqual(CircularSection(500, bars, center=(100, 50)).rotational_symmetry(), 4)
+        bars = RebarLayout(self.bars.x, self.bars.y, dia=[25] + [20]*7)
+        self.assertEqual(CircularSection(500, bars, center=(100, 50)).rotational_symmetry(), 1)
+
+    def test_with_rebars(self):
+        ring = AnnularSection(500, 300, self.bars, center=(100, 50))
+        bars = RebarLayout([100], [250], dia=32)
+        other = ring.with_rebars(bars)
+        self.assertIsInstance(other, AnnularSection)
+        self.assertEqual((other.area, other.center, other.inner_radius), (ring.area, ring.center, ring.inner_radius))
+        np.testing.assert_array_equal(other.As, bars.area)
+
+    def test_pickle(self):
+        for section in (CircularSection(500, self.bars, center=(100, 50)),
+                        AnnularSection(500, 300, self.bars, center=(100, 50)),
+                        Section([0, 1, 0], [0, 0, 1], self.bars)):
+            copy = pickle.loads(pickle.dumps(section))
+            self.assertIs(type(copy), type(section))
+            self.assertEqual(copy.digest(), section.digest())
+
+
+if __name__ == '__main__':
+    unittest.main()
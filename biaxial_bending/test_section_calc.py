@@ -1,6 +1,10 @@
 import unittest
 
+import numpy as np
+
 import section_calc as sc
+from rebars import RebarLayout
+from section import Section
 
 
 class TestSectionCalc(unittest.TestCase):
@@ -105,20 +109,29 @@ class TestSectionCalc(unittest.TestCase):
 
     def test_compute_dist_to_na(self):
 
-        # #================================================================================================
-        # # Tests based on Reinforced Concrete Mechanics and Design, Wight and MacGregor, Table 11-2
-        # #================================================================================================
-        # # Run function and convert results to rounded strings before comparison
-        # dv, dr = sc.compute_dist_to_na(self.x1, self.y1, self.xr1, self.yr1, self.alpha_deg1, self.na_y1)
-        # dv_r = ['%.2f' % e for e in dv]   # Distance from neutral axis to concrete section vertices
-        # dr_r = ['%.2f' % e for e in dr]   # Distance from neutral axis to rebars
+        #================================================================================================
+        # Tests based on Reinforced Concrete Mechanics and Design, Wight and MacGregor, Table 11-2
+        #================================================================================================
+        self.set_up()
+        section = Section(self.x1, self.y1, RebarLayout(self.xr1, self.yr1, dia=1))
+        dv, dr = sc.compute_dist_to_na(section, self.alpha_deg1, self.na_y1)
+        # Distance from neutral axis to concrete section vertices (the section may reorder the vertices)
+        dv_r = {(x, y): '%.2f' % e for x, y, e in zip(section.x, section.y, dv)}
+        dr_r = ['%.2f' % e for e in dr]   # Distance from neutral axis to rebars
 
-        # # Perform tests for concrete vertices and rebar distances 
-        # self.assertEqual(dv_r, ['-12.66', '-4.66', '9.20', '1.20'])
-        # self.assertEqual(dr_r, ['-9.38', '-6.58', '-3.78', '1.07', '5.92', '3.12', '0.32', '-4.53'])
+        # Perform tests for concrete vertices and rebar distances
+        self.assertEqual([dv_r[v] for v in zip(self.x1, self.y1)], ['-12.66', '-4.66', '9.20', '1.20'])
+        self.assertEqual(dr_r, ['-9.38', '-6.58', '-3.78', '1.07', '5.92', '3.12', '0.32', '-4.53'])
 
-        # TODO Add more tests (edge cases)
-        pass
+        # Vertical neutral axis x = 2 given by its offset in normal form, compression on the left side
+        dv, dr = sc.compute_dist_to_na(section, 90, None, offset=-2)
+        np.testing.assert_allclose(dv, section.x - 2)
+
+        # Several locations of the neutral axis at once
+        dv, dr = sc.compute_dist_to_na(section, self.alpha_deg1, np.array([self.na_y1, 0]))
+        self.assertEqual(dv.shape, (2, 4))
+        self.assertEqual(dr.shape, (2, 8))
+        np.testing.assert_allclose(dv[1], sc.compute_dist_to_na(section, self.alpha_deg1, 0)[0])
 
 
     def test_compute_stress_block_geometry(self):
@@ -154,6 +167,26 @@ class TestSectionCalc(unittest.TestCase):
         pass
 
 
+    def test_compute_moment_contributions_reference(self):
+        # Moments about a reference point equal moments about origin minus resultant times reference arm
+        xr, yr = [0, 100], [50, -50]
+        Fc, Fr = -1000, [200, 300]
+        sb_cog = (20, 80)
+        Mcx, Mcy, Mrx, Mry = sc.compute_moment_contributions(xr, yr, 1, sb_cog, Fc, Fr)
+        Mcx_r, Mcy_r, Mrx_r, Mry_r = sc.compute_moment_contributions(xr, yr, 1, sb_cog, Fc, Fr, ref=(10, 30))
+        P = Fc + sum(Fr)
+        self.assertAlmostEqual(Mcx_r + sum(Mrx_r), Mcx + sum(Mrx) + P*30)
+        self.assertAlmostEqual(Mcy_r + sum(Mry_r), Mcy + sum(Mry) + P*10)
+
+
+    def test_compute_rebar_forces_mixed_bars(self):
+        # Two bars of different size and steel grade, one of them inside the stress block
+        As = [500, 300]
+        sigma_r = sc.compute_rebar_stress([0.004, -0.001], 200000, [400, 500])
+        Fr = sc.compute_rebar_forces([0, 0], [0, 0], As, sigma_r, [False, True], fcd=20, lambda_=0.8)
+        self.assertEqual(['%.0f' % F for F in Fr], ['200000', '-55200'])
+
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from math import pi, sqrt
+
+import numpy as np
+
+from rebars import RebarLayout
+from section import Section
+from slenderness import SecondOrderCheck
+from surface_store import SurfaceStore
+
+
+class TestSlenderness(unittest.TestCase):
+
+    def setUp(self):
+        bars = RebarLayout([-150, 0, 150, 150, 150, 0, -150, -150], [150, 150, 150, 0, -150, -150, -150, 0], dia=20)
+        self.section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        self.materials = (25 / 1.5, 500 / 1.15, 200000, 0.0035)
+        self.check = SecondOrderCheck(self.section, *self.materials, fck=25, phi_ef=1.0, rotation_step=10,
+                                      vertical_step=8)
+
+    def test_nominal_curvature(self):
+        N, M0, l0 = 1.5e6, 50e6, 6000
+        Mx, My = self.check.second_order_moments(-N, M0, 0, l0, l0, imperfection=0)
+
+        # EN 1992-1-1, 5.8.8 by hand
+        fcd, fyd, Es, _ = self.materials
+        Ac = 400**2
+        As = 8 * pi * 20**2 / 4
+        omega = As * fyd / (Ac * fcd)
+        n = N / (Ac * fcd)
+        Kr = min((1 + omega - n) / (1 + omega - 0.4), 1)
+        i_s = sqrt(np.mean([150**2] * 6 + [0] * 2))
+        slenderness = l0 / (400 / sqrt(12))
+        Kphi = 1 + (0.35 + 25 / 200 - slenderness / 150) * 1.0
+        e2 = Kr * Kphi * fyd / Es / (0.45 * (200 + i_s)) * l0**2 / 10
+        self.assertAlmostEqual(float(Mx), M0 + N * l0 / 400 + N * e2, delta=1e-6 * M0)
+
+        # Without the imperfection about y only the second order moment, with it at least the minimum eccentricity
+        self.assertAlmostEqual(float(My), N * e2, delta=1e-6 * M0)
+        _, My = self.check.second_order_moments(-N, M0, 0, l0, l0, imperfection=1)
+        self.assertAlmostEqual(float(My), N * max(l0 / 400, 20) + N * e2, delta=1e-6 * M0)
+
+        # No second order effects in tension
+        Mx, My = self.check.second_order_moments(N, M0, 0, l0, l0)
+        self.assertEqual((float(Mx), float(My)), (M0, 0))
+
+    def test_nominal_stiffness(self):
+        N, M0, l0 = 1.5e6, 50e6, 6000
+        Mx, _ = self.check.second_order_moments(-N, M0, 0, l0, l0, method='stiffness', imperfection=0)
+
+        # EN 1992-1-1, 5.8.7 by hand
+        n = N / (400**2 * self.materials[0])
+        k2 = min(n * l0 / (400 / sqrt(12)) / 170, 0.2)
+        Ecd = 22000 * (33 / 10)**0.3 / 1.2
+        EI = sqrt(25 / 20) * k2 / 2 * Ecd * 400**4 / 12 + 200000 * 6 * pi * 20**2 / 4 * 150**2
+        NB = pi**2 * EI / l0**2
+        self.assertAlmostEqual(float(Mx), (M0 + N * l0 / 400) * (1 + pi**2 / 8 / (NB / N - 1)), delta=1e-6 * M0)
+
+        # Buckling
+        Mx, _ = self.check.second_order_moments(-N, M0, 0, 40000, l0, method='stiffness', imperfection=0)
+        self.assertEqual(float(Mx), np.inf)
+
+    def test_check(self):
+        rng = np.random.default_rng(0)
+        Ped = -rng.uniform(0, 2.5e6, 50)
+        Mx0 = rng.uniform(-80e6, 80e6, 50)
+        My0 = rng.uniform(-40e6, 40e6, 50)
+        l0 = rng.choice([3000, 6000, 9000], 50)
+        ur, Mx, My = self.check.check(Ped, Mx0, My0, l0, l0)
+        first_order = self.check.utilization_ratio(Ped, Mx0, My0)
+        self.assertTrue(np.all(ur >= first_order))
+
+        # Each load combination on its own
+        for k in (0, 17, 42):
+            single = self.check.check(Ped[k], Mx0[k], My0[k], l0[k], l0[k])
+            np.testing.assert_allclose([a[0] for a in single], [ur[k], Mx[k], My[k]], rtol=1e-12)
+
+        # Capacity surface from a store
+        with tempfile.TemporaryDirectory() as tmp:
+            surface = SurfaceStore(os.path.join(tmp, 'store')).get_or_compute(self.section, *self.materials,
+                                                                               rotation_step=10, vertical_step=8)
+            # The stored hull equations are used, the convex hull is not built again
+            with mock.patch('scipy.spatial.ConvexHull', side_effect=AssertionError):
+                stored = SecondOrderCheck(self.section, *self.materials, fck=25, phi_ef=1.0, surface=surface)
+            np.testing.assert_allclose(stored.check(Ped, Mx0, My0, l0, l0)[0], ur, rtol=1e-9)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+import instrumentation
+import slices
+from rebars import RebarLayout
+from section import Section
+
+
+class TestSlices(unittest.TestCase):
+
+    def setUp(self):
+        # T-beam, symmetric about the vertical axis only
+        x = [-150, -400, -400, 400, 400, 150, 150, -150]
+        y = [200, 200, 400, 400, 200, 200, -150, -150]
+        bars = RebarLayout([-350, 0, 350, -100, 100], [350, 350, 350, -100, -100], dia=20)
+        self.section = Section(x, y, bars)
+        self.args = (self.section, 16.7, 435, 200000, 0.0035)
+        surface = calc_uls.compute_capacity_surface(*self.args, rotation_step=30, vertical_step=5, use_symmetry=False)
+        self.P, self.Mx, self.My, self.na_y, self.alpha = [np.array(r) for r in surface]
+
+    def test_axial_force_contour(self):
+        # Contour through a point of the surface with neutral axis angle 60
+        i = np.flatnonzero(self.alpha == 60)[4]
+        Mx, My, na_y, alpha = slices.axial_force_contour(*self.args, self.P[i], rotation_step=30, tol=1e-9)
+        np.testing.assert_allclose(alpha, np.arange(0, 360, 30), atol=1e-5)
+        j = list(alpha).index(60)
+        np.testing.assert_allclose([Mx[j], My[j], na_y[j]], [self.Mx[i], self.My[i], self.na_y[i]], rtol=1e-6)
+
+        # All points have the axial force of the contour
+        for Mx_k, My_k, na_y_k, alpha_k in zip(Mx, My, na_y, alpha):
+            P = calc_uls.section_capacity(*self.args, alpha_k, na_y_k)[0]
+            self.assertAlmostEqual(P / self.P[i], 1, places=6)
+
+    def test_axial_force_outside_capacity(self):
+        with self.assertRaises(ValueError):
+            slices.axial_force_contour(*self.args, self.P.max() * 2)
+
+    def test_moment_angle_curve(self):
+        # Curve through a point of the surface, which is found at the same depth of the compression zone
+        i = np.flatnonzero(self.alpha == 60)[4]
+        theta = np.degrees(np.arctan2(self.My[i], self.Mx[i]))
+        P, Mx, My, na_y, alpha = slices.moment_angle_curve(*self.args, theta, vertical_step=5, tol=1e-9)
+        np.testing.assert_allclose([P[4], Mx[4], My[4], alpha[4]], [self.P[i], self.Mx[i], self.My[i], 60],
+                                   rtol=1e-6)
+
+        # All points found have moments in the direction of the curve
+        found = np.isfinite(P)
+        np.testing.assert_allclose(np.degrees(np.arctan2(My[found], Mx[found])), theta, atol=1e-6)
+
+    def test_batched_slices(self):
+        # Axial forces where the axial capacity decreases monotonically with the depth of the compression zone, so
+        # each contour is unique
+        P_levels = np.linspace(0.2, 0.8, 4) * self.P.min()
+        contours = slices.axial_force_contours(*self.args, P_levels, rotation_step=30, tol=1e-9)
+        for P, contour in zip(P_levels, contours):
+            single = slices.axial_force_contour(*self.args, P, rotation_step=30, tol=1e-9)
+            np.testing.assert_allclose(contour[:2], single[:2], rtol=1e-5, atol=1e-3 * np.abs(single[:2]).max())
+
+        curves = slices.moment_angle_curves(*self.args, [0, 90, 180], vertical_step=5, tol=1e-9)
+        for theta, curve in zip([0, 90, 180], curves):
+            single = slices.moment_angle_curve(*self.args, theta, vertical_step=5, tol=1e-9)
+            np.testing.assert_allclose(curve[0], single[0], rtol=1e-5)
+
+    def test_batched_evaluation(self):
+        # The points of a contour are solved together, with one batch of states per iteration
+        with instrumentation.profile() as prof:
+            slices.axial_force_contour(*self.args, self.P.min() / 2, rotation_step=30)
+        self.assertLessEqual(prof.counts['slices.batches'], 15)
+        self.assertGreaterEqual(prof.counts['slices.states'], 12 + prof.counts['slices.batches'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+import calc_uls
+from rebars import RebarLayout
+from section import Section
+from state_cache import StateCache
+
+
+class TestStateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.bars = RebarLayout([-130, 130, 65, -65, 0, 0], [-160, -160, 0, 0, 140, -160],
+                                dia=[25, 25, 20, 20, 16, 25])
+        self.x = [0, -200, 200]
+        self.y = [200, -200, -200]
+        self.materials = (16.7, 435, 200000, 0.0035)
+        self.cache = StateCache(Section(self.x, self.y, self.bars), rotation_step=10, vertical_step=8,
+                                reference=(10, -20))
+
+    def reference_surface(self, bars):
+        return calc_uls.compute_capacity_surface(Section(self.x, self.y, bars), *self.materials, rotation_step=10,
+                                                 vertical_step=8, reference=(10, -20), use_symmetry=False)
+
+    def test_same_as_capacity_surface(self):
+        contributions = self.cache.contributions(*self.materials)
+        for bars in (self.bars, self.bars.scaled(dia=25), self.bars.scaled(area=[300, 300, 0, 0, 100, 500])):
+            P, Mx, My, na_y, alpha = contributions.surface(bars.area)
+            P_ref, Mx_ref, My_ref, na_y_ref, alpha_ref = self.reference_surface(bars)
+            for value, expected in ((P, P_ref), (Mx, Mx_ref), (My, My_ref)):
+                np.testing.assert_allclose(value, expected, rtol=1e-9, atol=1e-6)
+            np.testing.assert_allclose(na_y, na_y_ref, rtol=1e-9, atol=1e-9)
+            np.testing.assert_array_equal(alpha, alpha_ref)
+
+    def test_surfaces(self):
+        contributions = self.cache.contributions(*self.materials)
+        areas = np.random.default_rng(0).uniform(0, 800, (5, len(self.bars)))
+        P, Mx, My = contributions.surfaces(areas)
+        for k, area in enumerate(areas):
+            expected = contributions.surface(area)
+            np.testing.assert_allclose(P[k], expected[0])
+            np.testing.assert_allclose(Mx[k], expected[1])
+            np.testing.assert_allclose(My[k], expected[2])
+
+    def test_sweep(self):
+        fcd = np.array([11.3, 16.7, 20.0, 23.3])
+        fyd = np.array([400, 435, 435, 500]) / np.array([1.0, 1.0, 1.15, 1.15])
+        P, Mx, My = self.cache.sweep(fcd, fyd, 200000, 0.0035, chunk_size=3)
+        self.assertEqual(P.shape, (4, len(self.cache)))
+        for k in range(4):
+            expected = self.cache.contributions(fcd[k], fyd[k], 200000, 0.0035).surface(self.bars.area)
+            np.testing.assert_allclose(P[k], expected[0], rtol=1e-12, atol=1e-6)
+            np.testing.assert_allclose(Mx[k], expected[1], rtol=1e-12, atol=1e-3)
+            np.testing.assert_allclose(My[k], expected[2], rtol=1e-12, atol=1e-3)
+
+        # Steel properties per material ID of each variant
+        cache = StateCache(Section(self.x, self.y, RebarLayout(self.bars.x, self.bars.y, dia=self.bars.dia,
+                                                               material=[0, 0, 1, 1, 1, 0])),
+                           rotation_step=10, vertical_step=8, reference=(10, -20))
+        P, Mx, My = cache.sweep(16.7, [[435, 400], [500, 435]], 200000, 0.0035)
+        expected = cache.contributions(16.7, [500, 435], 200000, 0.0035).surface(self.bars.area)
+        np.testing.assert_allclose(P[1], expected[0], rtol=1e-12, atol=1e-6)
+
+    def test_sweep_moved_bars(self):
+        # Bars moved by different displacements in each variant, with different materials
+        dxy = np.random.default_rng(4).normal(0, 15, (3, len(self.bars), 2))
+        dxy[0] = 0
+        fyd = [435, 400, 500]
+        P, Mx, My = self.cache.sweep(16.7, fyd, 200000, 0.0035, chunk_size=2, dxy=dxy)
+        for k in range(3):
+            bars = RebarLayout(self.bars.x + dxy[k, :, 0], self.bars.y + dxy[k, :, 1], dia=self.bars.dia)
+            P_ref, Mx_ref, My_ref, _, _ = calc_uls.compute_capacity_surface(
+                Section(self.x, self.y, bars), 16.7, fyd[k], 200000, 0.0035, rotation_step=10, vertical_step=8,
+                reference=(10, -20), use_symmetry=False)
+            for value, expected in ((P[k], P_ref), (Mx[k], Mx_ref), (My[k], My_ref)):
+                np.testing.assert_allclose(value, expected, rtol=1e-9, atol=1e-6)
+
+    def test_plastic_reference(self):
+        with self.assertRaises(ValueError):
+            StateCache(Section(self.x, self.y, self.bars), reference='plastic')
+
+
+if __name__ == '__main__':
+    unittest.main()
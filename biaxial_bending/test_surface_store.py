@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+import calc_uls
+from rebars import RebarLayout
+from section import Section, CircularSection, AnnularSection
+from surface_store import SurfaceStore
+
+
+class TestSurfaceStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = SurfaceStore(self.tmp.name)
+        bars = RebarLayout([-150, 150, 150, -150], [150, 150, -150, -150], dia=20)
+        self.section = Section([-200, 200, 200, -200], [200, 200, -200, -200], bars)
+        self.args = (self.section, 16.7, 435, 200000, 0.0035)
+        self.grid = {'rotation_step': 30, 'vertical_step': 5}
+
+    def test_digest(self):
+        bars = self.section.rebars
+        same = Section([-200, 200, 200, -200], [200, 200, -200, -200], RebarLayout(bars.x, bars.y, dia=20))
+        self.assertEqual(self.section.digest(), same.digest())
+        self.assertNotEqual(self.section.digest(), Section(same.x, same.y, bars.scaled(dia=16)).digest())
+        self.assertNotEqual(CircularSection(500, bars).digest(), AnnularSection(500, 200, bars).digest())
+
+    def test_get_or_compute(self):
+        key = self.store.key(*self.args, **self.grid)
+        self.assertNotIn(key, self.store)
+        surface = self.store.get_or_compute(*self.args, **self.grid)
+        self.assertIn(key, self.store)
+        self.assertIsInstance(surface.P, np.memmap)
+        self.assertFalse(surface.P.flags.writeable)
+
+        P, Mx, My, na_y, alpha, faces = calc_uls.compute_capacity_surface(*self.args, **self.grid, return_mesh=True)
+        np.testing.assert_allclose(surface.P, P)
+        np.testing.assert_allclose(surface.alpha, alpha)
+        np.testing.assert_array_equal(surface.faces, faces)
+
+        # The convex hull is stored with the mesh, so it is never built when the surface is loaded
+        self.assertIsInstance(surface.equations, np.memmap)
+        from scipy.spatial import ConvexHull
+        self.assertEqual(len(surface.equations), len(ConvexHull(np.column_stack((P, Mx, My))).equations))
+
+        loads = ([-1e6, 0], [5e7, 0], [0, 0])
+        np.testing.assert_allclose(surface.utilization_ratio(*loads), calc_uls.utilization_ratio(*loads, P, Mx, My))
+
+        # Other parameters give another key
+        self.assertNotEqual(key, self.store.key(*self.args, rotation_step=15, vertical_step=5))
+        self.assertNotEqual(key, self.store.key(self.section, 16.7, [435, 500], 200000, 0.0035, **self.grid))
+
+
+if __name__ == '__main__':
+    unittest.main()
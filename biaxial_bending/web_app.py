@@ -6,6 +6,7 @@ import dash_bootstrap_components as dbc
 import dash_table
 import plotly.graph_objs as go
 from datetime import datetime as dt
+import json
 
 # Third party packages
 import numpy as np
@@ -19,6 +20,8 @@ from calc_uls import utilization_ratio
 from geometry import order_polygon_vertices
 from geometry import line_hull_intersection
 from geometry import point_to_point_dist_3d
+from rebars import RebarLayout
+from section import Section
 
 field_color = '#F5F5F5'
 field_pad = 10
@@ -192,18 +195,18 @@ html.Div(
                         dash_table.DataTable(
                             id='rebar-locations',
                             columns=(
-                                [{'id': p, 'name': p} for p in ['xs[mm]', 'ys[mm]']]
+                                [{'id': p, 'name': p} for p in ['xs[mm]', 'ys[mm]', 'Ø[mm]']]
                             ),
-                            data=[{'xs[mm]':  '140', 'ys[mm]':  '140'},
-                                  {'xs[mm]': '-140', 'ys[mm]':  '140'},
-                                  {'xs[mm]': '-140', 'ys[mm]': '-140'},
-                                  {'xs[mm]':  '140', 'ys[mm]': '-140'},
-                                  {'xs[mm]':  '140', 'ys[mm]':  '0'},
-                                  {'xs[mm]': '-140', 'ys[mm]':  '0'},
-                                  {'xs[mm]':  '0',   'ys[mm]':  '140'},
-                                  {'xs[mm]':  '0',   'ys[mm]':  '-140'},
-                                  {'xs[mm]':  '',    'ys[mm]':   ''},
-                                  {'xs[mm]':  '',    'ys[mm]':   ''},
+                            data=[{'xs[mm]':  '140', 'ys[mm]':  '140', 'Ø[mm]': '25'},
+                                  {'xs[mm]': '-140', 'ys[mm]':  '140', 'Ø[mm]': '25'},
+                                  {'xs[mm]': '-140', 'ys[mm]': '-140', 'Ø[mm]': '25'},
+                                  {'xs[mm]':  '140', 'ys[mm]': '-140', 'Ø[mm]': '25'},
+                                  {'xs[mm]':  '140', 'ys[mm]':  '0',   'Ø[mm]': '16'},
+                                  {'xs[mm]': '-140', 'ys[mm]':  '0',   'Ø[mm]': '16'},
+                                  {'xs[mm]':  '0',   'ys[mm]':  '140', 'Ø[mm]': '16'},
+                                  {'xs[mm]':  '0',   'ys[mm]':  '-140', 'Ø[mm]': '16'},
+                                  {'xs[mm]':  '',    'ys[mm]':   '',   'Ø[mm]': ''},
+                                  {'xs[mm]':  '',    'ys[mm]':   '',   'Ø[mm]': ''},
                                   ],
                             editable=True
                         ),
@@ -314,8 +317,12 @@ def calc_cap_surf_and_store(xy, sv_col, xsys, rebar_col):
     x=[float(c) for c in list(df_sv['x[mm]']) if c]
     y=[float(c) for c in list(df_sv['y[mm]']) if c]
 
-    xr=[float(c) for c in list(df_rebars['xs[mm]'])if c]
-    yr=[float(c) for c in list(df_rebars['ys[mm]'])if c]
+    # Only rows with coordinates and diameter filled in are rebars
+    rows=[(float(xs), float(ys), float(d)) for xs, ys, d in zip(df_rebars['xs[mm]'], df_rebars['ys[mm]'],
+                                                                 df_rebars['Ø[mm]'])
+          if all(c != '' and pd.notna(c) for c in (xs, ys, d))]
+    xr, yr, dia=(list(c) for c in zip(*rows)) if rows else ([], [], [])
+    section=Section(x, y, RebarLayout(xr, yr, dia=dia))
 
     # Set calculation parameters
     eps_cu=0.0035       # NOTE eps_cu = 0.00035 in Eurocode for concrete strengths < C50
@@ -326,13 +333,13 @@ def calc_cap_surf_and_store(xy, sv_col, xsys, rebar_col):
     fyk=500     # [MPa]
     gamma_s=1.0
     fyd=fyk/gamma_s
-    As=3.14159*25**2/4  # [mm^2]
 
     # Compute capacity surface
-    P, Mx, My, _, _=compute_capacity_surface(
-        x, y, xr, yr, fcd, fyd, Es, eps_cu, As, lambda_ = 0.80,  rotation_step = 5, vertical_step = 6)
+    P, Mx, My, _, _, faces=compute_capacity_surface(
+        section, fcd, fyd, Es, eps_cu, lambda_ = 0.80,  rotation_step = 5, vertical_step = 6, return_mesh=True)
 
-    return pd.DataFrame({'P': P, 'Mx': Mx, 'My': My}).to_json(date_format='iso', orient='split')
+    # Store the surface points together with the triangles of the surface mesh
+    return json.dumps({'P': P, 'Mx': Mx, 'My': My, 'faces': faces.tolist()})
 
 
 @app.callback(
@@ -358,9 +365,10 @@ def update_section_plot(xy, sv_col, xsys, rebar_col):
     # Close polgyon
     x.append(x[0])
     y.append(y[0])
-    # Extract rebar coordinates
+    # Extract rebar coordinates and diameters
     xs = df_rebars['xs[mm]']
     ys = df_rebars['ys[mm]']
+    dia = [float(c) if c else 0 for c in df_rebars['Ø[mm]']]
     # Create plot
     concrete = go.Scatter(
         x=x,
@@ -380,7 +388,8 @@ def update_section_plot(xy, sv_col, xsys, rebar_col):
         ),
         opacity=0.7,
         marker={
-            'size': 10,
+            # Marker size follows the rebar diameter
+            'size': [max(d/2.5, 4) for d in dia],
         },
     )
 
@@ -408,10 +417,11 @@ def update_section_plot(xy, sv_col, xsys, rebar_col):
      Input('load-combs', 'columns')])
 def update_capacity_surface(cap_surf_results, loads, load_col):
     # Extract results from capacity surface calculation stored in hidden div
-    df_cap_surf = pd.read_json(cap_surf_results, orient='split')
-    P = df_cap_surf['P']
-    Mx = df_cap_surf['Mx']
-    My = df_cap_surf['My']
+    cap_surf = json.loads(cap_surf_results)
+    P = cap_surf['P']
+    Mx = cap_surf['Mx']
+    My = cap_surf['My']
+    faces = np.array(cap_surf['faces'])
  
     # Since input is given in [MPa] and [mm], the results come out in [N] and [Nm]. Convert to [kN] and [kNm]
     P = [i/10**3 for i in P]
@@ -440,8 +450,8 @@ def update_capacity_surface(cap_surf_results, loads, load_col):
     Mxed_unsafe = [Mxed[i] for i in range(len(ur)) if ur[i] > 1.00]
     Myed_unsafe = [Myed[i] for i in range(len(ur)) if ur[i] > 1.00]
 
-    # Compute and plot convex hull of point cloud
-    cap_surf = go.Mesh3d(x=Mx, y=My, z=P, alphahull=0,
+    # Plot the mesh of the capacity surface
+    cap_surf = go.Mesh3d(x=Mx, y=My, z=P, i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
                          opacity=0.4, color='#FFB653')
     points = go.Scatter3d(x=Mx, y=My, z=P, marker=dict(
         size=3, opacity=0.2), line=dict(width=0), mode='markers')
@@ -484,10 +494,10 @@ def update_columns(cap_surf_results, loads, load_col):
     # ____ AND REUSED
 
     # Extract results from capacity surface calculation stored in hidden div
-    df_cap_surf = pd.read_json(cap_surf_results, orient='split')
-    P = df_cap_surf['P']
-    Mx = df_cap_surf['Mx']
-    My = df_cap_surf['My']
+    cap_surf = json.loads(cap_surf_results)
+    P = cap_surf['P']
+    Mx = cap_surf['Mx']
+    My = cap_surf['My']
 
     # Since input is given in [MPa] and [mm], the results come out in [N] and [Nm]. Convert to [kN] and [kNm]
     P = [i/10**3 for i in P]